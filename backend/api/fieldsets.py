@@ -0,0 +1,117 @@
+"""
+Выборочные поля ответа: параметры ?fields= и ?expand=.
+
+?fields=id,name,image - в ответе только перечисленные поля.
+?expand=author,tags - связи, которые отдаются вложенными объектами;
+остальные связи сворачиваются до идентификаторов (см. collapsed_fields
+у сериализаторов). Без ?expand= все связи развернуты, а без обоих
+параметров ответ такой же, как раньше.
+
+Выбор передается сериализатору в context['fieldset'], а вьюха по нему
+сужает queryset: only() нужных колонок, без prefetch и аннотаций для
+полей, которых нет в ответе.
+"""
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import ListSerializer
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def _names(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class Fieldset:
+    """Поля ответа и развернутые связи, выбранные клиентом."""
+
+    def __init__(self, fields, expanded, expandable=()):
+        self.fields = tuple(fields)
+        self.expanded = frozenset(expanded)
+        self.expandable = frozenset(expandable)
+
+    @classmethod
+    def from_request(cls, request, serializer_class):
+        """
+        Выбор из параметров запроса или None, если их нет (все поля).
+        Неизвестные поля и связи - ошибка 400.
+        """
+        params = request.query_params
+        if FIELDS_PARAM not in params and EXPAND_PARAM not in params:
+            return None
+        available = serializer_class.Meta.fields
+        expandable = tuple(getattr(serializer_class, 'collapsed_fields', ()))
+        requested = set(_names(params.get(FIELDS_PARAM, ''))) or set(available)
+        expanded = (
+            set(_names(params[EXPAND_PARAM]))
+            if EXPAND_PARAM in params else set(expandable)
+        )
+
+        errors = {}
+        unknown = requested.difference(available)
+        if unknown:
+            errors[FIELDS_PARAM] = [
+                f'Неизвестные поля: {", ".join(sorted(unknown))}.'
+            ]
+        unknown = expanded.difference(expandable)
+        if unknown:
+            errors[EXPAND_PARAM] = [
+                f'Нельзя развернуть: {", ".join(sorted(unknown))}.'
+            ]
+        if errors:
+            raise ValidationError(errors)
+        return cls(
+            (name for name in available if name in requested),
+            expanded,
+            expandable,
+        )
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def expands(self, name):
+        """Связь есть в ответе и отдается вложенным объектом."""
+        return name in self.fields and name in self.expanded
+
+    def collapses(self, name):
+        """Связь есть в ответе и отдается идентификаторами."""
+        return (
+            name in self.fields
+            and name in self.expandable
+            and name not in self.expanded
+        )
+
+
+class FieldsetMixin:
+    """
+    Сериализатор, поля которого выбираются context['fieldset'].
+
+    collapsed_fields - {связь: фабрика поля} для свернутого
+    представления связей. Выбор применяется только к сериализатору
+    верхнего уровня (или элементу списка верхнего уровня), а не к
+    вложенным, у которых тот же context.
+    """
+
+    collapsed_fields = {}
+
+    @property
+    def fieldset(self):
+        parent = self.parent
+        if isinstance(parent, ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return None
+        return self.context.get('fieldset')
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.fieldset
+        if fieldset is None:
+            return fields
+        selected = {}
+        for name in fieldset.fields:
+            if fieldset.collapses(name):
+                selected[name] = self.collapsed_fields[name]()
+            else:
+                selected[name] = fields[name]
+        return selected
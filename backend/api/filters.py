@@ -1,6 +1,14 @@
+from django.db.models import Exists, OuterRef
 from django_filters import FilterSet, filters
+from rest_framework.filters import OrderingFilter
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    Tag,
+    UserFavoriteRecipes,
+    UserShoppingCart,
+)
 
 
 class IngredientFilterSet(FilterSet):
@@ -16,6 +24,26 @@ class IngredientFilterSet(FilterSet):
         fields = ('name',)
 
 
+class RecipeOrderingFilter(OrderingFilter):
+    """
+    Сортировка рецептов, дополнительно ?ordering=popular|trending.
+
+    Оценки хранятся в индексированных полях рецепта
+    (см. recipes.scores), поэтому сортировка идет по индексу.
+    """
+
+    score_orderings = {
+        'popular': ('-popularity', '-created_at'),
+        'trending': ('-trending', '-created_at'),
+    }
+
+    def get_ordering(self, request, queryset, view):
+        param = request.query_params.get(self.ordering_param)
+        if param in self.score_orderings:
+            return self.score_orderings[param]
+        return super().get_ordering(request, queryset, view)
+
+
 class RecipeTagsFilter(FilterSet):
     """Фильтр для рецептов."""
 
@@ -39,16 +67,31 @@ class RecipeTagsFilter(FilterSet):
         model = Recipe
         fields = ['tags', 'author', 'is_favorited', 'is_in_shopping_cart']
 
+    def _filter_by_user_relation(self, queryset, model, value):
+        """
+        Оставляет рецепты, связанные с текущим пользователем через model.
+
+        Условие добавляется как EXISTS-подзапрос к уже подготовленному
+        queryset, поэтому select_related/prefetch_related, сортировка и
+        остальные фильтры сохраняются.
+        """
+        if value != 1:
+            return queryset
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(
+            Exists(
+                model.objects.filter(recipe=OuterRef('pk'), user=user)
+            )
+        )
+
     def is_in_shopping_cart_filter(self, queryset, name, value):
-        user = self.request.user.id
-        if value == 1:
-            queryset = Recipe.objects.all()
-            return queryset.filter(is_in_shopping_cart__id=user)
-        return queryset
+        return self._filter_by_user_relation(
+            queryset, UserShoppingCart, value
+        )
 
     def is_favorited_filter(self, queryset, name, value):
-        user = self.request.user.id
-        if value == 1:
-            queryset = Recipe.objects.all()
-            return queryset.filter(is_favorited__id=user)
-        return queryset
+        return self._filter_by_user_relation(
+            queryset, UserFavoriteRecipes, value
+        )
@@ -1,13 +1,149 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db import connections
 from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.utils.urls import replace_query_param
+
+from recipes.constants import (
+    COUNT_ESTIMATE,
+    COUNT_EXACT,
+    COUNT_MODES,
+    PAGINATION_COUNT_TIMEOUT,
+    PAGINATION_ESTIMATE_MIN,
+)
+
+
+def queryset_signature(queryset):
+    """Хеш SQL выборки (фильтров) без сортировки и лишних колонок."""
+    query = queryset.values('pk').order_by().query
+    sql, params = query.sql_with_params()
+    return hashlib.sha1(
+        f'{queryset.db}:{sql}:{params!r}'.encode()
+    ).hexdigest()
+
+
+def planner_estimate(queryset):
+    """
+    Оценка числа строк выборки планировщиком PostgreSQL (EXPLAIN,
+    без выполнения запроса). Для остальных СУБД - None.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.values('pk').order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def cached_count(queryset, signature=None):
+    """COUNT(*) выборки, закешированный по ее фильтрам на короткое время."""
+    key = f'pagination-count:{signature or queryset_signature(queryset)}'
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, PAGINATION_COUNT_TIMEOUT)
+    return count
+
+
+class CountModePaginationMixin:
+    """
+    Режимы подсчета count, выбираемые клиентом параметром ?count=:
+
+    exact (по умолчанию) - точный COUNT(*), как у LimitOffsetPagination;
+    estimate - оценка: планировщик PostgreSQL для больших выборок,
+        иначе COUNT(*), закешированный на PAGINATION_COUNT_TIMEOUT;
+    none - без подсчета, count = null.
+
+    В режимах estimate и none читается limit + 1 строка: лишняя строка
+    показывает, есть ли следующая страница. Оценка не бывает меньше
+    уже увиденного, а на последней странице count точный.
+    """
+
+    count_query_param = 'count'
+    default_count_mode = COUNT_EXACT
+
+    def get_count_mode(self, request):
+        mode = request.query_params.get(self.count_query_param)
+        return mode if mode in COUNT_MODES else self.default_count_mode
+
+    def estimate_count(self, queryset):
+        signature = queryset_signature(queryset)
+        estimates = self.__dict__.setdefault('_estimates', {})
+        if signature not in estimates:
+            count = planner_estimate(queryset)
+            if count is None or count < PAGINATION_ESTIMATE_MIN:
+                count = cached_count(queryset, signature)
+            estimates[signature] = count
+        return estimates[signature]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_mode = self.get_count_mode(request)
+        if self.count_mode == COUNT_EXACT:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        page = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(page) > self.limit
+        page = page[:self.limit]
+
+        self.count = None
+        if self.count_mode == COUNT_ESTIMATE:
+            seen = self.offset + len(page)
+            if self.has_next:
+                self.count = max(self.estimate_count(queryset), seen + 1)
+            elif page or not self.offset:
+                self.count = seen
+            else:
+                self.count = self.estimate_count(queryset)
+        return page
+
+    def get_next_link(self):
+        if self.count_mode == COUNT_EXACT:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url, self.offset_query_param, self.offset + self.limit
+        )
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count']['nullable'] = True
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            *super().get_schema_operation_parameters(view),
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'How to compute count: exact, estimate '
+                               'or none (count is null).',
+                'schema': {'type': 'string', 'enum': list(COUNT_MODES)},
+            },
+        ]
 
 
-class RecipePagination(LimitOffsetPagination):
+class RecipePagination(CountModePaginationMixin, LimitOffsetPagination):
     default_limit = 6
     max_limit = 6
     min_limit = 2
 
 
-class SubscriptionPagination(LimitOffsetPagination):
+class SubscriptionPagination(CountModePaginationMixin, LimitOffsetPagination):
     limit_query_param = 'limit'
     default_limit = 2
     max_limit = 2
@@ -21,7 +157,7 @@ class AuthorRecipesPagination(LimitOffsetPagination):
     min_limit = 2
 
 
-class UserListPagination(LimitOffsetPagination):
+class UserListPagination(CountModePaginationMixin, LimitOffsetPagination):
     default_limit = 4
     max_limit = 4
     min_limit = 1
@@ -1,17 +1,26 @@
 from djoser import serializers as djoser_serializers
 from django.contrib.auth import get_user_model
-from django.shortcuts import get_object_or_404
+from django.core.cache import cache
+from django.db import models
+from django.db.models import Prefetch
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
+from .fieldsets import FieldsetMixin
 from .pagination import AuthorRecipesPagination
 from recipes import models as recipes_models
+from recipes.constants import BATCH_MAX_SIZE, RECIPE_FRAGMENT_TIMEOUT
+from recipes.signals import replacing_ingredients
 from users.models import Subscriptions
 
 
 User = get_user_model()
 
+FAVORITE_EXISTS_ERROR = 'Этот рецепт уже находится в Избранном'
+SUBSCRIPTION_EXISTS_ERROR = 'Вы уже подписаны на этого пользователя!'
+SELF_SUBSCRIPTION_ERROR = 'Пользователь не может быть подписан на самого себя!'
+
 
 class IngredientSerializer(serializers.ModelSerializer):
     """Сериалайзер для ингредиентов."""
@@ -32,11 +41,12 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'name', 'slug')
 
 
-class UserGetSerializer(djoser_serializers.UserSerializer):
+class UserGetSerializer(FieldsetMixin, djoser_serializers.UserSerializer):
     """
     Сериализатор для получения данных пользователей ('list', 'retirieve').
 
     Наследуется от встроенного UserSerializer. ReadOnly.
+    Поля выбираются параметром ?fields= (см. api.fieldsets).
     """
 
     id = serializers.IntegerField()
@@ -71,13 +81,17 @@ class UserGetSerializer(djoser_serializers.UserSerializer):
         Метод сериалайзера.
 
         Проверяет, подписан ли текущий пользователь на
-        пользователя, профиль которого он смотрит.
+        пользователя, профиль которого он смотрит. Если queryset
+        аннотирован api.utils.with_subscription_flag, запроса нет.
         """
-        request_user = self.context.get('request').user.id
-        queryset = Subscriptions.objects.filter(
+        if hasattr(obj, 'subscribed_by_user'):
+            return obj.subscribed_by_user
+        request_user = self.context.get('request').user
+        if not request_user.is_authenticated:
+            return False
+        return Subscriptions.objects.filter(
             following=obj.id, user=request_user
         ).exists()
-        return queryset
 
 
 #                 ****  РЕЦЕПТЫ   *****
@@ -112,7 +126,7 @@ class FavoriteRecipesSerializer(serializers.ModelSerializer):
             UniqueTogetherValidator(
                 queryset=recipes_models.UserFavoriteRecipes.objects.all(),
                 fields=('user', 'recipe'),
-                message="Этот рецепт уже находится в Избранном",
+                message=FAVORITE_EXISTS_ERROR,
             ),
         ]
 
@@ -171,6 +185,16 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
+class IngredientIdAmountSerializer(serializers.ModelSerializer):
+    """Свернутое представление поля ingredients: id и количество."""
+
+    id = serializers.IntegerField(source='ingredient_id')
+
+    class Meta:
+        model = recipes_models.RecipeIngredient
+        fields = ('id', 'amount')
+
+
 class RecipeCreateSerializer(RecipeBaseMixin):
     """Сериализатор для создания и изменения рецептов."""
 
@@ -193,7 +217,7 @@ class RecipeCreateSerializer(RecipeBaseMixin):
         )
 
         self._add_tags(recipe, tags_data)
-        self._add_ingredients(recipe, ingredients_data)
+        self._set_ingredients(recipe, ingredients_data)
 
         return recipe
 
@@ -211,8 +235,7 @@ class RecipeCreateSerializer(RecipeBaseMixin):
             self._add_tags(instance, tags_data)
 
         if ingredients_data is not None:
-            instance.ingredients.clear()
-            self._add_ingredients(instance, ingredients_data)
+            self._set_ingredients(instance, ingredients_data, replace=True)
 
         instance.save()
         return instance
@@ -220,22 +243,25 @@ class RecipeCreateSerializer(RecipeBaseMixin):
     def _add_tags(self, recipe, tags_data):
         if not tags_data:
             raise serializers.ValidationError("Не указаны тэги")
-        for tag in tags_data:
-            if recipe.tags.filter(id=tag.id).exists():
-                recipe.delete()
-                raise serializers.ValidationError("Повторяющиеся тэги")
-            recipe.tags.add(tag)
+        recipe.tags.add(*tags_data)
 
-    def _add_ingredients(self, recipe, ingredients_data):
+    def _set_ingredients(self, recipe, ingredients_data, replace=False):
         if not ingredients_data:
             raise serializers.ValidationError("Не указаны ингредиенты")
-        for ingredient in ingredients_data:
-            if recipe.ingredients.filter(id=ingredient['ingredient'].id).exists():
-                recipe.delete()
-                raise serializers.ValidationError("Повторяющиеся ингредиенты")
-            recipe.ingredients.add(
-                ingredient['ingredient'],
-                through_defaults={'amount': ingredient['amount']},
+        # Количество у каждого ингредиента свое, поэтому строки
+        # вставляются одним bulk_create, а не recipe.ingredients.add().
+        # Пересчет списков покупок и кешей ставится в очередь один раз
+        # за сохранение рецепта, а не на каждую строку.
+        with replacing_ingredients(recipe.pk):
+            if replace:
+                recipe.recipe_ingredients.all().delete()
+            recipes_models.RecipeIngredient.objects.bulk_create(
+                recipes_models.RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=item['ingredient'],
+                    amount=item['amount'],
+                )
+                for item in ingredients_data
             )
 
     def to_representation(self, instance):
@@ -244,11 +270,16 @@ class RecipeCreateSerializer(RecipeBaseMixin):
     def validate_ingredients(self, value):
         if not value:
             raise serializers.ValidationError("Не указаны ингредиенты")
+        ids = [item['ingredient'].id for item in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Повторяющиеся ингредиенты")
         return value
 
     def validate_tags(self, value):
         if not value:
             raise serializers.ValidationError("Не указаны тэги")
+        if len(value) != len(set(value)):
+            raise serializers.ValidationError("Повторяющиеся тэги")
         return value
 
     def validate_image(self, value):
@@ -276,6 +307,30 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         ).data
 
 
+class BatchIdsSerializer(serializers.Serializer):
+    """Сериалайзер для списка id в пакетных запросах."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BATCH_MAX_SIZE,
+    )
+
+
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    """Сериалайзер для суммарного списка покупок."""
+
+    id = serializers.IntegerField(source='ingredient.id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit.short_name'
+    )
+
+    class Meta:
+        model = recipes_models.UserShoppingListItem
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
 class RecipeShortSerializer(RecipeBaseMixin):
     """Сериалайзер для короткого списка рецептов (GET-запрос)."""
 
@@ -286,14 +341,137 @@ class RecipeShortSerializer(RecipeBaseMixin):
         read_only_fields = ('id', 'name', 'image', "cooking_time")
 
 
-class RecipeFullSerializer(RecipeBaseMixin):
-    """Cериализатор для полного представления рецепта."""
+class UserFragmentSerializer(UserGetSerializer):
+    """Часть представления автора, не зависящая от пользователя."""
+
+    class Meta(UserGetSerializer.Meta):
+        fields = (
+            'email',
+            'id',
+            'username',
+            'first_name',
+            'last_name',
+            'avatar',
+        )
+
+
+class RecipeFragmentSerializer(RecipeBaseMixin):
+    """
+    Часть представления рецепта, одинаковая для всех пользователей.
+
+    Кешируется RecipeFullSerializer, см. get_recipe_fragments.
+    """
 
     tags = TagSerializer(many=True)
-    author = UserGetSerializer(read_only=True)
+    author = UserFragmentSerializer(read_only=True)
     ingredients = IngredientAmountSerializer(
         many=True, source='recipe_ingredients'
     )
+    text = serializers.CharField(required=True)
+
+    class Meta:
+        model = recipes_models.Recipe
+        fields = (
+            'id',
+            'tags',
+            'author',
+            'ingredients',
+            'name',
+            'image',
+            'text',
+            'cooking_time'
+        )
+
+
+def recipe_fragment_key(recipe, request):
+    """Ключ кеша зависит от updated_at, поэтому не требует удаления."""
+    host = request.build_absolute_uri('/') if request else ''
+    return (
+        f'recipe-fragment:{recipe.pk}:'
+        f'{recipe.updated_at.timestamp()}:{host}'
+    )
+
+
+def get_recipe_fragments(recipes, context):
+    """
+    Возвращает {id: фрагмент} для рецептов, беря их из кеша.
+
+    Отсутствующие в кеше фрагменты строятся одним запросом со всеми
+    связями на всю пачку и сохраняются в кеш.
+    """
+    request = context.get('request')
+    keys = {recipe.pk: recipe_fragment_key(recipe, request)
+            for recipe in recipes}
+    cached = cache.get_many(keys.values())
+    fragments = {
+        pk: cached[key] for pk, key in keys.items() if key in cached
+    }
+    missing = [pk for pk in keys if pk not in fragments]
+    if missing:
+        queryset = (
+            recipes_models.Recipe.objects.filter(pk__in=missing)
+            .select_related('author')
+            .prefetch_related(
+                'tags',
+                Prefetch(
+                    'recipe_ingredients',
+                    queryset=recipes_models.RecipeIngredient.objects
+                    .select_related('ingredient__measurement_unit'),
+                ),
+            )
+        )
+        for recipe in queryset:
+            fragments[recipe.pk] = dict(
+                RecipeFragmentSerializer(recipe, context=context).data
+            )
+        cache.set_many(
+            {keys[pk]: fragments[pk] for pk in missing if pk in fragments},
+            RECIPE_FRAGMENT_TIMEOUT,
+        )
+    return fragments
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Список рецептов: фрагменты из кеша читаются одним запросом."""
+
+    def to_representation(self, data):
+        if isinstance(data, models.manager.BaseManager):
+            data = data.all()
+        recipes = list(data)
+        fragments = {}
+        if self.child.uses_fragments(self.child.fieldset):
+            fragments = get_recipe_fragments(recipes, self.context)
+        return [
+            self.child.to_representation(recipe, fragments.get(recipe.pk))
+            for recipe in recipes
+        ]
+
+
+class RecipeFullSerializer(FieldsetMixin, RecipeFragmentSerializer):
+    """
+    Cериализатор для полного представления рецепта.
+
+    Общая часть берется из кеша (RecipeFragmentSerializer), поверх нее
+    подставляются is_favorited, is_in_shopping_cart и
+    author.is_subscribed текущего пользователя. Если queryset
+    аннотирован api.utils.with_user_flags, признаки не требуют запросов.
+
+    Поля выбираются параметрами ?fields= и ?expand= (api.fieldsets).
+    Кеш нужен только развернутым связям: без них рецепт сериализуется
+    из самого queryset, суженного вьюхой.
+    """
+
+    collapsed_fields = {
+        'author': lambda: serializers.PrimaryKeyRelatedField(read_only=True),
+        'tags': lambda: serializers.PrimaryKeyRelatedField(
+            many=True, read_only=True
+        ),
+        'ingredients': lambda: IngredientIdAmountSerializer(
+            many=True, source='recipe_ingredients'
+        ),
+    }
+
+    author = UserGetSerializer(read_only=True)
     is_favorited = serializers.SerializerMethodField(
         'get_is_favorited', read_only=True, default=False
     )
@@ -302,7 +480,6 @@ class RecipeFullSerializer(RecipeBaseMixin):
         read_only=True,
         default=False
     )
-    text = serializers.CharField(required=True)
 
     class Meta:
         model = recipes_models.Recipe
@@ -318,25 +495,95 @@ class RecipeFullSerializer(RecipeBaseMixin):
             'text',
             'cooking_time'
         )
+        list_serializer_class = RecipeListSerializer
+
+    @classmethod
+    def uses_fragments(cls, fieldset):
+        """Нужны ли кешированные фрагменты: есть развернутые связи."""
+        return fieldset is None or any(
+            fieldset.expands(name) for name in cls.collapsed_fields
+        )
+
+    def to_representation(self, instance, fragment=None):
+        fieldset = self.fieldset
+        if fragment is None and self.uses_fragments(fieldset):
+            fragment = get_recipe_fragments(
+                [instance], self.context
+            ).get(instance.pk)
+        if fragment is None:
+            return super().to_representation(instance)
+
+        data = {}
+        for field in self.fields:
+            if field == 'is_favorited':
+                data[field] = self.get_is_favorited(instance)
+            elif field == 'is_in_shopping_cart':
+                data[field] = self.get_is_in_shopping_cart(instance)
+            elif fieldset is not None and fieldset.collapses(field):
+                data[field] = self.collapse(field, fragment[field])
+            elif field == 'author':
+                author = dict(
+                    fragment['author'],
+                    is_subscribed=self.get_is_subscribed(instance),
+                )
+                data[field] = {
+                    name: author[name]
+                    for name in UserGetSerializer.Meta.fields
+                }
+            else:
+                data[field] = fragment[field]
+        return data
+
+    @staticmethod
+    def collapse(field, value):
+        """Свернутое представление связи из фрагмента."""
+        if field == 'author':
+            return value['id']
+        if field == 'tags':
+            return [tag['id'] for tag in value]
+        return [
+            {'id': item['id'], 'amount': item['amount']} for item in value
+        ]
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'favorited_by_user'):
+            return obj.favorited_by_user
         request_user = self.context.get('request').user.id
         return recipes_models.UserFavoriteRecipes.objects.filter(recipe=obj.id, user=request_user).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'in_user_shopping_cart'):
+            return obj.in_user_shopping_cart
         request_user = self.context.get('request').user.id
         return recipes_models.UserShoppingCart.objects.filter(
             recipe=obj.id, user=request_user
         ).exists()
 
+    def get_is_subscribed(self, obj):
+        if hasattr(obj, 'author_subscribed'):
+            return obj.author_subscribed
+        request_user = self.context.get('request').user.id
+        return Subscriptions.objects.filter(
+            following=obj.author_id, user=request_user
+        ).exists()
 
-class AuthorProfileSerializer(serializers.ModelSerializer):
+
+class AuthorProfileSerializer(FieldsetMixin, serializers.ModelSerializer):
     """
     Сериалайзер для профиля пользователя.
 
     Представляет полный профиль другого пользователя(автора рецепта.)
+    Для списков авторов queryset готовится api.utils.with_author_profile,
+    тогда поля не требуют запросов. Поля выбираются параметрами
+    ?fields= и ?expand= (recipes свернутые - список id).
     """
 
+    collapsed_fields = {
+        'recipes': lambda: serializers.SerializerMethodField(
+            'get_recipe_ids'
+        ),
+    }
+
     id = serializers.IntegerField()
     is_subscribed = serializers.SerializerMethodField(
         'get_is_subscribed', default=False
@@ -368,26 +615,36 @@ class AuthorProfileSerializer(serializers.ModelSerializer):
         Проверяет, подписан ли текущий пользователь на
         пользователя, профиль которого он смотрит.
         """
+        if hasattr(obj, 'subscribed_by_user'):
+            return obj.subscribed_by_user
         request_user = self.context.get('request').user.id
         queryset = Subscriptions.objects.filter(
             following=obj.id, user=request_user
         ).exists()
         return queryset
 
-    def get_recipes(self, obj):
-        author = get_object_or_404(User, id=obj.id)
-        queryset = author.recipes.order_by('-created_at').all()
+    def _profile_recipes(self, obj):
+        if hasattr(obj, 'profile_recipes'):
+            return obj.profile_recipes
         paginator = AuthorRecipesPagination()
-        paginated_queryset = paginator.paginate_queryset(
-            queryset, request=self.context.get('request')
+        return paginator.paginate_queryset(
+            obj.recipes.order_by('-created_at'),
+            request=self.context.get('request'),
+        )
+
+    def get_recipes(self, obj):
+        serializer = RecipeShortSerializer(
+            self._profile_recipes(obj), many=True
         )
-        serializer = RecipeShortSerializer(paginated_queryset, many=True)
         return serializer.data
 
+    def get_recipe_ids(self, obj):
+        return [recipe.pk for recipe in self._profile_recipes(obj)]
+
     def get_recipes_count(self, obj):
-        author = get_object_or_404(User, id=obj.id)
-        queryset = author.recipes.all()
-        return queryset.count()
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
+        return obj.recipes.count()
 
 
 class SubscriptionsSeriealizer(serializers.ModelSerializer):
@@ -409,16 +666,14 @@ class SubscriptionsSeriealizer(serializers.ModelSerializer):
             UniqueTogetherValidator(
                 queryset=Subscriptions.objects.all(),
                 fields=('user', 'following'),
-                message="Вы уже подписаны на этого пользователя!",
+                message=SUBSCRIPTION_EXISTS_ERROR,
             ),
         ]
 
     def validate_following(self, data):
         user = self.context['request'].user
         if data == user:
-            raise serializers.ValidationError(
-                'Пользователь не может быть подписан на самого себя!'
-            )
+            raise serializers.ValidationError(SELF_SUBSCRIPTION_ERROR)
         return data
 
     def to_representation(self, instance):
@@ -446,16 +701,14 @@ class SubscribeSerializer(serializers.ModelSerializer):
             UniqueTogetherValidator(
                 queryset=Subscriptions.objects.all(),
                 fields=('user', 'following'),
-                message="Вы уже подписаны на этого пользователя!",
+                message=SUBSCRIPTION_EXISTS_ERROR,
             ),
         ]
 
     def validate_following(self, data):
         user = self.context['request'].user
         if data == user:
-            raise serializers.ValidationError(
-                'Пользователь не может быть подписан на самого себя!'
-            )
+            raise serializers.ValidationError(SELF_SUBSCRIPTION_ERROR)
         return data
 
     def to_representation(self, instance):
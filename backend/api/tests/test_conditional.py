@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, MeasurementUnit
+from recipes.tests.utils import LOCMEM_CACHES, create_recipe
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES, COMPRESSION_MIN_SIZE=0)
+class ConditionalGetTestCase(TestCase):
+    """Условный GET рецепта и списка рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='password'
+        )
+        unit = MeasurementUnit.objects.create(
+            full_name='грамм', short_name='г'
+        )
+        flour = Ingredient.objects.create(name='мука', measurement_unit=unit)
+        cls.recipe = create_recipe(author, {flour: 100})
+
+    def check_not_modified(self, url):
+        client = APIClient()
+        # Тело сжимается: ETag и Vary у 304 все равно как у 200.
+        response = client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+        not_modified = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(
+            not_modified.status_code, status.HTTP_304_NOT_MODIFIED
+        )
+        for header in ('ETag', 'Vary'):
+            self.assertEqual(not_modified[header], response[header])
+        return response, not_modified
+
+    def test_retrieve(self):
+        response, not_modified = self.check_not_modified(
+            f'/api/recipes/{self.recipe.pk}/'
+        )
+        self.assertEqual(
+            not_modified['Last-Modified'], response['Last-Modified']
+        )
+
+    def test_list(self):
+        self.check_not_modified('/api/recipes/')
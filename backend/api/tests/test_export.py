@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, MeasurementUnit
+from recipes.tests.utils import LOCMEM_CACHES, create_recipe
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ExportTestCase(TestCase):
+    """Выгрузка рецептов в NDJSON."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='password',
+            is_staff=True,
+        )
+        unit = MeasurementUnit.objects.create(
+            full_name='грамм', short_name='г'
+        )
+        flour = Ingredient.objects.create(name='мука', measurement_unit=unit)
+        cls.recipes = [
+            create_recipe(cls.staff, {flour: amount}) for amount in (1, 2, 3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def test_streamed_without_x_accel(self):
+        with override_settings(USE_X_ACCEL_REDIRECT=False):
+            response = self.client.get(
+                f'/api/recipes/export/?after={self.recipes[0].pk}'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines],
+            [recipe.pk for recipe in self.recipes[1:]],
+        )
+
+    def test_file_sent_by_nginx(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with override_settings(
+            USE_X_ACCEL_REDIRECT=True, PROTECTED_MEDIA_ROOT=directory.name
+        ):
+            response = self.client.get('/api/recipes/export/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected/exports/recipes-0.ndjson'
+        )
+        path = os.path.join(directory.name, 'exports', 'recipes-0.ndjson')
+        with open(path, encoding='utf-8') as file:
+            self.assertEqual(
+                [json.loads(line)['id'] for line in file],
+                [recipe.pk for recipe in self.recipes],
+            )
+        # Временных файлов не остается.
+        self.assertEqual(
+            os.listdir(os.path.dirname(path)), ['recipes-0.ndjson']
+        )
+
+    def test_not_staff(self):
+        self.client.force_authenticate(
+            User.objects.create_user(
+                username='user', email='user@example.com', password='x'
+            )
+        )
+        response = self.client.get('/api/recipes/export/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,235 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import utils as api_utils
+from jobs.models import Job
+from outbox.models import Event
+from outbox.registry import registry
+from recipes.models import (
+    Ingredient,
+    MeasurementUnit,
+    UserFavoriteRecipes,
+    UserShoppingCart,
+)
+from recipes.tests.utils import LOCMEM_CACHES, create_recipe
+from users import tasks as users_tasks
+from users.models import AuthorSuggestionRefresh, Subscriptions
+
+User = get_user_model()
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        password='password',
+        first_name=username,
+        last_name=username,
+    )
+
+
+@override_settings(CACHES=LOCMEM_CACHES, QUERY_BUDGET_STRICT=True)
+class ToggleTestCase(TestCase):
+    """
+    Добавление и удаление избранного, корзины и подписок. Бюджеты
+    запросов проверяются строго: превышение - QueryBudgetExceeded.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.author = create_user('author')
+        unit = MeasurementUnit.objects.create(
+            full_name='грамм', short_name='г'
+        )
+        cls.flour, cls.sugar = Ingredient.objects.bulk_create([
+            Ingredient(name='мука', measurement_unit=unit),
+            Ingredient(name='сахар', measurement_unit=unit),
+        ])
+        cls.cake = create_recipe(cls.author, {cls.flour: 200, cls.sugar: 50})
+        cls.bread = create_recipe(cls.author, {cls.flour: 500})
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def shopping_list(self):
+        return dict(
+            self.user.shopping_list.values_list('ingredient_id', 'amount')
+        )
+
+    def check_toggle(self, url, missing_url, model, **link):
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(model.objects.filter(user=self.user, **link).exists())
+        self.assertEqual(
+            self.client.post(url).status_code, status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(
+            self.client.post(missing_url).status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+
+        self.assertEqual(
+            self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT
+        )
+        self.assertFalse(
+            model.objects.filter(user=self.user, **link).exists()
+        )
+        self.assertEqual(
+            self.client.delete(url).status_code, status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(
+            self.client.delete(missing_url).status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+
+    def test_favorite(self):
+        self.check_toggle(
+            f'/api/recipes/{self.cake.pk}/favorite/',
+            '/api/recipes/0/favorite/',
+            UserFavoriteRecipes,
+            recipe=self.cake,
+        )
+
+    def test_shopping_cart(self):
+        self.check_toggle(
+            f'/api/recipes/{self.cake.pk}/shopping_cart/',
+            '/api/recipes/999999/shopping_cart/',
+            UserShoppingCart,
+            recipe=self.cake,
+        )
+
+    def test_subscribe(self):
+        self.check_toggle(
+            f'/api/users/{self.author.pk}/subscribe/',
+            '/api/users/999999/subscribe/',
+            Subscriptions,
+            following=self.author,
+        )
+
+    def test_non_numeric_id(self):
+        for url in (
+            '/api/recipes/abc/favorite/',
+            '/api/recipes/abc/shopping_cart/',
+            '/api/users/abc/subscribe/',
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.client.post(url).status_code,
+                    status.HTTP_404_NOT_FOUND,
+                )
+
+    def test_self_subscription_rejected(self):
+        response = self.client.post(f'/api/users/{self.user.pk}/subscribe/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Subscriptions.objects.filter(user=self.user).exists())
+
+    def test_anonymous(self):
+        self.client.credentials()
+        response = self.client.post(f'/api/recipes/{self.cake.pk}/favorite/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_shopping_list_amounts(self):
+        cake = f'/api/recipes/{self.cake.pk}/shopping_cart/'
+        bread = f'/api/recipes/{self.bread.pk}/shopping_cart/'
+        self.client.post(cake)
+        self.client.post(bread)
+        self.assertEqual(
+            self.shopping_list(), {self.flour.pk: 700, self.sugar.pk: 50}
+        )
+        # Повторное добавление не удваивает количества.
+        self.client.post(cake)
+        self.assertEqual(
+            self.shopping_list(), {self.flour.pk: 700, self.sugar.pk: 50}
+        )
+        self.client.delete(cake)
+        self.assertEqual(self.shopping_list(), {self.flour.pk: 500})
+        self.client.delete(bread)
+        self.assertEqual(self.shopping_list(), {})
+
+    def test_link_is_one_statement(self):
+        for model, field, target in (
+            (UserFavoriteRecipes, 'recipe', self.cake.pk),
+            (UserShoppingCart, 'recipe', self.cake.pk),
+            (Subscriptions, 'following', self.author.pk),
+        ):
+            with self.subTest(model=model.__name__):
+                with self.assertNumQueries(1):
+                    self.assertTrue(api_utils.add_link(
+                        model, field, self.user.pk, target
+                    ))
+                with self.assertNumQueries(1):
+                    self.assertFalse(api_utils.add_link(
+                        model, field, self.user.pk, target
+                    ))
+                with self.assertNumQueries(1):
+                    self.assertTrue(api_utils.remove_link(
+                        model, field, self.user.pk, target
+                    ))
+
+    def test_favorite_toggle_queries(self):
+        """Вставка связи и чтение рецепта для ответа - два запроса."""
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(2):
+            response = self.client.post(
+                f'/api/recipes/{self.cake.pk}/favorite/'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with self.assertNumQueries(1):
+            response = self.client.delete(
+                f'/api/recipes/{self.cake.pk}/favorite/'
+            )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        with self.assertNumQueries(2):
+            response = self.client.delete(
+                f'/api/recipes/{self.bread.pk}/favorite/'
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_subscribe_toggle_queries(self):
+        """
+        Вставка подписки, поля профиля автора и страница его рецептов;
+        пароль и признак подписки не читаются.
+        """
+        self.client.force_authenticate(self.user)
+        url = f'/api/users/{self.author.pk}/subscribe/'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['is_subscribed'])
+        self.assertEqual(response.data['recipes_count'], 2)
+        self.assertEqual(len(queries), 3)
+        profile = queries[1]['sql']
+        self.assertNotIn('password', profile)
+        self.assertNotIn('users_subscriptions', profile)
+        with self.assertNumQueries(1):
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_toggles_queue_suggestions_refresh(self):
+        """Пересчет рекомендаций ставит потребитель событий outbox."""
+        self.client.post(f'/api/recipes/{self.cake.pk}/favorite/')
+        self.client.post(f'/api/users/{self.author.pk}/subscribe/')
+        self.assertFalse(AuthorSuggestionRefresh.objects.exists())
+
+        # Тест идет в одной транзакции, а на PostgreSQL читатель outbox
+        # не видит событий незавершенных транзакций: события, которые
+        # записали триггеры, передаются потребителю напрямую.
+        item = registry['author-suggestions']
+        item.handler(list(Event.objects.filter(topic__in=item.topics)))
+        self.assertEqual(
+            list(AuthorSuggestionRefresh.objects.values_list(
+                'user_id', flat=True
+            )),
+            [self.user.pk],
+        )
+        self.assertTrue(Job.objects.filter(
+            name=users_tasks.refresh_author_suggestions.job_name
+        ).exists())
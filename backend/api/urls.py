@@ -18,4 +18,5 @@ urlpatterns = [
     path('', include(router_v1.urls)),
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
+    path('profiles/', include('diagnostics.urls')),
 ]
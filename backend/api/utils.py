@@ -1,10 +1,53 @@
+import hashlib
+import mimetypes
+import os
 import random
+import tempfile
+import time
 
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import (
+    BooleanField,
+    Count,
+    Exists,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_vary_headers,
+    quote_etag,
+)
+from django.utils.http import content_disposition_header, http_date
 from rest_framework import status
 from rest_framework.response import Response
 
+from api.pagination import AuthorRecipesPagination
+from api.serializers import BatchIdsSerializer
+from core.compression import negotiate
 from recipes.constants import CHARACTERS, SHORT_URL_LENGTH
-from recipes.models import ShortLink, RecipeIngredient, UserShoppingCart
+from recipes.models import (
+    Recipe,
+    ShortLink,
+    UserFavoriteRecipes,
+    UserShoppingCart,
+)
+from users.models import Subscriptions
+
+# Признаки рецепта, зависящие от пользователя (см. with_user_flags).
+USER_FLAGS = (
+    'favorited_by_user',
+    'in_user_shopping_cart',
+    'author_subscribed',
+)
+# Колонки, которые выводятся как есть (для only_fields).
+RECIPE_COLUMNS = ('name', 'image', 'text', 'cooking_time')
+USER_COLUMNS = ('email', 'username', 'first_name', 'last_name', 'avatar')
 
 
 def get_short_link(host):
@@ -17,30 +60,415 @@ def get_short_link(host):
             return short_url
 
 
-def get_shopping_cart(user):
-    """Получает список покупок пользователя."""
-    recipes = UserShoppingCart.objects.filter(user=user).select_related('recipe')
+def protected_file_path(name):
+    """Путь к файлу в PROTECTED_MEDIA_ROOT (каталоги создаются)."""
+    path = os.path.join(settings.PROTECTED_MEDIA_ROOT, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
 
-    if not recipes.exists():
-        return Response(status=status.HTTP_400_BAD_REQUEST)
 
-    shopping_list = {}
+def write_protected_file(name, write):
+    """
+    Записывает файл name в PROTECTED_MEDIA_ROOT: write(file) пишет
+    текст во временный файл, который затем атомарно подменяет name.
+    nginx, который еще отдает прежний файл, дочитает его целиком.
+    """
+    path = protected_file_path(name)
+    with tempfile.NamedTemporaryFile(
+        'w', encoding='utf-8', dir=os.path.dirname(path), delete=False
+    ) as file:
+        try:
+            write(file)
+        except BaseException:
+            os.unlink(file.name)
+            raise
+    os.replace(file.name, path)
+
+
+def prune_protected_files(directory, max_age):
+    """
+    Удаляет файлы каталога directory в PROTECTED_MEDIA_ROOT старше
+    max_age секунд (отдаваемый nginx файл он дочитает).
+    """
+    path = os.path.join(settings.PROTECTED_MEDIA_ROOT, directory)
+    if not os.path.isdir(path):
+        return
+    expired = time.time() - max_age
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.stat().st_mtime < expired:
+                os.unlink(entry.path)
+
 
-    for user_recipe in recipes:
-        recipe_ingredients = RecipeIngredient.objects.filter(recipe=user_recipe.recipe).select_related('ingredient')
+def send_protected_file(name, filename=None, as_attachment=True):
+    """
+    Отдает файл из PROTECTED_MEDIA_ROOT.
 
-        for item in recipe_ingredients:
-            ingredient_name = item.ingredient.name
-            measurement_unit = item.ingredient.measurement_unit.short_name
-            ingredient_key = f'{ingredient_name} ({measurement_unit})'
+    Права доступа проверяет вызывающая вьюха. При USE_X_ACCEL_REDIRECT
+    ответ пустой: файл отправит nginx из internal-локации
+    PROTECTED_MEDIA_URL, не занимая воркер. Иначе (локально) файл
+    отдается через FileResponse.
+    """
+    filename = filename or os.path.basename(name)
+    if not settings.USE_X_ACCEL_REDIRECT:
+        return FileResponse(
+            open(os.path.join(settings.PROTECTED_MEDIA_ROOT, name), 'rb'),
+            as_attachment=as_attachment,
+            filename=filename,
+        )
 
-            if ingredient_key in shopping_list:
-                shopping_list[ingredient_key] += item.amount
-            else:
-                shopping_list[ingredient_key] = item.amount
+    response = HttpResponse()
+    content_type, encoding = mimetypes.guess_type(filename)
+    response['Content-Type'] = content_type or 'application/octet-stream'
+    response['Content-Disposition'] = content_disposition_header(
+        as_attachment, filename
+    )
+    response['X-Accel-Redirect'] = settings.PROTECTED_MEDIA_URL + name
+    return response
+
+
+def get_shopping_cart(user):
+    """Получает список покупок пользователя."""
+    items = user.shopping_list.select_related(
+        'ingredient__measurement_unit'
+    ).order_by('ingredient__name')
+
+    if not items.exists():
+        return Response(status=status.HTTP_400_BAD_REQUEST)
 
     shopping_cart = [
-        f'{ingredient} - {amount}\n' for ingredient, amount in shopping_list.items()
+        f'{item.ingredient.name} '
+        f'({item.ingredient.measurement_unit.short_name}) - {item.amount}\n'
+        for item in items
     ]
 
     return shopping_cart
+
+
+def with_user_flags(queryset, user, flags=USER_FLAGS):
+    """
+    Добавляет к рецептам признаки, зависящие от пользователя:
+    в избранном, в списке покупок, подписан ли он на автора
+    (только перечисленные во flags).
+    """
+    if not user.is_authenticated:
+        false = Value(False, output_field=BooleanField())
+        return queryset.annotate(**{flag: false for flag in flags})
+    subqueries = {
+        'favorited_by_user': UserFavoriteRecipes.objects.filter(
+            recipe=OuterRef('pk'), user=user
+        ),
+        'in_user_shopping_cart': UserShoppingCart.objects.filter(
+            recipe=OuterRef('pk'), user=user
+        ),
+        'author_subscribed': Subscriptions.objects.filter(
+            following=OuterRef('author'), user=user
+        ),
+    }
+    return queryset.annotate(
+        **{flag: Exists(subqueries[flag]) for flag in flags}
+    )
+
+
+def recipe_user_flags(fieldset):
+    """Признаки with_user_flags, которые нужны выбранным полям рецепта."""
+    if fieldset is None:
+        return USER_FLAGS
+    needed = {
+        'favorited_by_user': 'is_favorited' in fieldset,
+        'in_user_shopping_cart': 'is_in_shopping_cart' in fieldset,
+        'author_subscribed': fieldset.expands('author'),
+    }
+    return tuple(flag for flag in USER_FLAGS if needed[flag])
+
+
+def recipe_version_fields(fieldset):
+    """
+    Поля, по которым вычисляется версия представления рецепта (ETag):
+    из признаков пользователя - только те, что есть в ответе.
+    """
+    return ('pk', 'updated_at', *recipe_user_flags(fieldset))
+
+
+def only_fields(queryset, fieldset, columns, *required):
+    """
+    only() колонок из columns, выбранных в fieldset, и колонок required.
+    Без выбора queryset не меняется.
+    """
+    if fieldset is None:
+        return queryset
+    return queryset.only(
+        *required, *(column for column in columns if column in fieldset)
+    )
+
+
+def with_subscription_flag(queryset, user):
+    """Добавляет к пользователям признак подписки на них user."""
+    if not user.is_authenticated:
+        return queryset.annotate(
+            subscribed_by_user=Value(False, output_field=BooleanField())
+        )
+    return queryset.annotate(subscribed_by_user=Exists(
+        Subscriptions.objects.filter(following=OuterRef('pk'), user=user)
+    ))
+
+
+def with_author_profile(queryset, request, fieldset=None, subscribed=None):
+    """
+    Подготавливает авторов для AuthorProfileSerializer: признак подписки,
+    число рецептов и страница рецептов (recipes_limit) загружаются
+    на всех авторов сразу, а не отдельными запросами на каждого.
+
+    С выбором полей (api.fieldsets) загружается только то, что есть
+    в ответе. subscribed - уже известный признак подписки на всех
+    авторов (тогда он не запрашивается).
+    """
+    def needed(field):
+        return fieldset is None or field in fieldset
+
+    if subscribed is not None:
+        queryset = queryset.annotate(
+            subscribed_by_user=Value(subscribed, output_field=BooleanField())
+        )
+    elif needed('is_subscribed'):
+        queryset = with_subscription_flag(queryset, request.user)
+    if needed('recipes_count'):
+        queryset = queryset.annotate(recipes_count=Coalesce(
+            Subquery(
+                Recipe.objects.filter(author=OuterRef('pk'))
+                .order_by()
+                .values('author')
+                .annotate(count=Count('pk'))
+                .values('count')
+            ),
+            0,
+        ))
+    if needed('recipes'):
+        paginator = AuthorRecipesPagination()
+        limit = paginator.get_limit(request)
+        offset = paginator.get_offset(request)
+        recipes = Recipe.objects.order_by('-created_at')
+        if fieldset is not None and fieldset.collapses('recipes'):
+            recipes = recipes.only('author')
+        queryset = queryset.prefetch_related(Prefetch(
+            'recipes',
+            queryset=recipes[offset:offset + limit],
+            to_attr='profile_recipes',
+        ))
+    return only_fields(queryset, fieldset, USER_COLUMNS)
+
+
+def conditional_get(request, version, last_modified=None):
+    """
+    Проверяет If-None-Match/If-Modified-Since запроса.
+
+    version - данные, от которых зависит ответ (id и updated_at
+    рецептов, признаки пользователя). Возвращает ETag и ответ 304,
+    либо None, если ответ нужно сформировать заново. Заголовки
+    проставляет set_conditional_headers - и ответу 304 тоже.
+
+    ETag слабый: он описывает версию данных, а не байты тела, которое
+    core.compression сжимает по Accept-Encoding. Поэтому у ответов 200
+    и 304 он одинаковый при любом сжатии.
+    """
+    source = (
+        request.get_full_path(),
+        request.META.get('HTTP_ACCEPT'),
+        request.user.pk,
+        version,
+    )
+    etag = 'W/' + quote_etag(hashlib.md5(repr(source).encode()).hexdigest())
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified and int(last_modified.timestamp()),
+    )
+    return etag, response
+
+
+def set_conditional_headers(response, etag, last_modified=None):
+    """Проставляет ETag/Last-Modified, полученные в conditional_get."""
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Ответ зависит от пользователя: токен или сессия (SessionAuthentication).
+    # Accept-Encoding добавил бы core.compression к 200, но не к 304.
+    patch_vary_headers(
+        response, ('Accept', 'Authorization', 'Cookie', 'Accept-Encoding')
+    )
+    return response
+
+
+def snapshot_response(request, snapshot):
+    """
+    Ответ из готовых байтов снимка (см. recipes.catalog).
+
+    Сжатый вариант выбирается по Accept-Encoding; у каждого варианта
+    свой ETag, при совпадении с If-None-Match - ответ 304.
+    """
+    encoding = negotiate(
+        request.META.get('HTTP_ACCEPT_ENCODING', ''), snapshot.bodies
+    )
+    etag = quote_etag(
+        f'{snapshot.version}-{encoding}' if encoding else snapshot.version
+    )
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(
+            snapshot.bodies[encoding], content_type='application/json'
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def get_requested_ids(request, param='ids'):
+    """
+    id из ?ids=1,2,3 без повторов, в порядке запроса, или None, если
+    параметра нет. Не числа и больше BATCH_MAX_SIZE id - ошибка 400.
+    """
+    if param not in request.query_params:
+        return None
+    serializer = BatchIdsSerializer(data={'ids': [
+        part for part in request.query_params[param].split(',')
+        if part.strip()
+    ]})
+    serializer.is_valid(raise_exception=True)
+    return list(dict.fromkeys(serializer.validated_data['ids']))
+
+
+def multi_get(view, queryset, ids):
+    """
+    Ответ на запрос нескольких объектов по id (?ids=): объекты в
+    порядке запроса и id, которых нет. Объекты читаются одним запросом
+    (плюс prefetch queryset), без пагинации.
+    """
+    objects = queryset.order_by().in_bulk(ids)
+    serializer = view.get_serializer(
+        [objects[pk] for pk in ids if pk in objects], many=True
+    )
+    return Response(
+        {
+            'results': serializer.data,
+            'missing': [pk for pk in ids if pk not in objects],
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+def apply_batch(user, model, field, ids, targets, delete=False,
+                forbidden_ids=()):
+    """
+    Добавляет/удаляет связи пользователя с объектами из списка ids.
+
+    model - промежуточная модель (избранное, корзина, подписки),
+    field - её поле, ссылающееся на объект, targets - queryset объектов.
+    Все изменения выполняются одним bulk-запросом в транзакции,
+    повторы игнорируются. Возвращает результат для каждого id.
+    """
+    ids = list(dict.fromkeys(ids))
+    found = set(
+        targets.filter(pk__in=ids).values_list('pk', flat=True)
+    ) - set(forbidden_ids)
+    related = model.objects.filter(user=user, **{f'{field}__in': ids})
+
+    with transaction.atomic():
+        existing = set(related.values_list(f'{field}_id', flat=True))
+        if delete:
+            related.delete()
+        else:
+            model.objects.bulk_create(
+                [
+                    model(user=user, **{f'{field}_id': pk})
+                    for pk in ids if pk in found and pk not in existing
+                ],
+                ignore_conflicts=True,
+            )
+
+    results = []
+    for pk in ids:
+        if pk in forbidden_ids:
+            outcome = 'forbidden'
+        elif pk not in found:
+            outcome = 'not_found'
+        elif delete:
+            outcome = 'deleted' if pk in existing else 'missing'
+        else:
+            outcome = 'exists' if pk in existing else 'created'
+        results.append({'id': pk, 'status': outcome})
+    return results
+
+
+def parse_pk(value):
+    """id объекта из URL или None, если это не положительное целое."""
+    try:
+        pk = int(value)
+    except (TypeError, ValueError):
+        return None
+    return pk if pk > 0 else None
+
+
+def add_link(model, field, user_id, target_pk, exclude_pk=None):
+    """
+    Добавляет связь пользователя с объектом (избранное, корзина,
+    подписка) одним запросом: INSERT ... SELECT из таблицы объекта
+    ON CONFLICT DO NOTHING, без отдельных проверок существования.
+
+    Возвращает True, если связь добавлена, и False, если она уже была
+    или объекта target_pk нет (либо это exclude_pk). Сигналы post_save
+    не отправляются.
+    """
+    meta = model._meta
+    target = meta.get_field(field)
+    target_meta = target.related_model._meta
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    instance = model(user_id=user_id, **{target.attname: target_pk})
+
+    columns, selected, params = [], [], []
+    for model_field in meta.concrete_fields:
+        if model_field.primary_key and model_field.db_returning:
+            continue
+        columns.append(quote(model_field.column))
+        if model_field is target:
+            selected.append(quote(target_meta.pk.column))
+            continue
+        selected.append('%s')
+        params.append(model_field.get_db_prep_save(
+            model_field.pre_save(instance, add=True), connection
+        ))
+
+    conditions = [f'{quote(target_meta.pk.column)} = %s']
+    params.append(target_pk)
+    if exclude_pk is not None:
+        conditions.append(f'{quote(target_meta.pk.column)} <> %s')
+        params.append(exclude_pk)
+    sql = (
+        f'INSERT INTO {quote(meta.db_table)} ({", ".join(columns)}) '
+        f'SELECT {", ".join(selected)} FROM {quote(target_meta.db_table)} '
+        f'WHERE {" AND ".join(conditions)} ON CONFLICT DO NOTHING'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount > 0
+
+
+def remove_link(model, field, user_id, target_pk):
+    """
+    Удаляет связь пользователя с объектом одним DELETE (без выборки
+    удаляемых строк, как у QuerySet.delete). Возвращает True, если связь
+    была. Сигналы post_delete не отправляются.
+    """
+    meta = model._meta
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    sql = (
+        f'DELETE FROM {quote(meta.db_table)} '
+        f'WHERE {quote(meta.get_field("user").column)} = %s '
+        f'AND {quote(meta.get_field(field).column)} = %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, target_pk])
+        return cursor.rowcount > 0
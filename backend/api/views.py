@@ -1,13 +1,29 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.utils import IntegrityError
+from django.db import transaction
+from django.db.models import Count, Prefetch, Window
+from django.utils.functional import cached_property
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import FileResponse
+from django.http import StreamingHttpResponse
 from rest_framework import permissions, viewsets, status
 from rest_framework.decorators import action
 from rest_framework import filters
 from rest_framework.response import Response
 
-from recipes import models as rec_mod
+from recipes import catalog, models as rec_mod
+from recipes.constants import (
+    COUNT_ESTIMATE,
+    COUNT_EXACT,
+    EXPORT_FILE_TTL,
+    EXPORTS_DIR,
+)
+from recipes.export import iter_recipes_ndjson, write_recipes_ndjson
+from recipes.utils import (
+    add_recipe_to_shopping_list,
+    rebuild_shopping_lists,
+    remove_recipe_from_shopping_list,
+)
+from api.fieldsets import Fieldset
 from api import (
     serializers as api_ser,
     pagination as api_pag,
@@ -24,13 +40,27 @@ User = get_user_model()
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     """Получение ингредиентов рецепта. ReadOnly."""
 
-    queryset = rec_mod.Ingredient.objects.all()
+    queryset = rec_mod.Ingredient.objects.select_related('measurement_unit')
     serializer_class = api_ser.IngredientSerializer
     permission_classes = (permissions.AllowAny,)
     pagination_class = None
+    query_budget = 2
     filter_backends = [DjangoFilterBackend]
     filterset_class = api_filter.IngredientFilterSet
 
+    def list(self, request, *args, **kwargs):
+        """
+        Весь каталог (без фильтра) отдается из готового снимка, без ORM
+        и сериализации (см. recipes.catalog).
+        """
+        filtered = any(
+            request.query_params.get(name)
+            for name in self.filterset_class.base_filters
+        )
+        if filtered or request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        return api_utils.snapshot_response(request, catalog.get_snapshot())
+
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     """Получение тегов рецепта. ReadOnly."""
@@ -39,6 +69,7 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = api_ser.TagSerializer
     permission_classes = (permissions.AllowAny,)
     pagination_class = None
+    query_budget = 2
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -47,10 +78,22 @@ class RecipeViewSet(viewsets.ModelViewSet):
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
     permission_classes = (api_per.IsAuthorOrReadOnly,)
     pagination_class = api_pag.RecipePagination
+    # Число SQL-запросов с учетом аутентификации, холодного кеша и
+    # проверки slug в фильтре по тегам (см. diagnostics.budget).
+    query_budget = {
+        'list': 9,
+        'retrieve': 7,
+        'similar': 3,
+        'shopping_list': 3,
+        'download_shopping_cart': 4,
+        'get_link': 8,
+        'favorite': 5,
+        'shopping_cart': 6,
+    }
     filter_backends = (
         DjangoFilterBackend,
         filters.SearchFilter,
-        filters.OrderingFilter,
+        api_filter.RecipeOrderingFilter,
     )
     filterset_class = api_filter.RecipeTagsFilter
 
@@ -59,17 +102,150 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return (permissions.IsAuthenticatedOrReadOnly(),)
         return super().get_permissions()
 
+    @cached_property
+    def fieldset(self):
+        """Поля ответа, выбранные ?fields= и ?expand= (api.fieldsets)."""
+        if self.action not in ('list', 'retrieve'):
+            return None
+        return Fieldset.from_request(
+            self.request, api_ser.RecipeFullSerializer
+        )
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'fieldset': self.fieldset}
+
     def get_queryset(self):
         queryset = rec_mod.Recipe.objects.all()
 
         if self.action in ["list", "retrieve"]:
-            queryset = (
-                queryset.select_related('author')
-                .prefetch_related('ingredients', 'tags')
-                .order_by('-created_at')
-            )
+            # Связи не подгружаются: общая часть рецептов берется из кеша
+            # (см. RecipeFullSerializer), признаки пользователя - из
+            # аннотаций.
+            queryset = api_utils.with_user_flags(
+                queryset,
+                self.request.user,
+                api_utils.recipe_user_flags(self.fieldset),
+            ).order_by('-created_at')
+            queryset = self._narrow_to_fieldset(queryset)
+        return queryset
+
+    def _narrow_to_fieldset(self, queryset):
+        """
+        Только колонки выбранных полей. Развернутые связи берутся из
+        кеша фрагментов, свернутые подгружаются без лишних колонок.
+        """
+        fieldset = self.fieldset
+        if fieldset is None:
+            return queryset
+        uses_fragments = api_ser.RecipeFullSerializer.uses_fragments(fieldset)
+        required = []
+        if uses_fragments:
+            # Ключ кеша фрагмента зависит от updated_at.
+            required.append('updated_at')
+        if 'author' in fieldset:
+            required.append('author')
+        queryset = api_utils.only_fields(
+            queryset, fieldset, api_utils.RECIPE_COLUMNS, *required
+        )
+        if uses_fragments:
+            return queryset
+        if fieldset.collapses('tags'):
+            queryset = queryset.prefetch_related(Prefetch(
+                'tags', queryset=rec_mod.Tag.objects.only('pk')
+            ))
+        if fieldset.collapses('ingredients'):
+            queryset = queryset.prefetch_related(Prefetch(
+                'recipe_ingredients',
+                queryset=rec_mod.RecipeIngredient.objects.only(
+                    'recipe', 'ingredient', 'amount'
+                ),
+            ))
         return queryset
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Рецепт с поддержкой условного GET.
+
+        Last-Modified отдается только анонимным пользователям: для
+        остальных ответ зависит еще и от избранного/корзины/подписок,
+        изменения которых учитывает только ETag.
+        """
+        try:
+            version = api_utils.with_user_flags(
+                rec_mod.Recipe.objects.filter(pk=self.kwargs['pk']),
+                request.user,
+                api_utils.recipe_user_flags(self.fieldset),
+            ).values_list(
+                *api_utils.recipe_version_fields(self.fieldset)
+            ).first()
+        except ValueError:
+            version = None
+        if version is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        last_modified = None
+        if not request.user.is_authenticated:
+            last_modified = version[1]
+        etag, not_modified = api_utils.conditional_get(
+            request, version, last_modified
+        )
+        if not_modified is not None:
+            # У 304 те же ETag и Vary, что были бы у 200 (RFC 9110).
+            return api_utils.set_conditional_headers(
+                not_modified, etag, last_modified
+            )
+        response = super().retrieve(request, *args, **kwargs)
+        return api_utils.set_conditional_headers(
+            response, etag, last_modified
+        )
+
+    def list(self, request, *args, **kwargs):
+        """
+        Список рецептов с поддержкой условного GET (ETag).
+
+        Версия страницы - id, updated_at и признаки пользователя для
+        рецептов на странице плюс число строк во всей выборке; все это
+        читается одним запросом без сериализации. Без точного count
+        (?count=estimate/none) вместо числа строк берется следующий за
+        страницей рецепт и оценка count (см. api.pagination).
+
+        С ?ids=1,2,3 - рецепты с этими id в порядке запроса, без
+        фильтров и пагинации (см. api.utils.multi_get).
+        """
+        ids = api_utils.get_requested_ids(request)
+        if ids is not None:
+            return api_utils.multi_get(self, self.get_queryset(), ids)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        limit = self.paginator.get_limit(request)
+        offset = self.paginator.get_offset(request)
+        count_mode = self.paginator.get_count_mode(request)
+        if count_mode == COUNT_EXACT:
+            version = list(
+                queryset.annotate(total=Window(Count('pk')))
+                .values_list(
+                    *api_utils.recipe_version_fields(self.fieldset), 'total'
+                )
+                [offset:offset + limit]
+            )
+        else:
+            version = list(
+                queryset.values_list(
+                    *api_utils.recipe_version_fields(self.fieldset)
+                )
+                [offset:offset + limit + 1]
+            )
+        if not version:
+            return super().list(request, *args, **kwargs)
+        if count_mode == COUNT_ESTIMATE:
+            version.append(self.paginator.estimate_count(queryset))
+
+        etag, not_modified = api_utils.conditional_get(request, version)
+        if not_modified is not None:
+            return api_utils.set_conditional_headers(not_modified, etag)
+        response = super().list(request, *args, **kwargs)
+        return api_utils.set_conditional_headers(response, etag)
+
     def get_serializer_class(self):
         if self.action == 'get_link':
             return None
@@ -79,6 +255,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return api_ser.FavoriteRecipesSerializer
         elif self.action == 'list':
             return api_ser.RecipeFullSerializer
+        elif self.action in ('favorite_batch', 'shopping_cart_batch'):
+            return api_ser.BatchIdsSerializer
         return api_ser.RecipeCreateSerializer
 
     @action(
@@ -91,14 +269,64 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Метод для получения списка покупок."""
         user = self.request.user
         shopping_cart = api_utils.get_shopping_cart(user=user)
+        if isinstance(shopping_cart, Response):
+            return shopping_cart
 
-        with open("shopping_cart.txt", "w", encoding='utf-8') as file:
+        name = f'shopping_carts/{user.id}.txt'
+        path = api_utils.protected_file_path(name)
+        with open(path, "w", encoding='utf-8') as file:
             file.writelines(shopping_cart)
 
-        return FileResponse(
-            open("shopping_cart.txt", "rb"),
-            as_attachment=True,
+        return api_utils.send_protected_file(name, 'shopping_cart.txt')
+
+    @action(
+        methods=['get'],
+        detail=False,
+        url_path='export',
+        permission_classes=[permissions.IsAdminUser, ],
+    )
+    def export(self, request, *args, **kwargs):
+        """
+        Выгрузка всех рецептов в NDJSON (для персонала).
+
+        При USE_X_ACCEL_REDIRECT выгрузка пишется в файл, а клиенту ее
+        отправляет nginx: воркер занят только чтением из базы, а не
+        всей передачей. Иначе (локально) она отдается потоком.
+        """
+        try:
+            after = int(request.query_params.get('after', 0))
+        except ValueError:
+            return Response(
+                {'detail': 'Invalid after'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if not settings.USE_X_ACCEL_REDIRECT:
+            return StreamingHttpResponse(
+                iter_recipes_ndjson(after=after),
+                content_type='application/x-ndjson',
+            )
+
+        api_utils.prune_protected_files(EXPORTS_DIR, EXPORT_FILE_TTL)
+        name = f'{EXPORTS_DIR}/recipes-{after}.ndjson'
+        api_utils.write_protected_file(
+            name, lambda file: write_recipes_ndjson(file, after=after)
         )
+        response = api_utils.send_protected_file(name, 'recipes.ndjson')
+        response['Content-Type'] = 'application/x-ndjson'
+        return response
+
+    @action(
+        methods=['get'],
+        detail=False,
+        url_path='shopping_list',
+        permission_classes=[permissions.IsAuthenticated, ]
+    )
+    def shopping_list(self, request, *args, **kwargs):
+        """Метод для получения суммарного списка покупок в JSON."""
+        items = request.user.shopping_list.select_related(
+            'ingredient__measurement_unit'
+        ).order_by('ingredient__name')
+        serializer = api_ser.ShoppingListItemSerializer(items, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(
         methods=['post', 'delete'],
@@ -110,38 +338,19 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def shopping_cart(self, request, *args, **kwargs):
         """Метод для добавления/удаления рецепта из списка покупок."""
-        try:
-            recipe = rec_mod.Recipe.objects.get(pk=self.kwargs['pk'])
-
-        except rec_mod.Recipe.DoesNotExist:
-            return Response(status=status.HTTP_404_NOT_FOUND)
-
-        user = self.request.user
-
-        if request.method == 'POST':
-            try:
-                serializer = self.get_serializer(
-                    data={'recipe': recipe.pk},
-                    context={'request': request},
-                )
-                serializer.is_valid(raise_exception=True)
-                serializer.save(user=user)
-                headers = self.get_success_headers(serializer.data)
-                return Response(
-                    serializer.data,
-                    status=status.HTTP_201_CREATED,
-                    headers=headers,
-                )
-            except IntegrityError:
-                return Response(status=status.HTTP_400_BAD_REQUEST)
-
-        instance = rec_mod.UserShoppingCart.objects.filter(
-            recipe=recipe, user=user
-        ).all()
-        if instance.exists():
-            instance.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        pk = api_utils.parse_pk(self.kwargs['pk'])
+        # Корзина и суммарный список покупок меняются вместе.
+        with transaction.atomic():
+            response, changed = self._toggle(
+                request, rec_mod.UserShoppingCart, pk
+            )
+            if changed:
+                # Связь меняется в обход ORM, сигналы не отправляются.
+                if request.method == 'POST':
+                    add_recipe_to_shopping_list(request.user.id, pk)
+                else:
+                    remove_recipe_from_shopping_list(request.user.id, pk)
+        return response
 
     @action(
         methods=['post', 'delete'],
@@ -150,34 +359,122 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[permissions.IsAuthenticated, ]
     )
     def favorite(self, request, *args, **kwargs):
-        """Метод для добавления/удаления рецепта из избранного."""
-        try:
-            recipe = rec_mod.Recipe.objects.get(pk=self.kwargs['pk'])
+        """
+        Метод для добавления/удаления рецепта из избранного.
+
+        Рекомендации авторов пересчитываются по событию outbox (см.
+        users.consumers), здесь - только запросы _toggle.
+        """
+        response, _ = self._toggle(
+            request,
+            rec_mod.UserFavoriteRecipes,
+            api_utils.parse_pk(self.kwargs['pk']),
+            exists_detail=api_ser.FAVORITE_EXISTS_ERROR,
+        )
+        return response
 
-        except rec_mod.Recipe.DoesNotExist:
-            return Response(status=status.HTTP_404_NOT_FOUND)
+    def _toggle(self, request, model, pk, exists_detail=None):
+        """
+        Добавляет (POST) или удаляет (DELETE) рецепт в избранном/корзине
+        пользователя: одна вставка или удаление и, если нужно, один
+        запрос рецепта для ответа или для выбора между 400 и 404.
+
+        Возвращает ответ и признак того, что связь изменилась.
+        """
+        if pk is None:
+            return Response(status=status.HTTP_404_NOT_FOUND), False
+        recipes = rec_mod.Recipe.objects.filter(pk=pk)
 
-        user = self.request.user
         if request.method == 'POST':
-            serializer = self.get_serializer(
-                data={'recipe': recipe.pk},
-                context={'request': request},
+            created = api_utils.add_link(model, 'recipe', request.user.id, pk)
+            recipe = recipes.only(
+                *api_ser.RecipeShortSerializer.Meta.fields
+            ).first()
+            if recipe is None:
+                return Response(status=status.HTTP_404_NOT_FOUND), False
+            if not created:
+                data = (
+                    {'non_field_errors': [exists_detail]}
+                    if exists_detail else None
+                )
+                return (
+                    Response(data, status=status.HTTP_400_BAD_REQUEST),
+                    False,
+                )
+            serializer = api_ser.RecipeShortSerializer(
+                recipe, context=self.get_serializer_context()
             )
-            serializer.is_valid(raise_exception=True)
-            serializer.save(user=user)
-            headers = self.get_success_headers(serializer.data)
             return Response(
-                serializer.data,
-                status=status.HTTP_201_CREATED,
-                headers=headers,
-            )
+                serializer.data, status=status.HTTP_201_CREATED
+            ), True
+
+        if api_utils.remove_link(model, 'recipe', request.user.id, pk):
+            return Response(status=status.HTTP_204_NO_CONTENT), True
+        if not recipes.exists():
+            return Response(status=status.HTTP_404_NOT_FOUND), False
+        return Response(status=status.HTTP_400_BAD_REQUEST), False
+
+    def _apply_batch(self, request, model):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return api_utils.apply_batch(
+            user=request.user,
+            model=model,
+            field='recipe',
+            ids=serializer.validated_data['ids'],
+            targets=rec_mod.Recipe.objects.all(),
+            delete=request.method == 'DELETE',
+        )
+
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        url_path='favorite/batch',
+        permission_classes=[permissions.IsAuthenticated, ]
+    )
+    def favorite_batch(self, request, *args, **kwargs):
+        """Метод для добавления/удаления списка рецептов в избранном."""
+        results = self._apply_batch(request, rec_mod.UserFavoriteRecipes)
+        return Response({'results': results}, status=status.HTTP_200_OK)
 
-        instance = rec_mod.UserFavoriteRecipes.objects.filter(
-            recipe=recipe, user=user).all()
-        if not instance:
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-        instance.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        url_path='shopping_cart/batch',
+        permission_classes=[permissions.IsAuthenticated, ]
+    )
+    def shopping_cart_batch(self, request, *args, **kwargs):
+        """Метод для добавления/удаления списка рецептов в корзине."""
+        results = self._apply_batch(request, rec_mod.UserShoppingCart)
+        if any(item['status'] == 'created' for item in results):
+            # bulk_create не отправляет post_save.
+            rebuild_shopping_lists([request.user.id])
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @action(
+        methods=['get', ],
+        detail=True,
+        url_path='similar',
+        permission_classes=[permissions.AllowAny, ],
+    )
+    def similar(self, request, *args, **kwargs):
+        """Метод для получения похожих рецептов."""
+        pk = api_utils.parse_pk(self.kwargs['pk'])
+        if pk is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        similar = [
+            item.similar for item in
+            rec_mod.SimilarRecipe.objects.filter(recipe_id=pk)
+            .select_related('similar').order_by('-score')
+        ]
+        if not similar and not rec_mod.Recipe.objects.filter(
+            pk=pk
+        ).exists():
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        serializer = api_ser.RecipeShortSerializer(
+            similar, many=True, context={'request': request}
+        )
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(
         methods=['get', ],
@@ -191,19 +488,25 @@ class RecipeViewSet(viewsets.ModelViewSet):
         try:
             recipe = rec_mod.Recipe.objects.get(pk=self.kwargs['pk'])
         except rec_mod.Recipe.DoesNotExist:
-            return Response({'detail': 'Recipe not found.'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(
+                {'detail': 'Recipe not found.'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
         except ValueError:
-            return Response({'detail': 'Invalid ID'}, status=status.HTTP_400_BAD_REQUEST)
-
-        host_url = self.request.get_host()
-        instance = rec_mod.ShortLink.objects.filter(recipe=recipe)
-
-        if not instance.exists():
-            short_link = api_utils.get_short_link(host=host_url)
             return Response(
-                {'short-link': short_link}, status=status.HTTP_200_OK
+                {'detail': 'Invalid ID'}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        instance = rec_mod.ShortLink.objects.filter(recipe=recipe)[0]
+        host_url = self.request.get_host()
+        instance = rec_mod.ShortLink.objects.filter(recipe=recipe).first()
+
+        if instance is None:
+            instance, _ = rec_mod.ShortLink.objects.get_or_create(
+                recipe=recipe,
+                defaults={
+                    'short_url': api_utils.get_short_link(host=host_url),
+                    'full_url': f'https://{host_url}/recipes/{recipe.pk}/',
+                },
+            )
         short_link = instance.short_url
         return Response({'short-link': short_link}, status=status.HTTP_200_OK)
@@ -0,0 +1,351 @@
+"""
+Кеш Django в файле SQLite, общий для всех процессов на машине.
+
+    CACHES = {'default': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': '/path/to/cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 100000, 'MAX_SIZE': 256 * 1024 ** 2},
+    }}
+
+Воркеры gunicorn и обработчики фоновых задач видят одни и те же записи
+и счетчики (throttling, кеш фрагментов), и кеш не остывает после
+перезапуска. Внешний сервис не нужен: файл открывается в режиме WAL
+(чтение не ждет записи) и читается через mmap.
+
+Размер ограничен MAX_ENTRIES записей и MAX_SIZE байт значений. При
+превышении удаляются просроченные записи, затем 1/CULL_FREQUENCY
+записей, которые дольше всех не читали (LRU). Время чтения обновляется
+не чаще раза в LRU_RESOLUTION секунд, чтобы чтение горячих ключей не
+превращалось в запись. Целые числа хранятся как INTEGER, так что incr -
+один атомарный UPDATE (нужен SQLite 3.35+ для RETURNING).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+DEFAULT_LRU_RESOLUTION = 10
+DEFAULT_BUSY_TIMEOUT = 5
+# Ключей в одном запросе IN (...).
+KEYS_CHUNK_SIZE = 500
+INT_MIN, INT_MAX = -2 ** 63, 2 ** 63 - 1
+INT_RANGE = range(INT_MIN, INT_MAX + 1)
+
+SCHEMA = """
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT NOT NULL UNIQUE,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    entries INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_stats VALUES (1, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_inserted AFTER INSERT ON cache BEGIN
+    UPDATE cache_stats SET entries = entries + 1, size = size + NEW.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_deleted AFTER DELETE ON cache BEGIN
+    UPDATE cache_stats SET entries = entries - 1, size = size - OLD.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_resized AFTER UPDATE OF size ON cache
+BEGIN
+    UPDATE cache_stats SET size = size - OLD.size + NEW.size;
+END;
+COMMIT;
+"""
+
+UPSERT = """
+INSERT INTO cache (key, value, size, expires, accessed)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    value = excluded.value,
+    size = excluded.size,
+    expires = excluded.expires,
+    accessed = excluded.accessed
+"""
+ALIVE = '(expires IS NULL OR expires > ?)'
+
+
+def _encode(value):
+    """Значение для колонки value и его размер в байтах."""
+    if type(value) is int and value in INT_RANGE:
+        return value, 8
+    data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    return data, len(data)
+
+
+def _decode(value):
+    if isinstance(value, int):
+        return value
+    return pickle.loads(value)
+
+
+def _chunks(items, size=KEYS_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', DEFAULT_MAX_SIZE))
+        self._mmap_size = int(options.get('MMAP_SIZE', DEFAULT_MMAP_SIZE))
+        self._lru_resolution = float(
+            options.get('LRU_RESOLUTION', DEFAULT_LRU_RESOLUTION)
+        )
+        self._busy_timeout = float(
+            options.get('BUSY_TIMEOUT', DEFAULT_BUSY_TIMEOUT)
+        )
+        self._local = threading.local()
+
+    def _connect(self):
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self._path, timeout=self._busy_timeout, isolation_level=None
+        )
+        connection.execute('PRAGMA journal_mode = WAL')
+        # Кеш можно потерять при сбое питания: fsync только на
+        # контрольных точках WAL.
+        connection.execute('PRAGMA synchronous = NORMAL')
+        connection.execute(f'PRAGMA mmap_size = {self._mmap_size}')
+        connection.executescript(SCHEMA)
+        return connection
+
+    @property
+    def _connection(self):
+        # Соединение свое у каждого потока и у каждого процесса после
+        # fork (gunicorn --preload).
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = self._connect()
+            local.pid = os.getpid()
+        return local.connection
+
+    @contextmanager
+    def _write(self):
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _expires(self, timeout):
+        """Время истечения (None - бессрочно) или 0, если хранить не нужно."""
+        expires = self.get_backend_timeout(timeout)
+        if expires is not None and expires <= time.time():
+            return 0
+        return expires
+
+    def _cull(self, connection, now):
+        """Удаляет просроченные и давно не читанные записи сверх лимитов."""
+        limits = (self._max_entries, self._max_size)
+        entries, size = connection.execute(
+            'SELECT entries, size FROM cache_stats'
+        ).fetchone()
+        if entries <= limits[0] and size <= limits[1]:
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (now,)
+        )
+        while True:
+            entries, size = connection.execute(
+                'SELECT entries, size FROM cache_stats'
+            ).fetchone()
+            if entries <= limits[0] and size <= limits[1]:
+                return
+            if not self._cull_frequency:
+                connection.execute('DELETE FROM cache')
+                return
+            connection.execute(
+                'DELETE FROM cache WHERE rowid IN ('
+                'SELECT rowid FROM cache ORDER BY accessed LIMIT ?)',
+                (max(1, entries // self._cull_frequency),),
+            )
+
+    def _store(self, connection, key, value, expires, now, only_new=False):
+        value, size = _encode(value)
+        if size > self._max_size:
+            # Иначе ради одного значения вытеснялся бы весь кеш.
+            if not only_new:
+                connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+            return False
+        sql = UPSERT
+        params = [key, value, size, expires, now]
+        if only_new:
+            sql += ' WHERE cache.expires IS NOT NULL AND cache.expires <= ?'
+            params.append(now)
+        return connection.execute(sql, params).rowcount > 0
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self._expires(timeout)
+        now = time.time()
+        if expires == 0:
+            return not self._has_key(key, now)
+        with self._write() as connection:
+            added = self._store(
+                connection, key, value, expires, now, only_new=True
+            )
+            if added:
+                self._cull(connection, now)
+        return added
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        connection = self._connection
+        row = connection.execute(
+            f'SELECT value, accessed FROM cache WHERE key = ? AND {ALIVE}',
+            (key, now),
+        ).fetchone()
+        if row is None:
+            return default
+        value, accessed = row
+        if now - accessed > self._lru_resolution:
+            connection.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key)
+            )
+        return _decode(value)
+
+    def get_many(self, keys, version=None):
+        keys = {
+            self.make_and_validate_key(key, version=version): key
+            for key in keys
+        }
+        now = time.time()
+        connection = self._connection
+        found, stale = {}, []
+        for chunk in _chunks(list(keys)):
+            rows = connection.execute(
+                f'SELECT key, value, accessed FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(chunk))}) AND {ALIVE}',
+                (*chunk, now),
+            )
+            for key, value, accessed in rows:
+                found[keys[key]] = _decode(value)
+                if now - accessed > self._lru_resolution:
+                    stale.append(key)
+        for chunk in _chunks(stale):
+            connection.execute(
+                f'UPDATE cache SET accessed = ? '
+                f'WHERE key IN ({", ".join("?" * len(chunk))})',
+                (now, *chunk),
+            )
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        data = {
+            self.make_and_validate_key(key, version=version): value
+            for key, value in data.items()
+        }
+        expires = self._expires(timeout)
+        if expires == 0:
+            self._delete(list(data))
+            return []
+        now = time.time()
+        with self._write() as connection:
+            for key, value in data.items():
+                self._store(connection, key, value, expires, now)
+            self._cull(connection, now)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        expires = self._expires(timeout)
+        if expires == 0:
+            return self._delete([key]) > 0
+        return self._connection.execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {ALIVE}',
+            (expires, key, now),
+        ).rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        if type(delta) is int and delta in INT_RANGE:
+            # Границы value, при которых сумма не выйдет за INTEGER.
+            row = self._connection.execute(
+                f'UPDATE cache SET value = value + ?, accessed = ? '
+                f"WHERE key = ? AND {ALIVE} AND typeof(value) = 'integer' "
+                f'AND value BETWEEN ? AND ? RETURNING value',
+                (
+                    delta, now, key, now,
+                    max(INT_MIN, INT_MIN - delta),
+                    min(INT_MAX, INT_MAX - delta),
+                ),
+            ).fetchone()
+            if row is not None:
+                return row[0]
+        # Нет ключа, значение не целое или сумма не помещается в INTEGER.
+        with self._write() as connection:
+            row = connection.execute(
+                f'SELECT value, expires FROM cache WHERE key = ? AND {ALIVE}',
+                (key, now),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found.")
+            value = _decode(row[0]) + delta
+            self._store(connection, key, value, row[1], now)
+        return value
+
+    def _has_key(self, key, now):
+        return self._connection.execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {ALIVE}', (key, now)
+        ).fetchone() is not None
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._has_key(key, time.time())
+
+    def _delete(self, keys):
+        deleted = 0
+        with self._write() as connection:
+            for chunk in _chunks(keys):
+                deleted += connection.execute(
+                    f'DELETE FROM cache '
+                    f'WHERE key IN ({", ".join("?" * len(chunk))})',
+                    chunk,
+                ).rowcount
+        return deleted
+
+    def delete(self, key, version=None):
+        return self._delete(
+            [self.make_and_validate_key(key, version=version)]
+        ) > 0
+
+    def delete_many(self, keys, version=None):
+        self._delete(
+            [self.make_and_validate_key(key, version=version) for key in keys]
+        )
+
+    def clear(self):
+        self._connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение переиспользуется между запросами.
+        pass
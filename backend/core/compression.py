@@ -0,0 +1,270 @@
+"""
+Сжатие ответов: доступные кодировки, выбор по Accept-Encoding и
+CompressionMiddleware.
+
+gzip есть всегда (стандартная библиотека), br и zstd - если установлены
+пакеты brotli и zstandard.
+"""
+import gzip
+import hashlib
+import re
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Уровни сжатия для заранее подготовленных (один раз) данных и для
+# ответов, сжимаемых на лету.
+MAX_LEVELS = {'gzip': 9, 'br': 11, 'zstd': 19}
+RESPONSE_LEVELS = {'gzip': 6, 'br': 4, 'zstd': 3}
+
+
+def _gzip(data, level):
+    # mtime=0: одинаковые данные дают одинаковые байты.
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+COMPRESSORS = {'gzip': _gzip}
+if brotli is not None:
+    COMPRESSORS['br'] = lambda data, level: brotli.compress(
+        data, quality=level
+    )
+if zstandard is not None:
+    COMPRESSORS['zstd'] = lambda data, level: zstandard.ZstdCompressor(
+        level=level
+    ).compress(data)
+
+# При одинаковом q выбирается кодировка, которая раньше в этом списке.
+PREFERENCE = ('br', 'zstd', 'gzip')
+ENCODINGS = tuple(name for name in PREFERENCE if name in COMPRESSORS)
+
+
+def compress(data, encoding, level=None):
+    """Сжимает байты (по умолчанию - с максимальным уровнем)."""
+    if level is None:
+        level = MAX_LEVELS[encoding]
+    return COMPRESSORS[encoding](data, level)
+
+
+def parse_accept_encoding(header):
+    """{кодировка: q} из заголовка Accept-Encoding."""
+    weights = {}
+    for item in header.split(','):
+        name, *params = item.strip().split(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key.strip() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name] = weight
+    return weights
+
+
+def negotiate(header, available=ENCODINGS):
+    """
+    Лучшая из available кодировок для Accept-Encoding или None
+    (отдавать без сжатия).
+    """
+    if not header:
+        return None
+    weights = parse_accept_encoding(header)
+    default = weights.get('*', 0.0)
+    best, best_weight = None, 0.0
+    for name in PREFERENCE:
+        if name not in available:
+            continue
+        weight = weights.get(name, default)
+        if weight > best_weight:
+            best, best_weight = name, weight
+    if best is not None and weights.get('identity', 0.0) > best_weight:
+        # Клиент явно предпочитает несжатый ответ.
+        return None
+    return best
+
+
+class _GzipStream:
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliStream:
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class _ZstdStream:
+
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+STREAMS = {'gzip': _GzipStream, 'br': _BrotliStream, 'zstd': _ZstdStream}
+
+
+class _Flusher:
+    """
+    Сжатие потока частями: сжатые данные отдаются клиенту не реже,
+    чем каждые flush_size байт исходных данных.
+    """
+
+    def __init__(self, encoding, flush_size):
+        self.stream = STREAMS[encoding](RESPONSE_LEVELS[encoding])
+        self.flush_size = flush_size
+        self.pending = 0
+
+    def feed(self, chunk):
+        data = self.stream.compress(chunk)
+        self.pending += len(chunk)
+        if self.pending >= self.flush_size:
+            data += self.stream.flush()
+            self.pending = 0
+        return data
+
+
+def compress_stream(chunks, encoding, flush_size):
+    flusher = _Flusher(encoding, flush_size)
+    for chunk in chunks:
+        data = flusher.feed(chunk)
+        if data:
+            yield data
+    yield flusher.stream.finish()
+
+
+async def compress_async_stream(chunks, encoding, flush_size):
+    flusher = _Flusher(encoding, flush_size)
+    async for chunk in chunks:
+        data = flusher.feed(chunk)
+        if data:
+            yield data
+    yield flusher.stream.finish()
+
+
+COMPRESSIBLE_TYPES = re.compile(
+    r'^(text/(plain|csv|css|javascript|markdown)'
+    r'|application/([\w.+-]+\+)?(json|x-ndjson|javascript|xml))\b'
+)
+
+
+class CompressionMiddleware:
+    """
+    Сжатие ответов в кодировке, выбранной по Accept-Encoding
+    (br, zstd или gzip, см. negotiate).
+
+    Сжимаются текстовые форматы API (JSON, NDJSON, текст) от
+    COMPRESSION_MIN_SIZE байт; HTML не сжимается (BREACH: в нем
+    CSRF-токены). Потоковые ответы сжимаются по мере генерации.
+    Сжатое тело ответа с ETag кешируется по ETag, так что повторный
+    горячий ответ не сжимается заново. Ответы, уже сжатые вьюхой
+    (снимок каталога ингредиентов), не трогаются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self._compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            flush_size = settings.COMPRESSION_STREAM_FLUSH_SIZE
+            if response.is_async:
+                response.streaming_content = compress_async_stream(
+                    response.streaming_content, encoding, flush_size
+                )
+            else:
+                response.streaming_content = compress_stream(
+                    response.streaming_content, encoding, flush_size
+                )
+            del response['Content-Length']
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+                return response
+            body = self._compress(request, response, encoding)
+            if len(body) >= len(response.content):
+                return response
+            response.content = body
+            response['Content-Length'] = str(len(body))
+
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and not etag.startswith('W/'):
+            # Сжатое тело - другое представление, сильный ETag ослабляется
+            # (сравнение If-None-Match во вьюхах слабое).
+            response['ETag'] = f'W/{etag}'
+        return response
+
+    @staticmethod
+    def _compressible(response):
+        return (
+            response.status_code == 200
+            and not response.has_header('Content-Encoding')
+            and 'no-transform' not in response.get('Cache-Control', '')
+            and COMPRESSIBLE_TYPES.match(response.get('Content-Type', ''))
+        )
+
+    @staticmethod
+    def _compress(request, response, encoding):
+        etag = response.get('ETag')
+        level = RESPONSE_LEVELS[encoding]
+        if not etag:
+            return compress(response.content, encoding, level)
+        key = 'compressed:' + hashlib.sha1(
+            f'{request.get_full_path()}|{etag}|{encoding}'.encode()
+        ).hexdigest()
+        body = cache.get(key)
+        if body is None:
+            body = compress(response.content, encoding, level)
+            if len(body) <= settings.COMPRESSION_CACHE_MAX_SIZE:
+                cache.set(key, body, settings.COMPRESSION_CACHE_TIMEOUT)
+        return body
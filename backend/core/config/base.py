@@ -27,6 +27,9 @@ APPS = [
     'api.apps.ApiConfig',
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
+    'jobs.apps.JobsConfig',
+    'outbox.apps.OutboxConfig',
+    'diagnostics.apps.DiagnosticsConfig',
 ]
 
 INSTALLED_APPS = [
@@ -44,12 +47,15 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'diagnostics.middleware.ProfilingMiddleware',
+    'diagnostics.middleware.QueryInspectionMiddleware',
 ]
 
 REST_FRAMEWORK = {
@@ -75,6 +81,11 @@ REST_FRAMEWORK = {
     }
 }
 
+# Нагрузочный прогон (python -m loadtest) упрется в лимиты throttling,
+# поэтому для запущенного им сервера ограничение частоты отключается.
+if env('DISABLE_THROTTLING', default=False, cast=bool):
+    REST_FRAMEWORK['DEFAULT_THROTTLE_CLASSES'] = []
+
 ROOT_URLCONF = 'core.urls'
 
 from .helpers.auth.validation import *
@@ -124,4 +135,60 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'back_static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Файлы с контролем доступа (сгенерированные выгрузки и т.п.).
+# При USE_X_ACCEL_REDIRECT Django только проверяет права и отдает
+# X-Accel-Redirect, а сам файл отправляет nginx из internal-локации.
+PROTECTED_MEDIA_ROOT = os.path.join(BASE_DIR, 'protected')
+PROTECTED_MEDIA_URL = '/protected/'
+USE_X_ACCEL_REDIRECT = env(
+    'USE_X_ACCEL_REDIRECT', default=PRODUCTION, cast=bool
+)
+
+# Профилировать каждый N-й запрос (0 - только по заголовку X-Profile
+# или параметру ?_profile от персонала), см. diagnostics.middleware.
+PROFILING_SAMPLE_RATE = env('PROFILING_SAMPLE_RATE', default=0, cast=int)
+
+# Поиск повторяющихся SQL-запросов (N+1) и проверка бюджетов запросов
+# вьюх, см. diagnostics.middleware.QueryInspectionMiddleware. В тестах
+# QUERY_BUDGET_STRICT включается через override_settings. По умолчанию
+# включены вне продакшена (там же, где DEBUG).
+QUERY_INSPECTION = env(
+    'QUERY_INSPECTION', default=not PRODUCTION, cast=bool
+)
+QUERY_BUDGET_STRICT = env(
+    'QUERY_BUDGET_STRICT', default=not PRODUCTION, cast=bool
+)
+
+# Сжатие ответов (core.compression.CompressionMiddleware): минимальный
+# размер тела, объем исходных данных потока между сбросами сжатых
+# данных клиенту и кеш сжатых тел ответов с ETag.
+COMPRESSION_MIN_SIZE = env('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+COMPRESSION_STREAM_FLUSH_SIZE = 16 * 1024
+COMPRESSION_CACHE_TIMEOUT = 60 * 10
+COMPRESSION_CACHE_MAX_SIZE = 1024 * 1024
+
+# Команда плавной перезагрузки nginx после выгрузки коротких ссылок
+# (например, "nginx -s reload"), см. recipes.short_links. В docker
+# gateway перечитывает выгрузку сам.
+SHORT_LINKS_RELOAD_COMMAND = env('SHORT_LINKS_RELOAD_COMMAND', default='')
+
+# Кеш в файле SQLite, общий для всех воркеров на машине (throttling,
+# счетчики, фрагменты рецептов), см. core.cache. В docker файл лежит на
+# томе, общем для backend и worker.
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': env(
+            'CACHE_LOCATION',
+            default=os.path.join(BASE_DIR, 'var', 'cache.sqlite3'),
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': env('CACHE_MAX_ENTRIES', default=100000, cast=int),
+            'MAX_SIZE': env(
+                'CACHE_MAX_SIZE', default=256 * 1024 * 1024, cast=int
+            ),
+        },
+    },
+}
+
 from .helpers import jazzmin
@@ -12,5 +12,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Параллельные запросы на запись (runserver многопоточный)
+        # дольше ждут блокировку, прежде чем упасть с
+        # "database is locked".
+        'OPTIONS': {'timeout': 20},
     }
 }
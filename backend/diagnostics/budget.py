@@ -0,0 +1,51 @@
+"""
+Бюджеты SQL-запросов для вьюх.
+
+Максимальное число запросов объявляется декоратором на функции-вьюхе
+или методе (в том числе action) вьюсета:
+
+    @query_budget(3)
+    def subscriptions(self, request):
+        ...
+
+либо атрибутом вьюсета - числом или словарем по action:
+
+    query_budget = {'list': 7, 'retrieve': 6}
+
+Проверяет diagnostics.middleware.QueryInspectionMiddleware.
+"""
+
+
+class QueryBudgetExceeded(Exception):
+    """Вьюха выполнила больше SQL-запросов, чем объявлено."""
+
+
+def query_budget(limit):
+    def decorator(func):
+        func.query_budget = limit
+        return func
+    return decorator
+
+
+def get_query_budget(view_func, request):
+    """Бюджет запросов вьюхи для запроса request или None."""
+    view_class = getattr(view_func, 'cls', None) or getattr(
+        view_func, 'view_class', None
+    )
+    if view_class is None:
+        return getattr(view_func, 'query_budget', None)
+
+    method = request.method.lower()
+    # Для вьюсетов actions - отображение метода HTTP на action.
+    handler_name = (getattr(view_func, 'actions', None) or {}).get(
+        method, method
+    )
+    budget = getattr(
+        getattr(view_class, handler_name, None), 'query_budget', None
+    )
+    if budget is not None:
+        return budget
+    budget = getattr(view_class, 'query_budget', None)
+    if isinstance(budget, dict):
+        return budget.get(handler_name)
+    return budget
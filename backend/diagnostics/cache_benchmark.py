@@ -0,0 +1,346 @@
+"""
+Сравнение бэкендов кеша: LocMemCache, core.cache.SQLiteCache и Redis.
+
+Если установлен redis-py и задан адрес сервера, измеряется настоящий
+RedisCache, иначе - заменитель: сервер "ключ-значение" в отдельном
+процессе, к которому каждая операция идет по TCP, как к Redis
+(значения так же сериализуются на стороне клиента).
+
+Для каждой операции считаются операции в секунду и задержки p50/p99 в
+одном процессе. Затем несколько процессов одновременно увеличивают
+общий счетчик: у общего кеша итог равен сумме, у LocMemCache каждый
+процесс считает свое.
+"""
+import multiprocessing
+import os
+import pickle
+import socket
+import socketserver
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+KEYS = 1000
+MANY_KEYS = 20
+COUNTER_KEY = 'benchmark:counter'
+FRAME = struct.Struct('!I')
+
+LOCMEM = 'django.core.cache.backends.locmem.LocMemCache'
+SQLITE = 'core.cache.SQLiteCache'
+REDIS = 'django.core.cache.backends.redis.RedisCache'
+STAND_IN = 'diagnostics.cache_benchmark.StandInCache'
+
+
+def _key(index):
+    return f'benchmark:{index % KEYS}'
+
+
+def _value(size):
+    """Значение, похожее на фрагмент рецепта, около size байт."""
+    return {
+        'id': 1,
+        'name': 'Рецепт',
+        'text': 'x' * size,
+        'tags': [{'id': 1, 'name': 'Завтрак', 'slug': 'breakfast'}],
+    }
+
+
+def _send(sock, data):
+    sock.sendall(FRAME.pack(len(data)) + data)
+
+
+def _receive(sock):
+    def read(size):
+        chunks = []
+        while size:
+            chunk = sock.recv(size)
+            if not chunk:
+                raise ConnectionError('Connection closed.')
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    (size,) = FRAME.unpack(read(FRAME.size))
+    return read(size)
+
+
+class _Storage:
+    """Данные заменителя Redis: {ключ: (значение, время истечения)}."""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def _alive(self, key):
+        item = self.data.get(key)
+        if item is None or (item[1] is not None and item[1] <= time.time()):
+            return None
+        return item
+
+    def get_many(self, keys):
+        with self.lock:
+            return {
+                key: item[0] for key in keys
+                if (item := self._alive(key)) is not None
+            }
+
+    def set_many(self, data, expires):
+        with self.lock:
+            for key, value in data.items():
+                self.data[key] = (value, expires)
+
+    def add(self, key, value, expires):
+        with self.lock:
+            if self._alive(key) is not None:
+                return False
+            self.data[key] = (value, expires)
+            return True
+
+    def incr(self, key, delta):
+        with self.lock:
+            item = self._alive(key)
+            if item is None:
+                return None
+            value = pickle.loads(item[0]) + delta
+            self.data[key] = (pickle.dumps(value), item[1])
+            return value
+
+    def delete_many(self, keys):
+        with self.lock:
+            return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+def _serve(connection):
+    storage = _Storage()
+
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            self.request.setsockopt(
+                socket.IPPROTO_TCP, socket.TCP_NODELAY, 1
+            )
+            while True:
+                try:
+                    command, args = pickle.loads(_receive(self.request))
+                except ConnectionError:
+                    return
+                result = getattr(storage, command)(*args)
+                _send(self.request, pickle.dumps(result))
+
+    class Server(socketserver.ThreadingTCPServer):
+        daemon_threads = True
+
+    with Server(('127.0.0.1', 0), Handler) as server:
+        connection.send(server.server_address)
+        server.serve_forever()
+
+
+@contextmanager
+def stand_in_server():
+    """Запускает заменитель Redis, возвращает адрес host:port."""
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(child,))
+    process.daemon = True
+    process.start()
+    try:
+        host, port = parent.recv()
+        yield f'{host}:{port}'
+    finally:
+        process.terminate()
+        process.join()
+
+
+class StandInCache(BaseCache):
+    """Клиент заменителя Redis: одна операция - один обмен по TCP."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        host, port = location.rsplit(':', 1)
+        self._address = (host, int(port))
+        self._local = threading.local()
+
+    def _call(self, command, *args):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.sock = socket.create_connection(self._address)
+            local.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            local.pid = os.getpid()
+        _send(local.sock, pickle.dumps((command, args)))
+        return pickle.loads(_receive(local.sock))
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        data = self._call('get_many', [key])
+        return pickle.loads(data[key]) if key in data else default
+
+    def get_many(self, keys, version=None):
+        keys = {
+            self.make_and_validate_key(key, version=version): key
+            for key in keys
+        }
+        return {
+            keys[key]: pickle.loads(value)
+            for key, value in self._call('get_many', list(keys)).items()
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._call(
+            'set_many',
+            {
+                self.make_and_validate_key(key, version=version):
+                    pickle.dumps(value)
+                for key, value in data.items()
+            },
+            self.get_backend_timeout(timeout),
+        )
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._call(
+            'add', key, pickle.dumps(value), self.get_backend_timeout(timeout)
+        )
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        value = self._call('incr', key, delta)
+        if value is None:
+            raise ValueError(f"Key '{key}' not found.")
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._call('delete_many', [key]) > 0
+
+    def delete_many(self, keys, version=None):
+        self._call(
+            'delete_many',
+            [self.make_and_validate_key(key, version=version) for key in keys],
+        )
+
+    def clear(self):
+        self._call('clear')
+
+
+def create_cache(config):
+    params = {**config}
+    backend = params.pop('BACKEND')
+    return import_string(backend)(params.pop('LOCATION', ''), params)
+
+
+def backend_configs(directory, redis_location):
+    """
+    {название: настройки как в CACHES}. redis_location - адрес
+    настоящего Redis (redis://...) или заменителя (host:port).
+    """
+    options = {'MAX_ENTRIES': KEYS * 10}
+    configs = {
+        'locmem': {
+            'BACKEND': LOCMEM, 'LOCATION': 'benchmark', 'OPTIONS': options,
+        },
+        'sqlite': {
+            'BACKEND': SQLITE,
+            'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+            'OPTIONS': options,
+        },
+    }
+    if redis_location.startswith(('redis://', 'rediss://', 'unix://')):
+        configs['redis'] = {'BACKEND': REDIS, 'LOCATION': redis_location}
+    else:
+        configs['redis-stand-in'] = {
+            'BACKEND': STAND_IN, 'LOCATION': redis_location,
+        }
+    return configs
+
+
+def _operations(value):
+    many = [_key(index) for index in range(MANY_KEYS)]
+    return {
+        'set': lambda cache, index: cache.set(_key(index), value),
+        'get': lambda cache, index: cache.get(_key(index)),
+        'get (miss)': lambda cache, index: cache.get(
+            f'benchmark:missing:{index}'
+        ),
+        f'get_many ({MANY_KEYS})': lambda cache, index: cache.get_many(many),
+        'incr': lambda cache, index: cache.incr(COUNTER_KEY),
+    }
+
+
+def _percentile(timings, share):
+    return timings[min(len(timings) - 1, int(len(timings) * share))]
+
+
+def measure(cache, iterations, value_size):
+    """
+    {операция: (операций в секунду, p50 и p99 в микросекундах)} в
+    одном процессе.
+    """
+    cache.clear()
+    cache.set(COUNTER_KEY, 0, None)
+    results = {}
+    for name, operation in _operations(_value(value_size)).items():
+        timings = []
+        started = time.perf_counter()
+        for index in range(iterations):
+            begin = time.perf_counter()
+            operation(cache, index)
+            timings.append(time.perf_counter() - begin)
+        elapsed = time.perf_counter() - started
+        timings.sort()
+        results[name] = (
+            iterations / elapsed,
+            _percentile(timings, 0.5) * 1e6,
+            _percentile(timings, 0.99) * 1e6,
+        )
+    return results
+
+
+def _hammer(config, iterations, start, results):
+    cache = create_cache(config)
+    # Процесс, запущенный через spawn, не видит LocMemCache родителя.
+    cache.add(COUNTER_KEY, 0, None)
+    start.wait()
+    started = time.perf_counter()
+    for index in range(iterations):
+        cache.incr(COUNTER_KEY)
+        cache.get(_key(index))
+    results.put(time.perf_counter() - started)
+
+
+def measure_shared(config, processes, iterations):
+    """
+    processes процессов одновременно делают iterations пар incr + get.
+    Возвращает (операций в секунду, итог счетчика).
+    """
+    cache = create_cache(config)
+    cache.set(COUNTER_KEY, 0, None)
+    start = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(
+            target=_hammer, args=(config, iterations, start, results)
+        )
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    start.set()
+    elapsed = max(results.get() for _ in workers)
+    for worker in workers:
+        worker.join()
+    return processes * iterations * 2 / elapsed, cache.get(COUNTER_KEY)
@@ -0,0 +1,10 @@
+# Включает профилирование запроса (для персонала).
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = '_profile'
+PROFILE_INTERVAL = 0.001
+PROFILES_DIR = 'profiles'
+PROFILES_KEEP = 200
+SQL_TOP_COUNT = 10
+# Форма SQL-запроса, повторенная столько раз за запрос, - вероятный N+1.
+REPEATED_QUERY_THRESHOLD = 3
+STACK_DEPTH = 5
@@ -0,0 +1,73 @@
+import tempfile
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+
+from diagnostics import cache_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Compare cache backends: LocMem, shared SQLite and Redis'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-n', '--iterations', type=int, default=5000,
+            help='Calls of each operation.',
+        )
+        parser.add_argument(
+            '-p', '--processes', type=int, default=4,
+            help='Processes sharing one counter.',
+        )
+        parser.add_argument(
+            '--value-size', type=int, default=2048,
+            help='Approximate size of a cached value in bytes.',
+        )
+        parser.add_argument(
+            '--redis-url',
+            help='Benchmark a real Redis (needs redis-py) instead of the '
+                 'in-process stand-in server.',
+        )
+
+    def handle(self, *args, **options):
+        if options['redis_url'] and cache_benchmark.redis is None:
+            raise CommandError('redis-py is not installed.')
+        server = (
+            nullcontext(options['redis_url']) if options['redis_url']
+            else cache_benchmark.stand_in_server()
+        )
+        with server as redis_location, \
+                tempfile.TemporaryDirectory() as directory:
+            configs = cache_benchmark.backend_configs(
+                directory, redis_location
+            )
+            self.stdout.write(
+                f'{"backend":<16}{"operation":<16}'
+                f'{"ops/s":>10}{"p50 us":>10}{"p99 us":>10}'
+            )
+            for name, config in configs.items():
+                results = cache_benchmark.measure(
+                    cache_benchmark.create_cache(config),
+                    options['iterations'],
+                    options['value_size'],
+                )
+                for operation, (rate, p50, p99) in results.items():
+                    self.stdout.write(
+                        f'{name:<16}{operation:<16}'
+                        f'{rate:>10.0f}{p50:>10.1f}{p99:>10.1f}'
+                    )
+
+            processes = options['processes']
+            expected = processes * options['iterations']
+            self.stdout.write(
+                f'\n{processes} processes, incr + get, '
+                f'expected counter {expected}:'
+            )
+            for name, config in configs.items():
+                rate, counter = cache_benchmark.measure_shared(
+                    config, processes, options['iterations']
+                )
+                shared = 'shared' if counter == expected else 'not shared'
+                self.stdout.write(
+                    f'{name:<16}{rate:>10.0f} ops/s  '
+                    f'counter {counter} ({shared})'
+                )
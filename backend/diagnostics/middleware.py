@@ -0,0 +1,144 @@
+import itertools
+import logging
+import time
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .budget import QueryBudgetExceeded, get_query_budget
+from .constants import PROFILE_HEADER, PROFILE_PARAM
+from .profiler import Sampler
+from .sql import QueryRecorder
+from .storage import save_profile
+
+logger = logging.getLogger(__name__)
+
+
+def is_staff(request):
+    """
+    Относится ли автор запроса к персоналу: по сессии (request.user от
+    AuthenticationMiddleware) или по токену DRF, который иначе
+    проверяется только во вьюхе.
+    """
+    if getattr(request.user, 'is_staff', False):
+        return True
+    try:
+        credentials = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return credentials is not None and credentials[0].is_staff
+
+
+class ProfilingMiddleware:
+    """
+    Профилирование запросов по требованию.
+
+    Запрос профилируется, если персонал передал заголовок X-Profile или
+    параметр ?_profile, либо если это каждый PROFILING_SAMPLE_RATE-й
+    запрос. От остальных пользователей заголовок и параметр
+    игнорируются: права проверяются до запуска профилировщика, так что
+    включить его анонимно нельзя. Остальные запросы обрабатываются без
+    профилировщика.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.counter = itertools.count(1)
+
+    def trigger(self, request):
+        requested = (
+            PROFILE_HEADER in request.META or PROFILE_PARAM in request.GET
+        )
+        if requested and is_staff(request):
+            return 'request'
+        if self.sample_rate and next(self.counter) % self.sample_rate == 0:
+            return 'sample'
+        return None
+
+    def __call__(self, request):
+        trigger = self.trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with QueryRecorder() as queries, Sampler() as sampler:
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        user = getattr(request, 'user', None)
+        try:
+            profile_id = save_profile(
+                {
+                    'method': request.method,
+                    'path': request.path,
+                    'query': request.META.get('QUERY_STRING', ''),
+                    'status': response.status_code,
+                    'user': getattr(user, 'pk', None),
+                    'trigger': trigger,
+                    'duration_ms': round(duration * 1000, 3),
+                    'samples': sum(sampler.samples.values()),
+                    'sql': queries.summary(),
+                },
+                sampler,
+            )
+        except OSError:
+            logger.exception('Could not save profile of %s', request.path)
+            return response
+        if trigger == 'request':
+            response['X-Profile-Id'] = profile_id
+        return response
+
+
+class QueryInspectionMiddleware:
+    """
+    Проверка SQL-запросов вьюх.
+
+    Если у вьюхи объявлен бюджет (см. diagnostics.budget), число
+    запросов сверяется с ним: при QUERY_BUDGET_STRICT (DEBUG, тесты)
+    превышение - исключение QueryBudgetExceeded, иначе - запись в лог.
+    При QUERY_INSPECTION в лог также пишутся повторяющиеся формы
+    запросов (N+1) с местом вызова. Для вьюх без бюджета при
+    выключенном QUERY_INSPECTION запросы не записываются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            recorder = request.__dict__.pop('_query_recorder', None)
+            if recorder is not None:
+                recorder.__exit__(None, None, None)
+        if recorder is not None:
+            self.inspect(request, recorder)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        budget = get_query_budget(view_func, request)
+        if budget is None and not settings.QUERY_INSPECTION:
+            return None
+        recorder = QueryRecorder(capture_stacks=settings.QUERY_INSPECTION)
+        recorder.budget = budget
+        request._query_recorder = recorder.__enter__()
+        return None
+
+    def inspect(self, request, recorder):
+        for shape, count, stack in recorder.repeated():
+            logger.warning(
+                'Repeated query (%s times) in %s %s: %s\n%s',
+                count, request.method, request.path, shape, stack,
+            )
+        count = len(recorder.queries)
+        if recorder.budget is None or count <= recorder.budget:
+            return
+        message = (
+            f'{request.method} {request.path} made {count} queries, '
+            f'budget is {recorder.budget}'
+        )
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.error(message)
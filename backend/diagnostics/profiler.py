@@ -0,0 +1,94 @@
+"""
+Сэмплирующий профилировщик одного потока.
+
+Фоновый поток раз в interval секунд снимает стек профилируемого потока
+(sys._current_frames), одинаковые стеки суммируются. В отличие от
+cProfile, код профилируемого потока не инструментируется, поэтому
+накладные расходы не зависят от числа вызовов.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from .constants import PROFILE_INTERVAL
+
+
+class Sampler:
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self._thread_id = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        # Стек ниже этого кадра (сервер, middleware) в профиль не входит.
+        self._root = sys._getframe(1)
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None and frame is not self._root:
+                code = frame.f_code
+                stack.append(
+                    (code.co_name, code.co_filename, code.co_firstlineno)
+                )
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Стеки в формате collapsed (flamegraph.pl, speedscope)."""
+        return ''.join(
+            ';'.join(
+                f'{name} ({os.path.basename(path)}:{line})'
+                for name, path, line in stack
+            ) + f' {count}\n'
+            for stack, count in self.samples.most_common()
+        )
+
+    def speedscope(self, name):
+        """Профиль в формате speedscope (https://www.speedscope.app)."""
+        frames, index = [], {}
+        samples, weights = [], []
+        # Реальный интервал между снимками больше заданного (GIL),
+        # поэтому вес снимка - его доля во времени запроса.
+        weight = self.duration / max(sum(self.samples.values()), 1)
+        for stack, count in self.samples.items():
+            sample = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append(
+                        {'name': frame[0], 'file': frame[1], 'line': frame[2]}
+                    )
+                sample.append(index[frame])
+            samples.append(sample)
+            weights.append(count * weight)
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'foodgram',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': self.duration,
+                'samples': samples,
+                'weights': weights,
+            }],
+        }
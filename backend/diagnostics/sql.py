@@ -0,0 +1,125 @@
+"""Запись SQL-запросов, выполненных в блоке кода, и поиск N+1."""
+import os
+import re
+import time
+import traceback
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.db import connections
+
+from .constants import REPEATED_QUERY_THRESHOLD, SQL_TOP_COUNT, STACK_DEPTH
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIAGNOSTICS_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """
+    Форма запроса: литералы и параметры заменены на %s, списки IN
+    свернуты, так что запросы, отличающиеся только значениями, совпадают.
+    """
+    shape = _LITERALS.sub('%s', sql)
+    shape = _IN_LISTS.sub('(...)', shape)
+    return _SPACES.sub(' ', shape).strip()
+
+
+def stack_excerpt(depth=STACK_DEPTH):
+    """Последние кадры стека из кода проекта (без библиотек)."""
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(PROJECT_ROOT)
+        and not frame.filename.startswith(DIAGNOSTICS_ROOT)
+    ]
+    return ''.join(traceback.format_list(frames[-depth:]))
+
+
+class QueryRecorder:
+    """
+    Записывает SQL всех подключений к БД внутри with-блока.
+
+        with QueryRecorder() as recorder:
+            ...
+        recorder.summary()
+
+    При capture_stacks=True для формы запроса, выполненной
+    REPEATED_QUERY_THRESHOLD раз, сохраняется место вызова
+    (см. repeated). Стек снимается один раз на форму.
+    """
+
+    def __init__(self, capture_stacks=False):
+        self.queries = []
+        self.capture_stacks = capture_stacks
+        self.shape_counts = defaultdict(int)
+        self.stacks = {}
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, time.perf_counter() - start)
+
+    def record(self, sql, duration):
+        self.queries.append((sql, duration))
+        if not self.capture_stacks:
+            return
+        shape = normalize(sql)
+        self.shape_counts[shape] += 1
+        if self.shape_counts[shape] == REPEATED_QUERY_THRESHOLD:
+            self.stacks[shape] = stack_excerpt()
+
+    def repeated(self):
+        """
+        Формы запросов, выполненные не меньше REPEATED_QUERY_THRESHOLD
+        раз (вероятный N+1): [(форма, число, место вызова)].
+        """
+        return sorted(
+            (
+                (shape, self.shape_counts[shape], stack)
+                for shape, stack in self.stacks.items()
+            ),
+            key=lambda item: -item[1],
+        )
+
+    def by_shape(self):
+        """Словарь форма запроса -> [число, суммарное время]."""
+        shapes = defaultdict(lambda: [0, 0.0])
+        for sql, duration in self.queries:
+            shape = shapes[normalize(sql)]
+            shape[0] += 1
+            shape[1] += duration
+        return shapes
+
+    def summary(self, top=SQL_TOP_COUNT):
+        """Число и время запросов плюс самые дорогие формы запросов."""
+        shapes = sorted(
+            self.by_shape().items(), key=lambda item: -item[1][1]
+        )
+        return {
+            'count': len(self.queries),
+            'duration_ms': round(
+                sum(duration for _, duration in self.queries) * 1000, 3
+            ),
+            'top': [
+                {
+                    'sql': shape,
+                    'count': count,
+                    'duration_ms': round(duration * 1000, 3),
+                }
+                for shape, (count, duration) in shapes[:top]
+            ],
+        }
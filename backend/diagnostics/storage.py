@@ -0,0 +1,83 @@
+"""Хранение профилей в PROTECTED_MEDIA_ROOT/profiles."""
+import json
+import os
+import re
+import uuid
+
+from django.conf import settings
+from django.utils import timezone
+
+from .constants import PROFILES_DIR, PROFILES_KEEP
+
+PROFILE_ID = re.compile(r'^[\w-]+$')
+META_SUFFIX = '.json'
+FILE_SUFFIXES = {
+    'speedscope': '.speedscope.json',
+    'collapsed': '.collapsed.txt',
+}
+
+
+def profiles_root():
+    root = os.path.join(settings.PROTECTED_MEDIA_ROOT, PROFILES_DIR)
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+def profile_file(profile_id, kind):
+    """Имя файла профиля относительно PROTECTED_MEDIA_ROOT."""
+    return f'{PROFILES_DIR}/{profile_id}{FILE_SUFFIXES[kind]}'
+
+
+def save_profile(meta, sampler):
+    """Сохраняет профиль и его описание, удаляет самые старые профили."""
+    now = timezone.now()
+    profile_id = f'{now:%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}'
+    root = profiles_root()
+    meta = {'id': profile_id, 'created_at': now.isoformat(), **meta}
+    name = f'{meta["method"]} {meta["path"]}'
+
+    with open(os.path.join(root, profile_id + FILE_SUFFIXES['speedscope']),
+              'w', encoding='utf-8') as file:
+        json.dump(sampler.speedscope(name), file)
+    with open(os.path.join(root, profile_id + FILE_SUFFIXES['collapsed']),
+              'w', encoding='utf-8') as file:
+        file.write(sampler.collapsed())
+    # Описание пишется последним: по нему профиль попадает в список.
+    with open(os.path.join(root, profile_id + META_SUFFIX),
+              'w', encoding='utf-8') as file:
+        json.dump(meta, file, ensure_ascii=False)
+
+    prune(root)
+    return profile_id
+
+
+def _meta_ids(root):
+    return sorted(
+        (name[:-len(META_SUFFIX)] for name in os.listdir(root)
+         if name.endswith(META_SUFFIX)
+         and not name.endswith(FILE_SUFFIXES['speedscope'])),
+        reverse=True,
+    )
+
+
+def prune(root, keep=PROFILES_KEEP):
+    for profile_id in _meta_ids(root)[keep:]:
+        for suffix in (META_SUFFIX, *FILE_SUFFIXES.values()):
+            try:
+                os.remove(os.path.join(root, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles():
+    """Описания профилей, новые первыми."""
+    root = profiles_root()
+    profiles = []
+    for profile_id in _meta_ids(root):
+        try:
+            with open(os.path.join(root, profile_id + META_SUFFIX),
+                      encoding='utf-8') as file:
+                profiles.append(json.load(file))
+        except (FileNotFoundError, ValueError):
+            continue
+    return profiles
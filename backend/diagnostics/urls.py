@@ -0,0 +1,12 @@
+from django.urls import path
+
+from .views import ProfileFileView, ProfileListView
+
+urlpatterns = [
+    path('', ProfileListView.as_view(), name='profiles'),
+    path(
+        '<str:profile_id>/<str:kind>/',
+        ProfileFileView.as_view(),
+        name='profile_file',
+    ),
+]
@@ -0,0 +1,30 @@
+from django.http import Http404
+from rest_framework import permissions, views
+from rest_framework.response import Response
+
+from api.utils import send_protected_file
+from .storage import FILE_SUFFIXES, PROFILE_ID, list_profiles, profile_file
+
+
+class ProfileListView(views.APIView):
+    """Список сохраненных профилей запросов (для персонала)."""
+
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        return Response(list_profiles())
+
+
+class ProfileFileView(views.APIView):
+    """Файл профиля: speedscope (JSON) или collapsed (текст)."""
+
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request, profile_id, kind):
+        if not PROFILE_ID.match(profile_id) or kind not in FILE_SUFFIXES:
+            raise Http404
+        name = profile_file(profile_id, kind)
+        try:
+            return send_protected_file(name)
+        except FileNotFoundError:
+            raise Http404
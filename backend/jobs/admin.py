@@ -0,0 +1,30 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'name',
+        'queue',
+        'status',
+        'attempts',
+        'run_at',
+        'locked_by',
+    )
+    list_filter = ('status', 'queue')
+    search_fields = ('^name',)
+    readonly_fields = ('locked_by', 'locked_at', 'last_error', 'created_at')
+    show_full_result_count = False
+    actions = ('requeue',)
+
+    @admin.action(description='Перезапустить выбранные задачи')
+    def requeue(self, request, queryset):
+        queryset.exclude(status=Job.Status.RUNNING).update(
+            status=Job.Status.QUEUED,
+            attempts=0,
+            run_at=timezone.now(),
+        )
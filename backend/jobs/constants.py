@@ -0,0 +1,16 @@
+HIGH_QUEUE = 'high'
+DEFAULT_QUEUE = 'default'
+LOW_QUEUE = 'low'
+# Очереди в порядке приоритета.
+JOB_QUEUES = (HIGH_QUEUE, DEFAULT_QUEUE, LOW_QUEUE)
+JOB_NAME_MAXLENGTH = 128
+JOB_QUEUE_MAXLENGTH = 16
+JOB_STATUS_MAXLENGTH = 16
+JOB_KEY_MAXLENGTH = 255
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 10
+JOB_LOCK_TIMEOUT = 60 * 30
+JOB_CLAIM_BATCH = 10
+JOB_POLL_INTERVAL = 1.0
+# Как часто обработчик ставит в очередь периодические задачи.
+JOB_SCHEDULE_INTERVAL = 60
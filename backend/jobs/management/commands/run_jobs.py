@@ -0,0 +1,65 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.constants import (
+    JOB_POLL_INTERVAL,
+    JOB_QUEUES,
+    JOB_SCHEDULE_INTERVAL,
+)
+from jobs.worker import requeue_stale, schedule_periodic, work, worker_name
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-q', '--queue', action='append', choices=JOB_QUEUES,
+            dest='queues',
+            help='Queue to process, can be repeated (in priority order). '
+                 'Defaults to all queues.',
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit when there are no ready jobs.',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=JOB_POLL_INTERVAL,
+            help='Seconds to wait when the queue is empty.',
+        )
+
+    def handle(self, *args, **options):
+        queues = options['queues'] or JOB_QUEUES
+        worker = worker_name()
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.stdout.write(f'Worker {worker} on queues: {", ".join(queues)}')
+
+        total = 0
+        requeue_stale()
+        scheduled_at = None
+        while not self.stopping:
+            if (
+                scheduled_at is None
+                or time.monotonic() - scheduled_at > JOB_SCHEDULE_INTERVAL
+            ):
+                schedule_periodic()
+                scheduled_at = time.monotonic()
+            # Задачи берутся по одной, чтобы после каждой проверять
+            # сигнал остановки и приоритет очередей.
+            done = work(queues, worker, max_jobs=1)
+            total += done
+            if done:
+                continue
+            if options['burst']:
+                break
+            time.sleep(options['sleep'])
+            requeue_stale()
+        self.stdout.write(self.style.SUCCESS(f'Jobs done: {total}.'))
+
+    def stop(self, signum, frame):
+        # Текущая задача доводится до конца.
+        self.stopping = True
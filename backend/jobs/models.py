@@ -0,0 +1,76 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .constants import (
+    DEFAULT_QUEUE,
+    JOB_KEY_MAXLENGTH,
+    JOB_MAX_ATTEMPTS,
+    JOB_NAME_MAXLENGTH,
+    JOB_QUEUE_MAXLENGTH,
+    JOB_QUEUES,
+    JOB_STATUS_MAXLENGTH,
+)
+
+
+class Job(models.Model):
+    """
+    Фоновая задача в очереди.
+
+    Выполненные задачи удаляются, упавшие после всех попыток остаются
+    со статусом failed для разбора.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', _('В очереди')
+        RUNNING = 'running', _('Выполняется')
+        FAILED = 'failed', _('Ошибка')
+
+    name = models.CharField(_('Задача'), max_length=JOB_NAME_MAXLENGTH)
+    kwargs = models.JSONField(_('Аргументы'), default=dict, blank=True)
+    queue = models.CharField(
+        _('Очередь'),
+        max_length=JOB_QUEUE_MAXLENGTH,
+        choices=[(queue, queue) for queue in JOB_QUEUES],
+        default=DEFAULT_QUEUE,
+    )
+    key = models.CharField(
+        _('Ключ уникальности'), max_length=JOB_KEY_MAXLENGTH, blank=True
+    )
+    status = models.CharField(
+        _('Статус'),
+        max_length=JOB_STATUS_MAXLENGTH,
+        choices=Status.choices,
+        default=Status.QUEUED,
+    )
+    attempts = models.PositiveSmallIntegerField(_('Попыток'), default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        _('Максимум попыток'), default=JOB_MAX_ATTEMPTS
+    )
+    run_at = models.DateTimeField(_('Запустить после'), default=timezone.now)
+    locked_by = models.CharField(_('Обработчик'), max_length=255, blank=True)
+    locked_at = models.DateTimeField(
+        _('Взята в работу'), null=True, blank=True
+    )
+    last_error = models.TextField(_('Последняя ошибка'), blank=True)
+    created_at = models.DateTimeField(_('Создана'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Фоновая задача')
+        verbose_name_plural = _('Фоновые задачи')
+        ordering = ('run_at',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=models.Q(status='queued') & ~models.Q(key=''),
+                name='unique_queued_job_key',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['status', 'queue', 'run_at'], name='job_claim_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
@@ -0,0 +1,99 @@
+"""
+Регистрация фоновых задач и постановка их в очередь.
+
+    @task(queue=LOW_QUEUE)
+    def delete_user(user_id):
+        ...
+
+    delete_user.delay(user_id=user.pk)
+
+Периодические задачи объявляются там же, после регистрации:
+
+    every(60 * 15, update_scores)
+
+Задача ставится в очередь в текущей транзакции, поэтому обработчик
+увидит ее только после коммита, вместе с данными, которые она
+обрабатывает. Аргументы передаются по имени и должны сериализоваться
+в JSON.
+"""
+import hashlib
+import json
+from collections import namedtuple
+from functools import partial
+
+from django.utils import timezone
+
+from .constants import DEFAULT_QUEUE, JOB_MAX_ATTEMPTS
+from .models import Job
+
+# interval - период в секундах, kwargs - аргументы задачи.
+Periodic = namedtuple('Periodic', ('func', 'interval', 'kwargs'))
+
+registry = {}
+schedule = []
+
+
+def task(queue=DEFAULT_QUEUE, max_attempts=JOB_MAX_ATTEMPTS, unique=False):
+    """
+    Регистрирует функцию как фоновую задачу и добавляет ей метод delay.
+
+    При unique=True одинаковые задачи (с теми же аргументами), еще
+    ожидающие в очереди, не дублируются.
+    """
+    def decorator(func):
+        name = f'{func.__module__}.{func.__name__}'
+        registry[name] = func
+
+        def delay_until(run_at, **kwargs):
+            enqueue(
+                name,
+                kwargs,
+                queue=queue,
+                max_attempts=max_attempts,
+                key=make_key(name, kwargs) if unique else '',
+                run_at=run_at,
+            )
+
+        func.job_name = name
+        func.unique = unique
+        func.delay = partial(delay_until, None)
+        func.delay_until = delay_until
+        return func
+    return decorator
+
+
+def every(interval, func, **kwargs):
+    """
+    Запускает задачу func с аргументами kwargs раз в interval секунд.
+
+    Следующий запуск ставит в очередь обработчик (см.
+    jobs.worker.schedule_periodic); задача должна быть unique, чтобы
+    обработчики не ставили его по нескольку раз.
+    """
+    if not getattr(func, 'unique', False):
+        raise ValueError(f'Periodic task {func.__name__} must be unique.')
+    schedule.append(Periodic(func, interval, kwargs))
+
+
+def make_key(name, kwargs):
+    arguments = json.dumps(kwargs, sort_keys=True).encode()
+    return f'{name}:{hashlib.sha1(arguments).hexdigest()}'
+
+
+def enqueue(name, kwargs, queue=DEFAULT_QUEUE,
+            max_attempts=JOB_MAX_ATTEMPTS, key='', run_at=None):
+    """
+    Ставит задачу в очередь на run_at (по умолчанию - сейчас), дубликат
+    по key пропускается.
+    """
+    Job.objects.bulk_create(
+        [Job(
+            name=name,
+            kwargs=kwargs,
+            queue=queue,
+            max_attempts=max_attempts,
+            key=key,
+            run_at=run_at or timezone.now(),
+        )],
+        ignore_conflicts=bool(key),
+    )
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+from django.test import TestCase
+
+from jobs.models import Job
+from jobs.registry import every, schedule, task
+from jobs.worker import next_run, schedule_periodic
+
+CALLS = []
+
+
+@task(unique=True)
+def periodic_job(label):
+    CALLS.append(label)
+
+
+@task()
+def plain_job():
+    pass
+
+
+class ScheduleTestCase(TestCase):
+    """Периодические задачи."""
+
+    def setUp(self):
+        self.saved = schedule[:]
+        schedule[:] = []
+        self.addCleanup(schedule.__setitem__, slice(None), self.saved)
+
+    def test_next_run(self):
+        now = datetime(2024, 1, 1, 10, 7, 30, tzinfo=timezone.utc)
+        self.assertEqual(
+            next_run(60 * 15, now),
+            datetime(2024, 1, 1, 10, 15, tzinfo=timezone.utc),
+        )
+        # Ровно на границе - следующая граница, а не текущая.
+        self.assertEqual(
+            next_run(60 * 15, now.replace(minute=15, second=0)),
+            datetime(2024, 1, 1, 10, 30, tzinfo=timezone.utc),
+        )
+
+    def test_schedule_is_idempotent(self):
+        every(60, periodic_job, label='a')
+        every(3600, periodic_job, label='b')
+        now = datetime(2024, 1, 1, 10, 0, 30, tzinfo=timezone.utc)
+        schedule_periodic(now)
+        schedule_periodic(now + timedelta(seconds=10))
+        self.assertEqual(
+            list(
+                Job.objects.order_by('run_at').values_list('kwargs', 'run_at')
+            ),
+            [
+                ({'label': 'a'}, now + timedelta(seconds=30)),
+                ({'label': 'b'}, now + timedelta(minutes=59, seconds=30)),
+            ],
+        )
+
+    def test_non_unique_task_rejected(self):
+        with self.assertRaises(ValueError):
+            every(60, plain_job)
@@ -0,0 +1,137 @@
+"""
+Обработчик очереди фоновых задач.
+
+Задача захватывается условным UPDATE (status=queued -> running), так
+что несколько обработчиков, в том числе на разных машинах, могут
+работать с одной очередью без внешнего брокера и без блокировок
+строк. Очереди просматриваются в порядке приоритета.
+
+Периодические задачи (jobs.registry.every) обработчики ставят в очередь
+сами, отдельный планировщик не нужен.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .constants import JOB_CLAIM_BATCH, JOB_LOCK_TIMEOUT, JOB_RETRY_DELAY
+from .models import Job
+from .registry import registry, schedule
+
+logger = logging.getLogger(__name__)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def requeue_stale(timeout=JOB_LOCK_TIMEOUT):
+    """Возвращает в очередь задачи обработчиков, которые не завершились."""
+    return Job.objects.filter(
+        status=Job.Status.RUNNING,
+        locked_at__lt=timezone.now() - timedelta(seconds=timeout),
+    ).update(status=Job.Status.QUEUED, locked_by='', locked_at=None)
+
+
+def next_run(interval, now):
+    """Ближайшая после now граница интервала (от начала эпохи)."""
+    slot = int(now.timestamp() // interval) + 1
+    return datetime.fromtimestamp(slot * interval, tz=dt_timezone.utc)
+
+
+def schedule_periodic(now=None):
+    """
+    Ставит в очередь следующий запуск каждой периодической задачи.
+
+    Запуск привязан к границе интервала, а задача уникальна, поэтому
+    повторные вызовы и несколько обработчиков не создают дубликатов.
+    Пока задача выполняется, следующая граница уже в будущем.
+    """
+    now = now or timezone.now()
+    for periodic in schedule:
+        periodic.func.delay_until(
+            next_run(periodic.interval, now), **periodic.kwargs
+        )
+    return len(schedule)
+
+
+def claim(queues, worker):
+    """Захватывает первую готовую задачу из queues или возвращает None."""
+    now = timezone.now()
+    for queue in queues:
+        candidates = list(
+            Job.objects.filter(
+                status=Job.Status.QUEUED, queue=queue, run_at__lte=now
+            )
+            .order_by('run_at', 'pk')
+            .values_list('pk', flat=True)[:JOB_CLAIM_BATCH]
+        )
+        for pk in candidates:
+            claimed = Job.objects.filter(
+                pk=pk, status=Job.Status.QUEUED
+            ).update(
+                status=Job.Status.RUNNING,
+                locked_by=worker,
+                locked_at=now,
+                attempts=F('attempts') + 1,
+            )
+            if claimed:
+                return Job.objects.get(pk=pk)
+    return None
+
+
+def run(job):
+    """Выполняет задачу: удаляет ее при успехе, иначе планирует повтор."""
+    func = registry.get(job.name)
+    if func is None:
+        _fail(job, f'Unknown task {job.name}', retry=False)
+        return False
+    try:
+        func(**job.kwargs)
+    except Exception:
+        logger.exception('Job %s (%s) failed', job.pk, job.name)
+        _fail(job, traceback.format_exc())
+        return False
+    job.delete()
+    return True
+
+
+def _fail(job, error, retry=True):
+    job.last_error = error
+    job.locked_by, job.locked_at = '', None
+    if retry and job.attempts < job.max_attempts:
+        job.status = Job.Status.QUEUED
+        job.run_at = timezone.now() + timedelta(
+            seconds=JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+        )
+    else:
+        job.status = Job.Status.FAILED
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        # Пока задача выполнялась, такая же встала в очередь.
+        job.delete()
+
+
+def work(queues, worker=None, max_jobs=None):
+    """
+    Выполняет готовые задачи, пока они есть (или max_jobs задач).
+
+    Возвращает число выполненных задач.
+    """
+    worker = worker or worker_name()
+    done = 0
+    while max_jobs is None or done < max_jobs:
+        close_old_connections()
+        job = claim(queues, worker)
+        if job is None:
+            break
+        run(job)
+        done += 1
+    return done
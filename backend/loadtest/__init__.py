@@ -0,0 +1,9 @@
+"""
+Нагрузочное тестирование по Postman-коллекции проекта.
+
+    python -m loadtest --start-server --concurrency 20 --duration 60
+
+Запросы коллекции объединяются во взвешенные сценарии (scenarios.py)
+и выполняются виртуальными пользователями параллельно (asyncio).
+Подробнее - postman_collection/README.md.
+"""
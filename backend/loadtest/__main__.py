@@ -0,0 +1,202 @@
+import argparse
+import asyncio
+import os
+import secrets
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from .collection import load_collection
+from .report import (
+    compare,
+    format_summary,
+    load_baseline,
+    save_baseline,
+    summarize,
+)
+from .runner import run
+from .scenarios import SCENARIOS, build
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+COLLECTION = (
+    BACKEND_DIR.parent
+    / 'postman_collection'
+    / 'foodgram.postman_collection.json'
+)
+SERVER_COMMAND = '{python} manage.py runserver --noreload {address}'
+SERVER_START_TIMEOUT = 30
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog='python -m loadtest',
+        description='Replay the Postman collection as a weighted concurrent '
+                    'load and report per-endpoint latency percentiles.',
+    )
+    parser.add_argument('--collection', default=COLLECTION,
+                        help='Postman collection (v2.1) file.')
+    parser.add_argument('--base-url',
+                        help='Server URL '
+                             '(default: baseUrl of the collection).')
+    parser.add_argument('-c', '--concurrency', type=int, default=10,
+                        help='Number of virtual users.')
+    parser.add_argument('-d', '--duration', type=float, default=30,
+                        help='Load duration in seconds per virtual user '
+                             '(after its setup).')
+    parser.add_argument('-n', '--iterations', type=int,
+                        help='Scenarios per virtual user '
+                             'instead of --duration.')
+    parser.add_argument('--ramp-up', type=float, default=0,
+                        help='Seconds over which virtual users are started.')
+    parser.add_argument('-s', '--scenario', action='append',
+                        choices=sorted(SCENARIOS),
+                        help='Run only this scenario (can be repeated).')
+    parser.add_argument('--seed', default='0',
+                        help='Seed for the scenario choice.')
+    parser.add_argument('--timeout', type=float, default=30,
+                        help='Request timeout in seconds.')
+    parser.add_argument('--keep-alive', action='store_true',
+                        help='Reuse one connection per virtual user.')
+    parser.add_argument('--no-teardown', dest='teardown', action='store_false',
+                        help='Keep users created by the run.')
+    parser.add_argument('--start-server', action='store_true',
+                        help='Start a local server for the run '
+                             '(with throttling disabled).')
+    parser.add_argument('--server-command', default=SERVER_COMMAND,
+                        help='Command for --start-server, run in the backend '
+                             'directory; {python} and {address} are '
+                             'substituted.')
+    parser.add_argument('--save', metavar='FILE',
+                        help='Save the results as a baseline.')
+    parser.add_argument('--baseline', metavar='FILE',
+                        help='Compare with a saved baseline; exit with '
+                             'status 1 on regression.')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative p95/throughput regression.')
+    parser.add_argument('--min-count', type=int, default=20,
+                        help='Minimum requests to compare endpoint p95.')
+    return parser.parse_args()
+
+
+def _port_open(host, port):
+    try:
+        socket.create_connection((host, port), timeout=1).close()
+    except OSError:
+        return False
+    return True
+
+
+@contextmanager
+def local_server(base_url, command):
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    if _port_open(host, port):
+        sys.exit(f'{host}:{port} is already in use.')
+    env = {
+        **os.environ,
+        'DISABLE_THROTTLING': '1',
+        # Запись стеков вызовов в middleware исказила бы замеры, а
+        # превышение бюджета запросов пусть попадает в лог, а не в 500.
+        'QUERY_INSPECTION': '0',
+        'QUERY_BUDGET_STRICT': '0',
+    }
+    log = tempfile.TemporaryFile()
+    process = subprocess.Popen(
+        shlex.split(command.format(
+            python=sys.executable, address=f'{host}:{port}'
+        )),
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    try:
+        started = time.monotonic()
+        while not _port_open(host, port):
+            if (process.poll() is not None
+                    or time.monotonic() - started > SERVER_START_TIMEOUT):
+                log.seek(0)
+                sys.stderr.write(log.read().decode(errors='replace'))
+                sys.exit('The server failed to start.')
+            time.sleep(0.2)
+        yield
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+
+
+def _revision():
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    options = parse_args()
+    options.variables, specs = load_collection(options.collection)
+    options.base_url = (
+        options.base_url or options.variables['baseUrl']
+    ).rstrip('/')
+    options.run_id = secrets.token_hex(3)
+    setup, scenarios = build(specs, options.scenario)
+
+    if options.start_server:
+        server = local_server(options.base_url, options.server_command)
+    else:
+        server = nullcontext()
+    with server:
+        stats, failed = asyncio.run(run(options, setup, scenarios))
+
+    for phase in ('setup', 'teardown'):
+        phase_summary = summarize(stats[phase])
+        if phase_summary['requests']:
+            print(
+                f'{phase}: {phase_summary["requests"]} requests, '
+                f'errors {phase_summary["error_rate"]:.1%}'
+            )
+    if failed:
+        print(f'Setup failed for {failed} of {options.concurrency} '
+              'virtual users.')
+    summary = summarize(stats['scenarios'])
+    if not summary['requests']:
+        sys.exit('No scenario requests were made.')
+    print(format_summary(summary))
+
+    if options.save:
+        save_baseline(options.save, summary, {
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'revision': _revision(),
+            'base_url': options.base_url,
+            'concurrency': options.concurrency,
+            'duration': options.duration,
+            'iterations': options.iterations,
+            'scenarios': sorted(scenarios),
+        })
+        print(f'Baseline saved to {options.save}')
+    if options.baseline:
+        lines, regressed = compare(
+            summary, load_baseline(options.baseline),
+            options.tolerance, options.min_count,
+        )
+        print('\n'.join(lines))
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Минимальный асинхронный HTTP/1.1-клиент на asyncio.
+
+По умолчанию на каждый запрос открывается новое соединение: sync-воркеры
+gunicorn в проде все равно закрывают соединение после ответа, а
+runserver на keep-alive соединении отвечает с задержкой ~40 мс (заголовки
+и тело уходят разными пакетами, и алгоритм Нейгла ждет отложенного ACK).
+С keep_alive=True клиент держит одно соединение, как браузер.
+Поддерживаются ответы с Content-Length, chunked и до закрытия соединения.
+"""
+import asyncio
+import json
+import ssl
+from dataclasses import dataclass, field
+from urllib.parse import quote, urlsplit
+
+
+@dataclass
+class Response:
+    status: int
+    headers: dict = field(default_factory=dict)
+    body: bytes = b''
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class HTTPClient:
+
+    def __init__(self, base_url, timeout=30, keep_alive=False):
+        url = urlsplit(base_url)
+        self.secure = url.scheme == 'https'
+        self.host = url.hostname
+        self.port = url.port or (443 if self.secure else 80)
+        self.host_header = url.netloc
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self._reader = self._writer = None
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(
+            self.host,
+            self.port,
+            ssl=ssl.create_default_context() if self.secure else None,
+        )
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (ConnectionError, ssl.SSLError):
+                pass
+        self._reader = self._writer = None
+
+    async def request(self, method, path, headers=None, body=None):
+        for attempt in range(2):
+            reused = self._writer is not None
+            if not reused:
+                await self._connect()
+            try:
+                return await asyncio.wait_for(
+                    self._exchange(method, path, headers or {}, body),
+                    self.timeout,
+                )
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                # Сервер мог закрыть простаивающее соединение.
+                if not reused or attempt:
+                    raise
+            except BaseException:
+                await self.close()
+                raise
+
+    async def _exchange(self, method, path, headers, body):
+        body = body.encode() if isinstance(body, str) else body or b''
+        # Значения переменных (например, первая буква названия
+        # ингредиента) могут быть не ASCII.
+        path = quote(path, safe="/?&=%:+,;@!$'()*~[]")
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host_header}']
+        headers = {
+            'Connection': 'keep-alive' if self.keep_alive else 'close',
+            'Content-Length': str(len(body)),
+            **headers,
+        }
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        self._writer.write(
+            ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+        )
+        await self._writer.drain()
+
+        status_line = await self._reader.readuntil(b'\r\n')
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self._reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if method == 'HEAD' or status in (204, 304) or status < 200:
+            content = b''
+        elif response_headers.get('transfer-encoding') == 'chunked':
+            content = await self._read_chunked()
+        elif 'content-length' in response_headers:
+            content = await self._reader.readexactly(
+                int(response_headers['content-length'])
+            )
+        else:
+            content = await self._reader.read()
+            response_headers['connection'] = 'close'
+
+        if (not self.keep_alive
+                or response_headers.get('connection', '').lower() == 'close'):
+            await self.close()
+        return Response(status, response_headers, content)
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            line = await self._reader.readuntil(b'\r\n')
+            size = int(line.split(b';')[0], 16)
+            if not size:
+                # Завершающие заголовки (trailers) до пустой строки.
+                while await self._reader.readuntil(b'\r\n') != b'\r\n':
+                    pass
+                return b''.join(chunks)
+            chunks.append(await self._reader.readexactly(size))
+            await self._reader.readexactly(2)
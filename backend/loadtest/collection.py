@@ -0,0 +1,186 @@
+"""
+Разбор Postman-коллекции (формат v2.1) в описания запросов.
+
+Из тестовых скриптов коллекции берутся ожидаемый статус ответа
+(pm.response.status ... to.be.eql("Created")) и переменные, которые
+запрос сохраняет из ответа (pm.collectionVariables.set(...)): id
+созданных объектов, токены. Поддерживаются формы, встречающиеся в
+коллекции проекта: _.get(responseData, "path"), responseData[0].id и
+.slice(a, b).
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from http import HTTPStatus
+
+VARIABLE = re.compile(r'{{\s*([\w$]+)\s*}}')
+DECLARATION = re.compile(
+    r'(?:const|let|var)\s+(\w+)\s*=\s*_\.get\(\s*responseData\s*,\s*'
+    r'["\']([^"\']+)["\']\s*\)'
+)
+SET_VARIABLE = re.compile(
+    r'pm\.collectionVariables\.set\(\s*["\'](\w+)["\']\s*,\s*(.+?)\)\s*;?\s*$',
+    re.M,
+)
+SLICE = re.compile(r'^(.*)\.slice\(\s*(\d+)\s*,\s*(\d+)\s*\)$')
+PATH_TOKEN = re.compile(r'\[(\d+)\]|\.?(\w+)')
+EXPECTED_STATUS = re.compile(
+    r'pm\.response\.status\b.*?to\.be\.eql\(\s*["\']([^"\']+)["\']', re.S
+)
+STATUS_BY_PHRASE = {status.phrase: status.value for status in HTTPStatus}
+
+
+class MissingVariable(KeyError):
+    """В шаблоне запроса есть переменная, которой еще нет."""
+
+
+@dataclass
+class Extraction:
+    variable: str
+    path: list
+    slice: tuple = None
+
+    def apply(self, data):
+        for key in self.path:
+            data = data[key]
+        if self.slice is not None:
+            data = data[self.slice[0]:self.slice[1]]
+        return data
+
+
+@dataclass
+class RequestSpec:
+    path: tuple
+    method: str
+    url: str
+    headers: dict = field(default_factory=dict)
+    body: str = None
+    expected_status: int = None
+    extractions: list = field(default_factory=list)
+
+    @property
+    def name(self):
+        return '/'.join(self.path)
+
+    @property
+    def endpoint(self):
+        """Ключ статистики: метод и шаблон URL без {{baseUrl}}."""
+        return '{} {}'.format(self.method, VARIABLE.sub(r'{\1}', self.url))
+
+
+def render(template, variables):
+    def substitute(match):
+        try:
+            return str(variables[match.group(1)])
+        except KeyError:
+            raise MissingVariable(match.group(1)) from None
+    return VARIABLE.sub(substitute, template)
+
+
+def _parse_path(expression):
+    return [
+        int(index) if index else name
+        for index, name in PATH_TOKEN.findall(expression)
+    ]
+
+
+def _extractions(script):
+    declared = dict(DECLARATION.findall(script))
+    extractions = []
+    for variable, expression in SET_VARIABLE.findall(script):
+        expression = expression.strip()
+        slice_ = None
+        match = SLICE.match(expression)
+        if match:
+            expression = match.group(1)
+            slice_ = (int(match.group(2)), int(match.group(3)))
+        if expression in declared:
+            path = _parse_path(declared[expression])
+        elif expression.startswith('responseData'):
+            path = _parse_path(expression[len('responseData'):])
+        else:
+            continue
+        extractions.append(Extraction(variable, path, slice_))
+    return extractions
+
+
+def _auth_headers(auth):
+    if not auth or auth.get('type') != 'apikey':
+        return {}
+    options = {item['key']: item['value'] for item in auth['apikey']}
+    if options.get('in', 'header') != 'header':
+        return {}
+    return {options['key']: options['value']}
+
+
+def _request_spec(item, path, auth):
+    request = item['request']
+    url = request['url']
+    url = url['raw'] if isinstance(url, dict) else url
+    headers = {
+        header['key']: header['value']
+        for header in request.get('header', [])
+        if not header.get('disabled')
+    }
+    headers.update(_auth_headers(request.get('auth', auth)))
+
+    body = None
+    if request.get('body', {}).get('mode') == 'raw':
+        body = request['body']['raw']
+        language = request['body'].get('options', {}).get('raw', {}).get(
+            'language'
+        )
+        if language == 'json':
+            headers.setdefault('Content-Type', 'application/json')
+
+    script = '\n'.join(
+        line
+        for event in item.get('event', [])
+        if event.get('listen') == 'test'
+        for line in event['script']['exec']
+    )
+    expected = EXPECTED_STATUS.search(script)
+    return RequestSpec(
+        path=path,
+        method=request['method'],
+        url=url.replace('{{baseUrl}}', '', 1),
+        headers=headers,
+        body=body,
+        expected_status=(
+            STATUS_BY_PHRASE.get(expected.group(1)) if expected else None
+        ),
+        extractions=_extractions(script),
+    )
+
+
+def load_collection(filename):
+    """Переменные коллекции и список RequestSpec в порядке коллекции."""
+    with open(filename, encoding='utf-8') as file:
+        collection = json.load(file)
+    variables = {
+        variable['key']: variable['value']
+        for variable in collection.get('variable', [])
+    }
+    specs = []
+
+    def walk(items, path, auth):
+        for item in items:
+            item_path = (*path, item['name'])
+            if 'item' in item:
+                walk(item['item'], item_path, item.get('auth', auth))
+            else:
+                specs.append(_request_spec(item, item_path, auth))
+
+    walk(collection['item'], (), collection.get('auth'))
+    return variables, specs
+
+
+def select(specs, reference):
+    """Запросы папки или отдельный запрос по пути 'папка/.../имя'."""
+    selected = [
+        spec for spec in specs
+        if spec.name == reference or spec.name.startswith(reference + '/')
+    ]
+    if not selected:
+        raise ValueError(f'No requests match {reference!r}')
+    return selected
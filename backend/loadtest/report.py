@@ -0,0 +1,156 @@
+"""
+Метрики прогона, отчет и сравнение с сохраненным baseline.
+
+Эндпоинт - метод и шаблон URL из коллекции (GET /api/recipes/{firstRecipeId}/),
+так что запросы к разным объектам попадают в одну строку отчета.
+Ошибка - статус, отличный от ожидаемого тестом коллекции, или сбой
+соединения/таймаут.
+"""
+import json
+import math
+from collections import Counter, defaultdict
+from time import perf_counter
+
+PERCENTILES = (50, 95, 99)
+
+
+class Stats:
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.statuses = defaultdict(Counter)
+        self.started = self.finished = None
+
+    def add(self, endpoint, latency, status, ok):
+        now = perf_counter()
+        if self.started is None:
+            self.started = now - latency
+        self.finished = now
+        self.latencies[endpoint].append(latency)
+        self.statuses[endpoint][status or 'error'] += 1
+        if not ok:
+            self.errors[endpoint] += 1
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0
+        return self.finished - self.started
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга; values отсортированы."""
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+
+def summarize(stats):
+    elapsed = stats.elapsed or 1
+    endpoints = {}
+    for endpoint, latencies in sorted(stats.latencies.items()):
+        latencies = sorted(latencies)
+        count = len(latencies)
+        endpoints[endpoint] = {
+            'count': count,
+            'rps': round(count / elapsed, 2),
+            **{
+                f'p{percent}': round(percentile(latencies, percent) * 1000, 1)
+                for percent in PERCENTILES
+            },
+            'max': round(latencies[-1] * 1000, 1),
+            'errors': stats.errors[endpoint],
+            'error_rate': round(stats.errors[endpoint] / count, 4),
+            'statuses': {
+                str(status): number
+                for status, number in sorted(
+                    stats.statuses[endpoint].items(), key=str
+                )
+            },
+        }
+    requests = sum(item['count'] for item in endpoints.values())
+    errors = sum(item['errors'] for item in endpoints.values())
+    return {
+        'elapsed': round(stats.elapsed, 2),
+        'requests': requests,
+        'rps': round(requests / elapsed, 2),
+        'errors': errors,
+        'error_rate': round(errors / requests, 4) if requests else 0,
+        'endpoints': endpoints,
+    }
+
+
+def format_summary(summary):
+    width = max([len('endpoint'), *map(len, summary['endpoints'])])
+    lines = [
+        f'{"endpoint":<{width}} {"count":>7} {"rps":>8} {"p50":>8} '
+        f'{"p95":>8} {"p99":>8} {"max":>8} {"errors":>7}'
+    ]
+    for endpoint, item in summary['endpoints'].items():
+        lines.append(
+            f'{endpoint:<{width}} {item["count"]:>7} {item["rps"]:>8.2f} '
+            f'{item["p50"]:>8.1f} {item["p95"]:>8.1f} {item["p99"]:>8.1f} '
+            f'{item["max"]:>8.1f} {item["error_rate"]:>7.1%}'
+        )
+    lines.append(
+        f'Total: {summary["requests"]} requests in {summary["elapsed"]:.1f}s, '
+        f'{summary["rps"]:.2f} req/s, errors {summary["error_rate"]:.1%} '
+        '(latencies in ms)'
+    )
+    return '\n'.join(lines)
+
+
+def save_baseline(filename, summary, meta):
+    with open(filename, 'w', encoding='utf-8') as file:
+        json.dump(
+            {'meta': meta, **summary}, file, ensure_ascii=False, indent=2
+        )
+
+
+def load_baseline(filename):
+    with open(filename, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def compare(summary, baseline, tolerance, min_count, error_tolerance=0.01):
+    """
+    Строки сравнения с baseline и признак регрессии.
+
+    Регрессия - рост p95 эндпоинта больше чем в 1 + tolerance раз,
+    рост доли ошибок больше error_tolerance или падение общей пропускной
+    способности больше чем на tolerance. Эндпоинты, у которых меньше
+    min_count запросов в одном из прогонов, в сравнение p95 не входят:
+    их перцентили слишком шумные.
+    """
+    lines, regressed = [], False
+
+    def line(name, old, new, bad):
+        nonlocal regressed
+        regressed |= bad
+        change = (new - old) / old if old else 0
+        prefix = 'REGRESSION ' if bad else ''
+        lines.append(f'{prefix}{name}: {old} -> {new} ({change:+.0%})')
+
+    line(
+        'throughput, req/s',
+        baseline['rps'],
+        summary['rps'],
+        summary['rps'] < baseline['rps'] * (1 - tolerance),
+    )
+    for endpoint, item in summary['endpoints'].items():
+        old = baseline['endpoints'].get(endpoint)
+        if old is None:
+            lines.append(f'new endpoint: {endpoint}')
+            continue
+        if min(item['count'], old['count']) >= min_count:
+            line(
+                f'{endpoint} p95, ms',
+                old['p95'],
+                item['p95'],
+                item['p95'] > old['p95'] * (1 + tolerance),
+            )
+        if item['error_rate'] > old['error_rate'] + error_tolerance:
+            line(f'{endpoint} error rate', old['error_rate'],
+                 item['error_rate'], True)
+    for endpoint in baseline['endpoints'].keys() - summary['endpoints'].keys():
+        lines.append(f'missing endpoint: {endpoint}')
+    return lines, regressed
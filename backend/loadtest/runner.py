@@ -0,0 +1,125 @@
+"""
+Виртуальные пользователи и параллельный прогон сценариев.
+
+Каждый виртуальный пользователь - корутина со своими переменными
+коллекции (id, токены) и своим HTTP-клиентом. Запросы SETUP и
+TEARDOWN учитываются отдельно от сценариев, чтобы регистрация и
+хеширование паролей не искажали метрики основной нагрузки.
+"""
+import asyncio
+import random
+from time import monotonic, perf_counter
+
+from .client import HTTPClient
+from .collection import MissingVariable, render
+from .report import Stats
+from .scenarios import TEARDOWN, UNIQUE_VARIABLES, unique_value
+
+
+class VirtualUser:
+
+    def __init__(self, number, variables, base_url, timeout, run_id,
+                 keep_alive=False):
+        suffix = f'-lt{run_id}-{number}'
+        self.number = number
+        self.variables = {
+            **variables,
+            **{
+                name: unique_value(variables[name], suffix)
+                for name in UNIQUE_VARIABLES
+                if name in variables
+            },
+        }
+        self.client = HTTPClient(base_url, timeout, keep_alive)
+
+    async def send(self, spec, stats):
+        """Выполняет запрос; True, если статус совпал с ожидаемым."""
+        try:
+            url = render(spec.url, self.variables)
+            headers = {
+                name: render(value, self.variables)
+                for name, value in spec.headers.items()
+            }
+            body = spec.body and render(spec.body, self.variables)
+        except MissingVariable:
+            # Запрос, от которого зависит этот, не удался.
+            stats.add(spec.endpoint, 0, None, ok=False)
+            return False
+
+        started = perf_counter()
+        try:
+            response = await self.client.request(
+                spec.method, url, headers, body and body.encode()
+            )
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError,
+                ValueError):
+            stats.add(spec.endpoint, perf_counter() - started, None, ok=False)
+            return False
+        latency = perf_counter() - started
+
+        if spec.expected_status is None:
+            ok = response.status < 400
+        else:
+            ok = response.status == spec.expected_status
+        stats.add(spec.endpoint, latency, response.status, ok)
+        if ok and spec.extractions:
+            try:
+                data = response.json()
+                for extraction in spec.extractions:
+                    value = extraction.apply(data)
+                    self.variables[extraction.variable] = value
+            except (ValueError, LookupError, TypeError):
+                return False
+        return ok
+
+    async def run(self, specs, stats, stop_on_error=False):
+        ok = True
+        for spec in specs:
+            ok &= await self.send(spec, stats)
+            if stop_on_error and not ok:
+                break
+        return ok
+
+
+async def _virtual_user(number, options, setup, scenarios, stats):
+    user = VirtualUser(
+        number, options.variables, options.base_url, options.timeout,
+        options.run_id, options.keep_alive,
+    )
+    rng = random.Random(f'{options.seed}-{number}')
+    names = list(scenarios)
+    weights = [scenarios[name][0] for name in names]
+    await asyncio.sleep(options.ramp_up * number / options.concurrency)
+    try:
+        if not await user.run(setup, stats['setup'], stop_on_error=True):
+            return False
+        # Длительность отсчитывается после SETUP: регистрация многих
+        # пользователей (хеширование паролей) может занять заметное время.
+        deadline = monotonic() + options.duration
+        iteration = 0
+        while (
+            (options.iterations is None or iteration < options.iterations)
+            and (options.iterations is not None or monotonic() < deadline)
+        ):
+            name = rng.choices(names, weights)[0]
+            await user.run(scenarios[name][1], stats['scenarios'])
+            iteration += 1
+        if options.teardown:
+            await user.run(TEARDOWN, stats['teardown'])
+        return True
+    finally:
+        await user.client.close()
+
+
+async def run(options, setup, scenarios):
+    """
+    Прогон options.concurrency виртуальных пользователей. Возвращает
+    статистику по фазам (setup, scenarios, teardown) и число
+    пользователей, у которых не удался SETUP.
+    """
+    stats = {phase: Stats() for phase in ('setup', 'scenarios', 'teardown')}
+    results = await asyncio.gather(*(
+        _virtual_user(number, options, setup, scenarios, stats)
+        for number in range(options.concurrency)
+    ))
+    return stats, results.count(False)
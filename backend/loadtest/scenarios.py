@@ -0,0 +1,135 @@
+"""
+Сценарии нагрузки из запросов Postman-коллекции.
+
+Ссылка на запросы - путь в коллекции: папка (все ее запросы по порядку)
+или отдельный запрос. Каждый виртуальный пользователь один раз
+выполняет SETUP (регистрирует свою тройку пользователей, получает
+токены, id тегов и ингредиентов, создает рецепты), затем в цикле
+выбирает сценарий с вероятностью, пропорциональной весу. Сценарии,
+которые что-то добавляют (избранное, корзина, подписки), сами же это
+и удаляют, так что их можно повторять сколько угодно раз.
+"""
+import json
+
+from .collection import Extraction, RequestSpec, select
+
+SETUP = (
+    'register_and_get_tokens // No Auth/create_users',
+    'register_and_get_tokens // No Auth/get_tokens',
+    'tags/get_tags_info/get_tag_list // User',
+    'ingredients/get_ingradients/get_ingredients_list // User',
+    'recipes/create_recipes',
+)
+
+# Имя: (вес, запросы).
+SCENARIOS = {
+    'browse_recipes': (30, (
+        'recipes/get_recipes',
+    )),
+    'recipe_short_link': (5, (
+        'recipes/get_recipe_short_link',
+    )),
+    'users': (10, (
+        'users/get_user_info',
+    )),
+    'catalog': (10, (
+        'tags/get_tags_info',
+        'ingredients/get_ingradients',
+    )),
+    'favorite': (10, (
+        'favorite/add_to_favorite',
+        'recipe_filters_for_favorite_and_shopping_cart/'
+        'get_recipes_list_with_is_favorited_param // User',
+        'delete_requests/favorite/remove_from_favorite // User',
+    )),
+    'shopping_cart': (10, (
+        'shopping_cart/add_to_shopping_cart',
+        'recipe_filters_for_favorite_and_shopping_cart/'
+        'get_recipes_list_with_is_in_shopping_cart_param // User',
+        'shopping_cart/download_shopping_cart',
+        'delete_requests/shopping_cart/remove_from_shopping_cart // User',
+    )),
+    'subscriptions': (10, (
+        'subscriptions/create_subscriptions',
+        'subscriptions/get_subscriptions',
+        'delete_requests/subscriptions/delete_first_subscription // User',
+        'delete_requests/subscriptions/delete_second_subscription // User',
+    )),
+    'update_recipe': (5, (
+        'recipes/update_recipes',
+    )),
+    'validation_errors': (5, (
+        'users/users_bad_requests',
+        'recipes/recipes_bad_requests',
+    )),
+}
+
+# Переменные, которые должны быть уникальны у каждого виртуального
+# пользователя: иначе регистрация упрется в занятые email и username.
+UNIQUE_VARIABLES = (
+    'username',
+    'email',
+    'secondUserUsername',
+    'secondUserEmail',
+    'thirdUserUsername',
+    'thirdUserEmail',
+)
+
+_JSON = {'Content-Type': 'application/json'}
+
+# Удаление созданных пользователей (с их рецептами, подписками и т.д.)
+# после прогона. В коллекции таких запросов нет.
+TEARDOWN = (
+    RequestSpec(
+        path=('teardown', 'get_token_for_third_user'),
+        method='POST',
+        url='/api/auth/token/login/',
+        headers=_JSON,
+        body='{"email": {{thirdUserEmail}}, "password": {{password}}}',
+        expected_status=200,
+        extractions=[Extraction('thirdUserToken', ['auth_token'])],
+    ),
+    *(
+        RequestSpec(
+            path=('teardown', f'delete_{user}'),
+            method='DELETE',
+            url=f'/api/users/{{{{{user}Id}}}}/',
+            headers={**_JSON, 'Authorization': f'Token {{{{{user}Token}}}}'},
+            body='{"current_password": {{password}}}',
+            expected_status=204,
+        )
+        for user in ('user', 'secondUser', 'thirdUser')
+    ),
+)
+
+
+def unique_value(value, suffix):
+    """
+    Добавляет суффикс к имени пользователя или к локальной части email.
+    Значения переменных коллекции - JSON-строки в кавычках.
+    """
+    quoted = value.startswith('"')
+    value = json.loads(value) if quoted else value
+    local, at, domain = value.partition('@')
+    value = f'{local}{suffix}{at}{domain}'
+    return json.dumps(value) if quoted else value
+
+
+def resolve(specs, references):
+    return [
+        spec
+        for reference in references
+        for spec in select(specs, reference)
+    ]
+
+
+def build(specs, names=None):
+    """Запросы SETUP и сценарии {имя: (вес, запросы)} из коллекции."""
+    names = names or list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+    return resolve(specs, SETUP), {
+        name: (SCENARIOS[name][0], resolve(specs, SCENARIOS[name][1]))
+        for name in names
+    }
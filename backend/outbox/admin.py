@@ -0,0 +1,24 @@
+from django.contrib import admin
+
+from .models import Checkpoint, Event
+
+
+@admin.register(Event)
+class EventAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'topic', 'action', 'object_id', 'transaction_id', 'created_at'
+    )
+    list_filter = ('topic', 'action')
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Checkpoint)
+class CheckpointAdmin(admin.ModelAdmin):
+    list_display = ('consumer', 'transaction_id', 'position', 'updated_at')
+    readonly_fields = ('updated_at',)
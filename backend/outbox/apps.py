@@ -0,0 +1,17 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+from django.utils.module_loading import autodiscover_modules
+
+
+class OutboxConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'outbox'
+
+    def ready(self):
+        from .triggers import install_triggers
+
+        # Триггеры ставятся после каждой миграции: SQLite удаляет их
+        # вместе с таблицей, которую пересоздает при изменении схемы.
+        post_migrate.connect(install_triggers, sender=self)
+        # Регистрирует потребителей из модулей consumers.py всех приложений.
+        autodiscover_modules('consumers')
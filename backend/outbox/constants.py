@@ -0,0 +1,13 @@
+RECIPE_TOPIC = 'recipe'
+RECIPE_INGREDIENT_TOPIC = 'recipe_ingredient'
+RECIPE_TAG_TOPIC = 'recipe_tag'
+FAVORITE_TOPIC = 'favorite'
+SHOPPING_CART_TOPIC = 'shopping_cart'
+SUBSCRIPTION_TOPIC = 'subscription'
+EVENT_TOPIC_MAXLENGTH = 32
+EVENT_ACTION_MAXLENGTH = 8
+CONSUMER_NAME_MAXLENGTH = 64
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_RETENTION = 60 * 60 * 24 * 7
+OUTBOX_PRUNE_INTERVAL = 60 * 10
+OUTBOX_POLL_INTERVAL = 1.0
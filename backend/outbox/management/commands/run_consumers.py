@@ -0,0 +1,73 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from outbox.constants import OUTBOX_POLL_INTERVAL, OUTBOX_PRUNE_INTERVAL
+from outbox.reader import consume, prune_events
+from outbox.registry import registry
+
+
+class Command(BaseCommand):
+    help = 'Run outbox event consumers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-c', '--consumer', action='append', choices=sorted(registry),
+            dest='consumers',
+            help='Consumer to run, can be repeated. Defaults to all.',
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit when there are no new events.',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=OUTBOX_POLL_INTERVAL,
+            help='Seconds to wait when there are no new events.',
+        )
+
+    def handle(self, *args, **options):
+        consumers = [
+            registry[name] for name in options['consumers'] or registry
+        ]
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.stdout.write(
+            'Consumers: '
+            f'{", ".join(item.name for item in consumers) or "none"}'
+        )
+
+        total = 0
+        pruned_at = None
+        while not self.stopping:
+            close_old_connections()
+            if (
+                pruned_at is None
+                or time.monotonic() - pruned_at > OUTBOX_PRUNE_INTERVAL
+            ):
+                prune_events()
+                pruned_at = time.monotonic()
+            # По одной пачке на потребителя, чтобы после каждой
+            # проверять сигнал остановки.
+            done = 0
+            for item in consumers:
+                done += consume(
+                    item.name,
+                    item.handler,
+                    topics=item.topics,
+                    batch_size=item.batch_size,
+                    max_batches=1,
+                )
+            total += done
+            if done:
+                continue
+            if options['burst']:
+                break
+            time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f'Batches processed: {total}.'))
+
+    def stop(self, signum, frame):
+        # Текущая пачка доводится до конца.
+        self.stopping = True
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.15 on 2026-10-19 19:13
+
+from django.db import migrations, models
+
+from outbox.triggers import drop_triggers, install_triggers
+
+
+def drop(apps, schema_editor):
+    drop_triggers(schema_editor.connection.alias, apps)
+
+
+def install(apps, schema_editor):
+    install_triggers(schema_editor.connection.alias, apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('outbox', '0001_initial'),
+        ('recipes', '0009_recipe_scores'),
+        ('users', '0002_authorsuggestionrefresh_authorsuggestion'),
+    ]
+
+    operations = [
+        # Триггеры ссылаются на таблицу событий, см. outbox.triggers.
+        migrations.RunPython(drop, migrations.RunPython.noop),
+        migrations.AlterModelOptions(
+            name='event',
+            options={'ordering': ('transaction_id', 'pk'), 'verbose_name': 'Событие', 'verbose_name_plural': 'События'},
+        ),
+        migrations.AddField(
+            model_name='checkpoint',
+            name='transaction_id',
+            field=models.BigIntegerField(default=0, verbose_name='Транзакция'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='transaction_id',
+            field=models.BigIntegerField(default=0, verbose_name='Транзакция'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['transaction_id', 'id'], name='outbox_event_position_idx'),
+        ),
+        migrations.RunPython(install, drop),
+    ]
@@ -0,0 +1,72 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .constants import (
+    CONSUMER_NAME_MAXLENGTH,
+    EVENT_ACTION_MAXLENGTH,
+    EVENT_TOPIC_MAXLENGTH,
+)
+
+
+class Event(models.Model):
+    """
+    Изменение строки одной из отслеживаемых таблиц (см. triggers).
+
+    Пишется триггером базы в той же транзакции, что и само изменение.
+    data - ключевые внешние ключи строки, например {"user": 1,
+    "recipe": 2} для избранного. transaction_id - номер этой транзакции
+    в PostgreSQL (txid_current()), в SQLite - 0, см. reader.
+    """
+
+    class Action(models.TextChoices):
+        INSERT = 'insert', _('Создание')
+        UPDATE = 'update', _('Изменение')
+        DELETE = 'delete', _('Удаление')
+
+    topic = models.CharField(_('Тема'), max_length=EVENT_TOPIC_MAXLENGTH)
+    action = models.CharField(
+        _('Действие'),
+        max_length=EVENT_ACTION_MAXLENGTH,
+        choices=Action.choices,
+    )
+    object_id = models.BigIntegerField(_('id объекта'))
+    data = models.JSONField(_('Данные'), default=dict, blank=True)
+    transaction_id = models.BigIntegerField(_('Транзакция'), default=0)
+    created_at = models.DateTimeField(_('Создано'), default=timezone.now)
+
+    class Meta:
+        verbose_name = _('Событие')
+        verbose_name_plural = _('События')
+        ordering = ('transaction_id', 'pk')
+        indexes = [
+            models.Index(
+                fields=['transaction_id', 'id'],
+                name='outbox_event_position_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.topic} {self.action} {self.object_id}'
+
+
+class Checkpoint(models.Model):
+    """
+    Позиция потребителя: транзакция и id последнего обработанного
+    события.
+    """
+
+    consumer = models.CharField(
+        _('Потребитель'), max_length=CONSUMER_NAME_MAXLENGTH, unique=True
+    )
+    transaction_id = models.BigIntegerField(_('Транзакция'), default=0)
+    position = models.BigIntegerField(_('Позиция'), default=0)
+    updated_at = models.DateTimeField(_('Обновлено'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Позиция потребителя')
+        verbose_name_plural = _('Позиции потребителей')
+        ordering = ('consumer',)
+
+    def __str__(self):
+        return f'{self.consumer}: {self.transaction_id}/{self.position}'
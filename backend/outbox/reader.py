@@ -0,0 +1,114 @@
+"""
+Чтение событий outbox с позицией для каждого потребителя.
+
+id событий выдаются при вставке, а видны читателю после коммита,
+поэтому событие с меньшим id может появиться позже большего, и
+позиция "последний прочитанный id" его бы пропустила.
+
+PostgreSQL: триггер записывает в событие номер своей транзакции
+(txid_current()), события читаются по (transaction_id, id) и только
+из транзакций старше самой старой незавершенной
+(txid_snapshot_xmin). Такие транзакции уже закоммичены или откачены,
+и событий до позиции больше не появится, сколько бы ни длилась
+транзакция. Цена - незавершенная транзакция (в том числе забытая
+"idle in transaction") задерживает чтение событий всех более новых.
+
+SQLite: транзакции на запись выполняются по одной, и следующая
+получает id только после коммита предыдущей, поэтому события видны
+строго по возрастанию id (transaction_id у всех 0).
+"""
+from datetime import timedelta
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .constants import OUTBOX_BATCH_SIZE, OUTBOX_RETENTION
+from .models import Checkpoint, Event
+
+
+def oldest_active_transaction(using=DEFAULT_DB_ALIAS):
+    """
+    Номер самой старой незавершенной транзакции PostgreSQL или None для
+    других баз.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+        return cursor.fetchone()[0]
+
+
+def read_batch(after, limit=OUTBOX_BATCH_SIZE, topics=None):
+    """
+    События после позиции after - пары (transaction_id, id) - не больше
+    limit, и новая позиция - последнего из них, включая события,
+    отброшенные по topics.
+    """
+    transaction_id, pk = after
+    rows = Event.objects.filter(
+        Q(transaction_id__gt=transaction_id)
+        | Q(transaction_id=transaction_id, pk__gt=pk)
+    )
+    active = oldest_active_transaction()
+    if active is not None:
+        rows = rows.filter(transaction_id__lt=active)
+    events, position = [], after
+    for event in rows.order_by('transaction_id', 'pk')[:limit]:
+        position = (event.transaction_id, event.pk)
+        if topics is None or event.topic in topics:
+            events.append(event)
+    return events, position
+
+
+def get_position(name):
+    """
+    Позиция потребителя (transaction_id, id); (0, 0) - еще ничего не
+    прочитано.
+    """
+    return (
+        Checkpoint.objects.filter(consumer=name)
+        .values_list('transaction_id', 'position').first()
+    ) or (0, 0)
+
+
+def consume(name, handler, topics=None, batch_size=OUTBOX_BATCH_SIZE,
+            max_batches=None):
+    """
+    Передает handler(events) новые события пачками, пока они есть
+    (или max_batches пачек), и сдвигает позицию потребителя name.
+
+    Пачка обрабатывается в одной транзакции с сохранением позиции,
+    строка позиции блокируется: два процесса одного потребителя не
+    получат одни и те же события. Возвращает число обработанных пачек.
+    """
+    Checkpoint.objects.get_or_create(consumer=name)
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            checkpoint = (
+                Checkpoint.objects.select_for_update().get(consumer=name)
+            )
+            after = (checkpoint.transaction_id, checkpoint.position)
+            events, position = read_batch(after, batch_size, topics)
+            if position == after:
+                break
+            if events:
+                handler(events)
+            checkpoint.transaction_id, checkpoint.position = position
+            checkpoint.save(
+                update_fields=['transaction_id', 'position', 'updated_at']
+            )
+        batches += 1
+    return batches
+
+
+def prune_events(retention=OUTBOX_RETENTION):
+    """
+    Удаляет события старше retention секунд. Потребитель, отставший
+    больше, должен пересобрать свои данные из исходных таблиц.
+    """
+    cutoff = timezone.now() - timedelta(seconds=retention)
+    deleted, _ = Event.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,39 @@
+"""
+Регистрация потребителей событий outbox.
+
+    @consumer('recipe-counters', topics=[FAVORITE_TOPIC])
+    def update_counters(events):
+        ...
+
+Потребители объявляются в модулях consumers.py приложений и
+выполняются командой run_consumers. Обработчик получает пачку событий
+(Event) в той же транзакции, в которой сохраняется позиция
+потребителя: изменения в базе применяются ровно один раз, а внешние
+действия (кеш, поисковый индекс) при сбое могут повториться и должны
+быть идемпотентными.
+"""
+from collections import namedtuple
+
+from .constants import OUTBOX_BATCH_SIZE
+
+Consumer = namedtuple('Consumer', ('name', 'handler', 'topics', 'batch_size'))
+
+registry = {}
+
+
+def consumer(name, topics=None, batch_size=OUTBOX_BATCH_SIZE):
+    """
+    Регистрирует функцию handler(events) как потребителя name.
+
+    topics - темы событий, которые ему передаются (по умолчанию все);
+    позиция сдвигается и по пропущенным событиям других тем.
+    """
+    def decorator(handler):
+        registry[name] = Consumer(
+            name,
+            handler,
+            frozenset(topics) if topics else None,
+            batch_size,
+        )
+        return handler
+    return decorator
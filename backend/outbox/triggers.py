@@ -0,0 +1,186 @@
+"""
+Триггеры базы, которые пишут события в outbox.
+
+Событие вставляет сам триггер, поэтому оно попадает в транзакцию
+изменения при любом способе записи: save(), bulk_create, update(),
+каскадное удаление и сырой SQL (см. api.utils.add_link). Поддержаны
+PostgreSQL и SQLite.
+
+Миграция, которая меняет таблицу событий, должна удалить триггеры в
+начале и установить в конце (см. migrations/0002): SQLite не
+пересоздаст таблицу, на которую ссылаются триггеры, а в PostgreSQL
+старая функция триггера не знает о новых колонках.
+"""
+from collections import namedtuple
+
+from django.apps import apps as global_apps
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .constants import (
+    FAVORITE_TOPIC,
+    RECIPE_INGREDIENT_TOPIC,
+    RECIPE_TAG_TOPIC,
+    RECIPE_TOPIC,
+    SHOPPING_CART_TOPIC,
+    SUBSCRIPTION_TOPIC,
+)
+from .models import Event
+
+# model - метка модели, keys - внешние ключи, которые попадают в data.
+Source = namedtuple('Source', ('topic', 'model', 'keys'))
+
+SOURCES = (
+    Source(RECIPE_TOPIC, 'recipes.Recipe', ('author',)),
+    Source(
+        RECIPE_INGREDIENT_TOPIC,
+        'recipes.RecipeIngredient',
+        ('recipe', 'ingredient'),
+    ),
+    Source(RECIPE_TAG_TOPIC, 'recipes.RecipeTags', ('recipe', 'tag')),
+    Source(FAVORITE_TOPIC, 'recipes.UserFavoriteRecipes', ('user', 'recipe')),
+    Source(
+        SHOPPING_CART_TOPIC, 'recipes.UserShoppingCart', ('user', 'recipe')
+    ),
+    Source(SUBSCRIPTION_TOPIC, 'users.Subscriptions', ('user', 'following')),
+)
+
+OPERATIONS = {
+    Event.Action.INSERT: 'INSERT',
+    Event.Action.UPDATE: 'UPDATE',
+    Event.Action.DELETE: 'DELETE',
+}
+
+
+def trigger_name(source):
+    return f'outbox_{source.topic}'
+
+
+def _columns(model, source):
+    return model._meta.pk.column, [
+        (key, model._meta.get_field(key).column) for key in source.keys
+    ]
+
+
+def _postgresql_create(connection, model, source):
+    quote = connection.ops.quote_name
+    name = trigger_name(source)
+    pk, keys = _columns(model, source)
+    data = ', '.join(
+        f"'{key}', changed.{quote(column)}" for key, column in keys
+    )
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION {quote(name)}() RETURNS trigger AS $$
+        DECLARE
+            changed record;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                changed := OLD;
+            ELSE
+                changed := NEW;
+            END IF;
+            INSERT INTO {quote(Event._meta.db_table)}
+                (topic, action, object_id, data, transaction_id, created_at)
+            VALUES (
+                '{source.topic}', lower(TG_OP), changed.{quote(pk)},
+                jsonb_build_object({data}), txid_current(), clock_timestamp()
+            );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        f'DROP TRIGGER IF EXISTS {quote(name)} '
+        f'ON {quote(model._meta.db_table)}',
+        f"""
+        CREATE TRIGGER {quote(name)}
+        AFTER INSERT OR UPDATE OR DELETE ON {quote(model._meta.db_table)}
+        FOR EACH ROW EXECUTE FUNCTION {quote(name)}()
+        """,
+    ]
+
+
+def _postgresql_drop(connection, model, source):
+    quote = connection.ops.quote_name
+    name = trigger_name(source)
+    return [
+        f'DROP TRIGGER IF EXISTS {quote(name)} '
+        f'ON {quote(model._meta.db_table)}',
+        f'DROP FUNCTION IF EXISTS {quote(name)}()',
+    ]
+
+
+def _sqlite_create(connection, model, source):
+    quote = connection.ops.quote_name
+    pk, keys = _columns(model, source)
+    statements = _sqlite_drop(connection, model, source)
+    for action, operation in OPERATIONS.items():
+        row = 'OLD' if action == Event.Action.DELETE else 'NEW'
+        data = ', '.join(
+            f"'{key}', {row}.{quote(column)}" for key, column in keys
+        )
+        statements.append(
+            f"""
+            CREATE TRIGGER {quote(f'{trigger_name(source)}_{action}')}
+            AFTER {operation} ON {quote(model._meta.db_table)}
+            BEGIN
+                INSERT INTO {quote(Event._meta.db_table)}
+                    (topic, action, object_id, data, transaction_id,
+                     created_at)
+                VALUES (
+                    '{source.topic}', '{action}', {row}.{quote(pk)},
+                    json_object({data}), 0,
+                    strftime('%Y-%m-%d %H:%M:%f', 'now')
+                );
+            END
+            """
+        )
+    return statements
+
+
+def _sqlite_drop(connection, model, source):
+    quote = connection.ops.quote_name
+    return [
+        f"DROP TRIGGER IF EXISTS {quote(f'{trigger_name(source)}_{action}')}"
+        for action in OPERATIONS
+    ]
+
+
+STATEMENTS = {
+    'postgresql': (_postgresql_create, _postgresql_drop),
+    'sqlite': (_sqlite_create, _sqlite_drop),
+}
+
+
+def _apply(using, apps, enabled=True):
+    connection = connections[using]
+    if connection.vendor not in STATEMENTS:
+        raise NotImplementedError(
+            f'Outbox triggers are not supported on {connection.vendor}.'
+        )
+    create, drop = STATEMENTS[connection.vendor]
+    tables = set(connection.introspection.table_names())
+    enabled = enabled and Event._meta.db_table in tables
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        for source in SOURCES:
+            model = apps.get_model(source.model)
+            if model._meta.db_table not in tables:
+                continue
+            build = create if enabled else drop
+            for statement in build(connection, model, source):
+                # Без параметров: в SQL есть знаки %.
+                cursor.execute(statement, None)
+
+
+def install_triggers(using=DEFAULT_DB_ALIAS, apps=global_apps, **kwargs):
+    """
+    Создает (пересоздает) триггеры на таблицах SOURCES, а если таблицы
+    событий нет (миграции outbox откатили) - удаляет их.
+
+    Подключен к post_migrate, повторный вызов безопасен.
+    """
+    _apply(using, apps)
+
+
+def drop_triggers(using=DEFAULT_DB_ALIAS, apps=global_apps):
+    """Удаляет триггеры с таблиц SOURCES."""
+    _apply(using, apps, enabled=False)
@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.urls import reverse
+from django.utils.html import format_html
 
 from .constants import LIST_PAGE
 from .models import (
@@ -9,26 +11,54 @@ from .models import (
     RecipeTags,
     Tag,
     UserFavoriteRecipes,
+    UserShoppingCart,
 )
+from .utils import count_for_recipe
+
+
+def changelist_link(model, text, **params):
+    """
+    Ссылка на список объектов model, отфильтрованный по params.
+
+    Используется вместо инлайнов со связями без ограничения размера:
+    такой список загружается постранично и только по запросу.
+    """
+    url = reverse(
+        f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist'
+    )
+    query = '&'.join(f'{key}={value}' for key, value in params.items())
+    return format_html('<a href="{}?{}">{}</a>', url, query, text)
 
 
 class RecipeIngredientsInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 1
+    autocomplete_fields = ('ingredient',)
 
 
 class RecipeTagsInline(admin.TabularInline):
     model = RecipeTags
     extra = 1
+    autocomplete_fields = ('tag',)
 
 
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'measurement_unit')
     empty_value_display = 'тут пусто'
     list_per_page = LIST_PAGE
-    list_filter = ('name',)
-    search_fields = ('name',)
-    inlines = (RecipeIngredientsInline,)
+    list_select_related = ('measurement_unit',)
+    show_full_result_count = False
+    search_fields = ('^name',)
+    autocomplete_fields = ('measurement_unit',)
+    readonly_fields = ('recipes_link',)
+
+    @admin.display(description='Рецепты')
+    def recipes_link(self, obj):
+        return changelist_link(
+            Recipe,
+            f'Рецептов: {obj.recipes.count()}',
+            ingredients__id__exact=obj.pk,
+        )
 
 
 @admin.register(MeasurementUnit)
@@ -44,19 +74,29 @@ class TagAdmin(admin.ModelAdmin):
     empty_value_display = 'тут пусто'
     list_filter = ('name', 'slug')
     search_fields = ('name', 'slug')
-    inlines = (RecipeTagsInline,)
+    readonly_fields = ('recipes_link',)
+
+    @admin.display(description='Рецепты')
+    def recipes_link(self, obj):
+        return changelist_link(
+            Recipe,
+            f'Рецептов: {obj.recipes.count()}',
+            tags__id__exact=obj.pk,
+        )
 
 
 class UserFavoriteRecipesAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'user')
     empty_value_display = 'тут пусто'
-    list_filter = ('recipe', 'user')
-    search_fields = ('recipe', 'user')
+    list_per_page = LIST_PAGE
+    list_select_related = ('recipe', 'user')
+    show_full_result_count = False
+    search_fields = ('^recipe__name', '^user__username')
+    autocomplete_fields = ('recipe', 'user')
 
 
-class UserFavoriteRecipesInline(admin.TabularInline):
-    model = UserFavoriteRecipes
-    extra = 1
+class UserShoppingCartAdmin(UserFavoriteRecipesAdmin):
+    pass
 
 
 class RecipeAdmin(admin.ModelAdmin):
@@ -67,24 +107,42 @@ class RecipeAdmin(admin.ModelAdmin):
         'is_favorite',
     )
     empty_value_display = 'тут пусто'
+    list_per_page = LIST_PAGE
+    list_select_related = ('author',)
+    show_full_result_count = False
 
     list_filter = ('tags',)
     search_fields = (
-        'name',
-        'author',
-        'tags',
+        '^name',
+        '^author__username',
     )
+    autocomplete_fields = ('author',)
+    readonly_fields = ('favorites',)
     inlines = (
         RecipeIngredientsInline,
         RecipeTagsInline,
-        UserFavoriteRecipesInline,
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            favorites_count=count_for_recipe(UserFavoriteRecipes)
+        )
+
+    @admin.display(description='В избранном', ordering='favorites_count')
     def is_favorite(self, obj=Recipe):
-        return UserFavoriteRecipes.objects.filter(recipe=obj.id).count()
+        return obj.favorites_count
+
+    @admin.display(description='В избранном')
+    def favorites(self, obj):
+        return changelist_link(
+            UserFavoriteRecipes,
+            f'Пользователей: {obj.favorites_count}',
+            recipe__id__exact=obj.pk,
+        )
 
 
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(UserFavoriteRecipes, UserFavoriteRecipesAdmin)
+admin.site.register(UserShoppingCart, UserShoppingCartAdmin)
@@ -0,0 +1,145 @@
+"""
+Снимок каталога ингредиентов для GET /api/ingredients/ без фильтров.
+
+Весь каталог один раз сериализуется в компактный JSON и сжимается во
+все доступные кодировки (core.compression). Файлы версии (хеш JSON)
+пишутся в PROTECTED_MEDIA_ROOT/catalog, затем атомарно подменяется
+указатель на текущую версию, так что читатель не увидит наполовину
+записанный снимок. Воркер держит снимок в памяти и перечитывает его с
+диска, только когда меняется указатель: запрос без фильтра обходится
+без ORM и сериализации.
+
+При изменении ингредиентов и единиц измерения снимок пересобирает
+фоновая задача (см. signals).
+"""
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+from core.compression import ENCODINGS, compress
+from .constants import CATALOG_DIR, CATALOG_KEEP_VERSIONS
+from .models import Ingredient
+
+CATALOG_NAME = 'ingredients'
+EXTENSIONS = {None: '', 'gzip': '.gz', 'br': '.br', 'zstd': '.zst'}
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: str
+    # {кодировка: байты}, None - без сжатия.
+    bodies: dict = field(default_factory=dict)
+
+
+_snapshot = None
+_pointer_mtime = None
+
+
+def _catalog_dir():
+    return os.path.join(settings.PROTECTED_MEDIA_ROOT, CATALOG_DIR)
+
+
+def _pointer_path():
+    return os.path.join(_catalog_dir(), f'{CATALOG_NAME}.current')
+
+
+def _body_path(version, encoding):
+    return os.path.join(
+        _catalog_dir(), f'{CATALOG_NAME}-{version}.json{EXTENSIONS[encoding]}'
+    )
+
+
+def render_catalog():
+    """Каталог в том же виде, что и IngredientSerializer, одним запросом."""
+    rows = (
+        Ingredient.objects.order_by('pk')
+        .values_list('pk', 'name', 'measurement_unit__short_name')
+    )
+    return json.dumps(
+        [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for pk, name, unit in rows
+        ],
+        ensure_ascii=False,
+        separators=(',', ':'),
+    ).encode()
+
+
+def _write(path, data):
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(data)
+    os.replace(temporary, path)
+
+
+def build_snapshot():
+    """Собирает снимок, сохраняет его на диск и делает текущим."""
+    raw = render_catalog()
+    version = hashlib.sha1(raw).hexdigest()[:16]
+    bodies = {None: raw}
+    bodies.update(
+        {encoding: compress(raw, encoding) for encoding in ENCODINGS}
+    )
+
+    os.makedirs(_catalog_dir(), exist_ok=True)
+    for encoding, body in bodies.items():
+        _write(_body_path(version, encoding), body)
+    _write(_pointer_path(), version.encode())
+    _prune(version)
+    return Snapshot(version, bodies)
+
+
+def _prune(current):
+    """Удаляет старые версии, оставляя CATALOG_KEEP_VERSIONS последних."""
+    prefix = f'{CATALOG_NAME}-'
+    versions = {}
+    with os.scandir(_catalog_dir()) as entries:
+        for entry in entries:
+            if entry.name.startswith(prefix) and '.json' in entry.name:
+                version = entry.name[len(prefix):].split('.', 1)[0]
+                mtime = entry.stat().st_mtime
+                versions[version] = max(versions.get(version, 0), mtime)
+    versions.pop(current, None)
+    old = sorted(versions, key=versions.get, reverse=True)
+    for version in old[CATALOG_KEEP_VERSIONS - 1:]:
+        for encoding in EXTENSIONS:
+            try:
+                os.remove(_body_path(version, encoding))
+            except FileNotFoundError:
+                pass
+
+
+def _load(version):
+    bodies = {}
+    for encoding in EXTENSIONS:
+        try:
+            with open(_body_path(version, encoding), 'rb') as file:
+                bodies[encoding] = file.read()
+        except FileNotFoundError:
+            # Кодировка недоступна там, где собирали снимок.
+            continue
+    if None not in bodies:
+        raise FileNotFoundError(_body_path(version, None))
+    return Snapshot(version, bodies)
+
+
+def get_snapshot():
+    """
+    Текущий снимок: из памяти, с диска, если его пересобрали, или
+    собранный заново, если его еще нет.
+    """
+    global _snapshot, _pointer_mtime
+    try:
+        mtime = os.stat(_pointer_path()).st_mtime_ns
+        if _snapshot is None or mtime != _pointer_mtime:
+            with open(_pointer_path(), 'rb') as file:
+                version = file.read().decode()
+            _snapshot = _load(version)
+            _pointer_mtime = mtime
+    except (FileNotFoundError, UnicodeDecodeError):
+        _snapshot = build_snapshot()
+        _pointer_mtime = os.stat(_pointer_path()).st_mtime_ns
+    return _snapshot
@@ -1,6 +1,35 @@
 RECIPE_MAXLENGTH = 256
 UNIT_MAXLENGTH = 64
 INGREDIENT_MAXLENGTH = 128
-CHARACTERS = 'ABCDEFGHJKLMNOPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz234567890'
+CHARACTERS = 'abcdefghijkmnopqrstuvwxyz234567890'
 SHORT_URL_LENGTH = 6
 LIST_PAGE = 20
+EXPORT_CHUNK_SIZE = 500
+EXPORTS_DIR = 'exports'
+# Сколько секунд хранятся файлы выгрузок, отданные через nginx.
+EXPORT_FILE_TTL = 60 * 60
+BATCH_MAX_SIZE = 100
+RECIPE_FRAGMENT_TIMEOUT = 60 * 60 * 24
+SIMILAR_RECIPES_COUNT = 10
+SIMILARITY_BATCH_SIZE = 1000
+SIMILARITY_BATCH_NNZ = 5_000_000
+SIMILARITY_MAX_DF = 0.5
+SIMILARITY_MAX_POSTINGS = 5000
+SIMILARITY_TAG_WEIGHT = 0.5
+# Период полного пересчета похожих рецептов, секунды.
+SIMILAR_RECIPES_REBUILD_INTERVAL = 60 * 60 * 24
+TRENDING_WINDOW_DAYS = 14
+TRENDING_HALF_LIFE_HOURS = 72
+SCORES_BATCH_SIZE = 1000
+# Период пересчета popularity и trending обработчиком задач, секунды.
+SCORES_UPDATE_INTERVAL = 60 * 15
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+COUNT_NONE = 'none'
+COUNT_MODES = (COUNT_EXACT, COUNT_ESTIMATE, COUNT_NONE)
+PAGINATION_COUNT_TIMEOUT = 60
+PAGINATION_ESTIMATE_MIN = 1000
+CATALOG_DIR = 'catalog'
+CATALOG_KEEP_VERSIONS = 2
+SHORT_LINKS_DIR = 'short_links'
+SHORT_LINKS_MAP = 'short_links.map'
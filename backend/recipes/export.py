@@ -0,0 +1,89 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .constants import EXPORT_CHUNK_SIZE
+from .models import (
+    Recipe,
+    RecipeIngredient,
+    UserFavoriteRecipes,
+    UserShoppingCart,
+)
+from .utils import count_for_recipe
+
+
+def get_export_queryset(after=0):
+    """Рецепты с id больше after в порядке id со всеми связями."""
+    return (
+        Recipe.objects.filter(pk__gt=after)
+        .select_related('author')
+        .prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient__measurement_unit'
+                ),
+            ),
+        )
+        .annotate(
+            favorites_count=count_for_recipe(UserFavoriteRecipes),
+            shopping_cart_count=count_for_recipe(UserShoppingCart),
+        )
+        .order_by('pk')
+    )
+
+
+def recipe_to_dict(recipe):
+    return {
+        'id': recipe.pk,
+        'name': recipe.name,
+        'text': recipe.text,
+        'image': recipe.image.name,
+        'cooking_time': recipe.cooking_time,
+        'created_at': recipe.created_at,
+        'author': {
+            'id': recipe.author.pk,
+            'username': recipe.author.username,
+        },
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {
+                'id': item.ingredient.pk,
+                'name': item.ingredient.name,
+                'measurement_unit': (
+                    item.ingredient.measurement_unit.short_name
+                ),
+                'amount': item.amount,
+            }
+            for item in recipe.recipe_ingredients.all()
+        ],
+        'favorites_count': recipe.favorites_count,
+        'shopping_cart_count': recipe.shopping_cart_count,
+    }
+
+
+def iter_recipes_ndjson(after=0, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Построчно (NDJSON) выгружает рецепты с id больше after.
+
+    Рецепты читаются серверным курсором порциями по chunk_size,
+    связи подгружаются одним запросом на порцию, поэтому расход памяти
+    не зависит от размера таблицы. Чтобы продолжить прерванную
+    выгрузку, достаточно передать id последней полученной строки.
+    """
+    queryset = get_export_queryset(after)
+    for recipe in queryset.iterator(chunk_size=chunk_size):
+        yield json.dumps(
+            recipe_to_dict(recipe), cls=DjangoJSONEncoder, ensure_ascii=False
+        ) + '\n'
+
+
+def write_recipes_ndjson(file, after=0, chunk_size=EXPORT_CHUNK_SIZE):
+    """Пишет выгрузку в открытый файл, возвращает число рецептов."""
+    count = 0
+    for line in iter_recipes_ndjson(after=after, chunk_size=chunk_size):
+        file.write(line)
+        count += 1
+    return count
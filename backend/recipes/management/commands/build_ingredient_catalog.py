@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from recipes.catalog import build_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Build the ingredient catalog snapshot served by /api/ingredients/'
+
+    def handle(self, *args, **options):
+        snapshot = build_snapshot()
+        sizes = ', '.join(
+            f'{encoding or "raw"} {len(body)} B'
+            for encoding, body in snapshot.bodies.items()
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Ingredient catalog {snapshot.version} built: {sizes}.'
+            )
+        )
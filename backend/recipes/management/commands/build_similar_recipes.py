@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from recipes.constants import SIMILAR_RECIPES_COUNT
+from recipes.similarity import refresh_similar_recipes
+
+
+class Command(BaseCommand):
+    help = 'Build similar recipes by shared ingredients and tags'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Rebuild all recipes, not only new or edited ones.',
+        )
+        parser.add_argument('-k', type=int, default=SIMILAR_RECIPES_COUNT)
+
+    def handle(self, *args, **options):
+        count = refresh_similar_recipes(full=options['full'], k=options['k'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Similar recipes updated for {count} recipes.')
+        )
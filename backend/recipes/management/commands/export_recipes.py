@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from recipes.constants import EXPORT_CHUNK_SIZE
+from recipes.export import iter_recipes_ndjson, write_recipes_ndjson
+
+
+class Command(BaseCommand):
+    help = 'Export recipes as NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--after', type=int, default=0,
+            help='Export recipes with id greater than this one (resume).',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+        )
+        parser.add_argument(
+            '--output', '-o',
+            help='File to write to. Appends when resuming, stdout if omitted.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            lines = iter_recipes_ndjson(
+                after=options['after'], chunk_size=options['chunk_size']
+            )
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        mode = 'a' if options['after'] else 'w'
+        with open(options['output'], mode, encoding='utf-8') as file:
+            count = write_recipes_ndjson(
+                file, after=options['after'], chunk_size=options['chunk_size']
+            )
+        self.stderr.write(
+            self.style.SUCCESS(f'Exported {count} recipes.')
+        )
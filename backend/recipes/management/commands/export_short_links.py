@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from recipes.short_links import export_map, map_path, reload_nginx
+
+
+class Command(BaseCommand):
+    help = 'Export short links to the nginx map file and reload nginx'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-reload',
+            action='store_true',
+            help='Only write the map file, do not run '
+                 'SHORT_LINKS_RELOAD_COMMAND.',
+        )
+
+    def handle(self, *args, **options):
+        count = export_map()
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} short links exported to {map_path()}.'
+        ))
+        if not options['no_reload'] and reload_nginx():
+            self.stdout.write('nginx reloaded.')
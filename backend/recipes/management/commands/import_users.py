@@ -1,40 +1,68 @@
-import csv
 import os
 
-from django.core.management.base import BaseCommand
 from django.conf import settings
+from django.core.management.base import BaseCommand
 
-from users.models import User
+from users.constants import USERS_IMPORT_CHUNK_SIZE
+from users.importer import import_users
 
 
 class Command(BaseCommand):
     help = 'Import users from CSV'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            help='CSV file: first name, last name, username, email, '
+                 'password. Defaults to data/users.csv.',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processes hashing passwords, 1 hashes in this process.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=USERS_IMPORT_CHUNK_SIZE,
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Validate and count users without saving them.',
+        )
+
     def handle(self, *args, **options):
-        base_dir = os.path.dirname(settings.BASE_DIR)
-        file_path = os.path.join(base_dir, 'data', 'users.csv')
-        file_path = os.path.join(base_dir, 'data', 'users.csv')
-        with open(file_path, mode='r', encoding='utf-8') as file:
-            for row in csv.reader(file):
-                try:
-                    user = User.objects.get(username=row[3])
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f"User with username {row[2]} already "
-                            f"exists.Skipping..."
-                        )
-                    )
-                except User.DoesNotExist:
-
-                    user = User.objects.create(
-                        first_name=row[0],
-                        last_name=row[1],
-                        username=row[2],
-                        email=row[3],
-                        password=row[4]
-                    )
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f"Successfully imported users: {user.username}"
-                        )
-                    )
+        file_path = options['path'] or os.path.join(
+            os.path.dirname(settings.BASE_DIR), 'data', 'users.csv'
+        )
+        with open(file_path, mode='r', encoding='utf-8', newline='') as file:
+            stats = import_users(
+                file,
+                workers=max(1, options['workers']),
+                chunk_size=max(1, options['chunk_size']),
+                dry_run=options['dry_run'],
+                on_progress=self.progress,
+                on_invalid=self.invalid,
+            )
+        verb = 'Would import' if options['dry_run'] else 'Imported'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{verb} {stats.created} users. Skipped: '
+                f'{stats.existing} existing, {stats.duplicates} duplicate, '
+                f'{stats.invalid} invalid rows.'
+            )
+        )
+
+    def progress(self, stats):
+        self.stdout.write(
+            f'Rows read: {stats.rows}, users saved: {stats.created}.'
+        )
+
+    def invalid(self, line, error):
+        if hasattr(error, 'error_dict'):
+            message = '; '.join(
+                f'{name}: {" ".join(messages)}'
+                for name, messages in error.message_dict.items()
+            )
+        else:
+            message = ' '.join(error.messages)
+        self.stderr.write(
+            self.style.WARNING(f'Line {line} skipped: {message}')
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipes.scores import update_scores
+
+
+class Command(BaseCommand):
+    help = 'Update popularity and trending scores of recipes'
+
+    def handle(self, *args, **options):
+        popularity, trending = update_scores()
+        self.stdout.write(self.style.SUCCESS(
+            f'Popularity updated for {popularity} recipes, '
+            f'trending for {trending} recipes.'
+        ))
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_shopping_lists(apps, schema_editor):
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    UserShoppingListItem = apps.get_model('recipes', 'UserShoppingListItem')
+    totals = (
+        RecipeIngredient.objects
+        .filter(recipe__user_shopping_cart__isnull=False)
+        .values('recipe__user_shopping_cart__user_id', 'ingredient_id')
+        .annotate(total=Sum('amount'))
+    )
+    UserShoppingListItem.objects.bulk_create(
+        UserShoppingListItem(
+            user_id=row['recipe__user_shopping_cart__user_id'],
+            ingredient_id=row['ingredient_id'],
+            amount=row['total'],
+        )
+        for row in totals
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_alter_recipe_ingredients_alter_recipe_tags_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Позиция списка покупок',
+                'verbose_name_plural': 'Позиции списка покупок',
+                'default_related_name': 'shopping_list_items',
+                'constraints': [models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_user_shopping_list_ingredient')],
+            },
+        ),
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:13
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_scores(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    # Время старых событий неизвестно: берем дату публикации рецепта,
+    # чтобы они не попали в «тренды» разом.
+    recipe_created_at = Subquery(
+        Recipe.objects.filter(pk=OuterRef('recipe_id')).values('created_at')
+    )
+    counts = []
+    for name in ('UserFavoriteRecipes', 'UserShoppingCart'):
+        model = apps.get_model('recipes', name)
+        model.objects.update(created_at=recipe_created_at)
+        counts.append(Coalesce(
+            Subquery(
+                model.objects.filter(recipe=OuterRef('pk')).order_by()
+                .values('recipe').annotate(count=Count('pk')).values('count')
+            ),
+            0,
+        ))
+    Recipe.objects.update(popularity=counts[0] + counts[1])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_similarrecipesrefresh_similarrecipe'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='popularity',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Популярность'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending',
+            field=models.FloatField(default=0, editable=False, verbose_name='Тренд'),
+        ),
+        migrations.AddField(
+            model_name='userfavoriterecipes',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='usershoppingcart',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-popularity', '-created_at'], name='recipe_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending', '-created_at'], name='recipe_trending_idx'),
+        ),
+        migrations.RunPython(fill_scores, migrations.RunPython.noop),
+    ]
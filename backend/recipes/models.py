@@ -33,7 +33,8 @@ class Ingredient(models.Model):
 
     name = models.CharField(
         _('Название ингредиента'),
-        max_length=INGREDIENT_MAXLENGTH
+        max_length=INGREDIENT_MAXLENGTH,
+        db_index=True,
     )
     measurement_unit = models.ForeignKey(
         MeasurementUnit,
@@ -104,7 +105,8 @@ class Recipe(models.Model):
 
     name = models.CharField(
         _('Название рецепта'),
-        max_length=RECIPE_MAXLENGTH
+        max_length=RECIPE_MAXLENGTH,
+        db_index=True,
     )
     author = models.ForeignKey(
         User,
@@ -143,6 +145,15 @@ class Recipe(models.Model):
         _('Дата публикации'),
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        _('Дата изменения'),
+        auto_now=True,
+        db_index=True,
+    )
+    popularity = models.PositiveIntegerField(
+        _('Популярность'), default=0, editable=False
+    )
+    trending = models.FloatField(_('Тренд'), default=0, editable=False)
     short_link = models.OneToOneField(
         ShortLink,
         on_delete=models.CASCADE,
@@ -156,6 +167,16 @@ class Recipe(models.Model):
         verbose_name_plural = _('Рецепты')
         ordering = ('-created_at',)
         default_related_name = 'recipes'
+        indexes = [
+            models.Index(
+                fields=['-popularity', '-created_at'],
+                name='recipe_popularity_idx',
+            ),
+            models.Index(
+                fields=['-trending', '-created_at'],
+                name='recipe_trending_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -171,6 +192,9 @@ class UserFavoriteRecipes(models.Model):
         User, on_delete=models.CASCADE, related_name='favorite_recipes'
     )
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(
+        _('Дата добавления'), auto_now_add=True, db_index=True
+    )
 
     class Meta:
         verbose_name = _('Избранное')
@@ -184,7 +208,7 @@ class UserFavoriteRecipes(models.Model):
         ]
 
     def __str__(self):
-        return f'{self.recipe.name} - в Избранном у {self.user.name}.'
+        return f'{self.recipe.name} - в Избранном у {self.user.username}.'
 
 
 class UserShoppingCart(models.Model):
@@ -194,6 +218,9 @@ class UserShoppingCart(models.Model):
         User, on_delete=models.CASCADE, related_name='shopping_cart'
     )
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(
+        _('Дата добавления'), auto_now_add=True, db_index=True
+    )
 
     class Meta:
         verbose_name = _('Список покупок')
@@ -207,7 +234,7 @@ class UserShoppingCart(models.Model):
         ]
 
     def __str__(self):
-        return f'{self.recipe.name} - в Списке покупок у {self.user.name}.'
+        return f'{self.recipe.name} - в Списке покупок у {self.user.username}.'
 
 
 class RecipeIngredient(models.Model):
@@ -241,3 +268,81 @@ class RecipeTags(models.Model):
                 name='unique_recipe_tag',
             ),
         ]
+
+
+class UserShoppingListItem(models.Model):
+    """
+    Суммарный список покупок пользователя.
+
+    Хранит итоговое количество каждого ингредиента по всем рецептам
+    из UserShoppingCart. Поддерживается сигналами из recipes.signals.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='shopping_list'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name=_('Ингредиент'),
+    )
+    amount = models.PositiveIntegerField(_('Количество'))
+
+    class Meta:
+        verbose_name = _('Позиция списка покупок')
+        verbose_name_plural = _('Позиции списка покупок')
+        default_related_name = 'shopping_list_items'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_user_shopping_list_ingredient'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} - {self.amount}'
+
+
+class SimilarRecipe(models.Model):
+    """
+    Похожий рецепт (по общим ингредиентам и тегам).
+
+    Заполняется задачей recipes.tasks.refresh_similar_recipes (или
+    командой build_similar_recipes).
+    """
+
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name='similar_recipes'
+    )
+    similar = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name='+'
+    )
+    score = models.FloatField(_('Похожесть'))
+
+    class Meta:
+        verbose_name = _('Похожий рецепт')
+        verbose_name_plural = _('Похожие рецепты')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'], name='unique_similar_recipe'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'], name='similar_recipe_score_idx'
+            ),
+        ]
+
+
+class SimilarRecipesRefresh(models.Model):
+    """Очередь новых/измененных рецептов для пересчета похожих."""
+
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True,
+        related_name='+'
+    )
+    requested_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('Пересчет похожих рецептов')
+        verbose_name_plural = _('Пересчет похожих рецептов')
@@ -0,0 +1,89 @@
+"""
+Оценки рецептов для сортировок «популярные» и «в тренде».
+
+Оценки пересчитывает фоновая задача recipes.tasks.update_recipe_scores
+раз в SCORES_UPDATE_INTERVAL секунд (15 минут; вне расписания - команда
+update_recipe_scores) и хранятся в индексированных полях
+Recipe.popularity и Recipe.trending, так что сортировка списка - обход
+индекса, без агрегации на каждый запрос.
+
+popularity - число добавлений в избранное и в корзину.
+trending - те же события за последние TRENDING_WINDOW_DAYS дней, каждое
+с весом 2 ** (-возраст / TRENDING_HALF_LIFE_HOURS).
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .constants import (
+    SCORES_BATCH_SIZE,
+    TRENDING_HALF_LIFE_HOURS,
+    TRENDING_WINDOW_DAYS,
+)
+from .models import Recipe, UserFavoriteRecipes, UserShoppingCart
+from .utils import count_for_recipe
+
+EVENT_MODELS = (UserFavoriteRecipes, UserShoppingCart)
+
+
+def update_popularity():
+    """Пересчитывает popularity одним UPDATE, только для изменившихся."""
+    popularity = (
+        count_for_recipe(UserFavoriteRecipes)
+        + count_for_recipe(UserShoppingCart)
+    )
+    return Recipe.objects.exclude(popularity=popularity).update(
+        popularity=popularity
+    )
+
+
+def trending_scores(now=None):
+    """
+    Словарь id рецепта -> оценка тренда.
+
+    События группируются по часам в БД, затухание применяется к
+    каждому часу, а не к каждому событию.
+    """
+    now = now or timezone.now()
+    since = now - timedelta(days=TRENDING_WINDOW_DAYS)
+    scores = defaultdict(float)
+    for model in EVENT_MODELS:
+        hours = (
+            model.objects.filter(created_at__gte=since)
+            .annotate(hour=TruncHour('created_at'))
+            .values('recipe_id', 'hour')
+            .annotate(count=Count('pk'))
+            .values_list('recipe_id', 'hour', 'count')
+            .order_by()
+        )
+        for recipe_id, hour, count in hours.iterator():
+            age = (now - hour).total_seconds() / 3600
+            scores[recipe_id] += count * 2 ** (-age / TRENDING_HALF_LIFE_HOURS)
+    return scores
+
+
+def update_trending(now=None, batch_size=SCORES_BATCH_SIZE):
+    """
+    Пересчитывает trending. Рецепты без событий за окно получают 0.
+
+    Возвращает число обновленных рецептов.
+    """
+    scores = trending_scores(now)
+    stale = Recipe.objects.filter(trending__gt=0).values_list(
+        'pk', flat=True
+    )
+    recipe_ids = set(scores) | set(stale)
+    recipes = [
+        Recipe(pk=pk, trending=round(scores.get(pk, 0), 6))
+        for pk in recipe_ids
+    ]
+    Recipe.objects.bulk_update(recipes, ['trending'], batch_size=batch_size)
+    return len(recipes)
+
+
+def update_scores(now=None):
+    """Пересчитывает обе оценки, возвращает (popularity, trending)."""
+    return update_popularity(), update_trending(now)
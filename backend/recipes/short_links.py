@@ -0,0 +1,104 @@
+"""
+Редиректы коротких ссылок силами nginx.
+
+Пары "код -> адрес рецепта" выгружаются в файл для директивы map
+nginx (PROTECTED_MEDIA_ROOT/short_links/, общий том с gateway, см.
+infra/nginx.conf): известные коды nginx перенаправляет сам, не
+обращаясь к backend, неизвестные передает ему (см. recipes.views).
+
+Строковые ключи map nginx сравнивает без учета регистра, поэтому
+выгружаются только коды в нижнем регистре (такие генерирует
+api.utils.get_short_link), а location в nginx.conf принимает только
+их. Старые коды с заглавными буквами разрешает backend.
+
+Полная выгрузка атомарно подменяет файл, новая ссылка дописывается
+в конец. После записи nginx плавно перечитывает конфигурацию: в
+контейнере gateway это делает infra/short-links-reload.sh, при
+другой установке - команда SHORT_LINKS_RELOAD_COMMAND.
+"""
+import os
+import re
+import shlex
+import subprocess
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+from .constants import SHORT_LINKS_DIR, SHORT_LINKS_MAP
+from .models import ShortLink
+
+RELOAD_TIMEOUT = 30
+# Должен совпадать с location /s/ в infra/nginx.conf.
+CODE_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def map_path():
+    return os.path.join(
+        settings.PROTECTED_MEDIA_ROOT, SHORT_LINKS_DIR, SHORT_LINKS_MAP
+    )
+
+
+def short_code(short_url):
+    """Код из короткой ссылки вида https://host/s/<код>/ или None."""
+    parts = urlsplit(short_url).path.strip('/').split('/')
+    if len(parts) == 2 and parts[0] == 's' and parts[1]:
+        return parts[1]
+    return None
+
+
+def map_line(short_url, full_url):
+    """Строка map или None, если ссылку нельзя записать в конфиг nginx."""
+    code = short_code(short_url)
+    if code is None or not CODE_PATTERN.fullmatch(code):
+        return None
+    # В значениях map nginx подставляет переменные ($) и разбирает
+    # кавычки и ';'.
+    if not full_url or any(char in full_url for char in '"\\$;\n\r'):
+        return None
+    return f'{code} "{full_url}";\n'
+
+
+def export_map():
+    """Выгружает все короткие ссылки. Возвращает число записанных."""
+    path = map_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    count = 0
+    with open(temporary, 'w', encoding='utf-8') as file:
+        rows = ShortLink.objects.order_by('pk').values_list(
+            'short_url', 'full_url'
+        )
+        for short_url, full_url in rows.iterator():
+            line = map_line(short_url, full_url)
+            if line:
+                file.write(line)
+                count += 1
+    os.replace(temporary, path)
+    return count
+
+
+def append_link(link):
+    """Дописывает одну ссылку в файл map. Возвращает, записана ли она."""
+    line = map_line(link.short_url, link.full_url)
+    if line is None:
+        return False
+    path = map_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # O_APPEND: короткая запись не перемешается с параллельными.
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write(line)
+    return True
+
+
+def reload_nginx():
+    """
+    Плавно перезагружает nginx командой SHORT_LINKS_RELOAD_COMMAND,
+    если она задана. Возвращает, была ли команда выполнена.
+    """
+    command = settings.SHORT_LINKS_RELOAD_COMMAND
+    if not command:
+        return False
+    subprocess.run(
+        shlex.split(command), check=True, timeout=RELOAD_TIMEOUT
+    )
+    return True
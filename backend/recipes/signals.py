@@ -0,0 +1,245 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from .models import (
+    Ingredient,
+    MeasurementUnit,
+    Recipe,
+    RecipeIngredient,
+    RecipeTags,
+    ShortLink,
+    Tag,
+    UserShoppingCart,
+)
+from . import tasks
+from .utils import (
+    add_recipe_to_shopping_list,
+    rebuild_shopping_lists,
+    remove_recipe_from_shopping_list,
+    request_similar_refresh,
+    touch_recipes,
+)
+
+User = get_user_model()
+
+# Поля пользователя, которые входят в представление автора рецепта.
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name', 'avatar'}
+
+# Рецепты, ингредиенты которых сейчас заменяются целиком.
+_replacing_ingredients = ContextVar('replacing_ingredients', default=())
+
+
+def _deleted_with_recipe(origin):
+    """
+    Удаление каскадное, начатое с рецепта или его автора (рецепт
+    удаляется целиком, его обработает pre_delete).
+    """
+    return (
+        isinstance(origin, (Recipe, User))
+        or getattr(origin, 'model', None) in (Recipe, User)
+    )
+
+
+def _schedule_shopping_lists_rebuild(recipe_ids):
+    """
+    Ставит в очередь пересчет списков покупок у всех, у кого рецепты
+    в корзине: их может быть много, поэтому пересчет идет в фоне.
+    """
+    recipe_ids = (
+        UserShoppingCart.objects.filter(recipe_id__in=recipe_ids)
+        .values_list('recipe_id', flat=True).distinct()
+    )
+    for recipe_id in recipe_ids:
+        tasks.rebuild_shopping_lists_for_recipe.delay(recipe_id=recipe_id)
+
+
+def _request_similar_refresh(recipe_ids):
+    """
+    Ставит рецепты в очередь на пересчет похожих и задачу, которая ее
+    разберет (одну на все изменения, пока та не взята в работу).
+    """
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        request_similar_refresh(recipe_ids)
+        tasks.refresh_similar_recipes.delay()
+
+
+def ingredients_changed(recipe_ids):
+    """
+    Пересчет после изменения ингредиентов рецептов: списки покупок,
+    кеш представления и похожие рецепты.
+    """
+    _schedule_shopping_lists_rebuild(recipe_ids)
+    touch_recipes(pk__in=recipe_ids)
+    _request_similar_refresh(recipe_ids)
+
+
+@contextmanager
+def replacing_ingredients(recipe_id):
+    """
+    Замена всех ингредиентов рецепта (удаление и bulk_create):
+    обработчики отдельных строк RecipeIngredient его пропускают, а
+    пересчет ставится один раз, после замены.
+    """
+    token = _replacing_ingredients.set(
+        (*_replacing_ingredients.get(), recipe_id)
+    )
+    try:
+        yield
+    finally:
+        _replacing_ingredients.reset(token)
+    ingredients_changed([recipe_id])
+
+
+@receiver(post_save, sender=UserShoppingCart)
+def shopping_cart_saved(sender, instance, created, **kwargs):
+    if created:
+        add_recipe_to_shopping_list(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_delete, sender=UserShoppingCart)
+def shopping_cart_deleted(sender, instance, origin=None, **kwargs):
+    if not _deleted_with_recipe(origin):
+        remove_recipe_from_shopping_list(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    """
+    При удалении рецепта его ингредиенты и записи корзины удаляются
+    каскадно в произвольном порядке, поэтому списки покупок затронутых
+    пользователей пересчитываются фоновой задачей после коммита.
+    """
+    user_ids = list(
+        UserShoppingCart.objects.filter(recipe=instance)
+        .values_list('user_id', flat=True)
+    )
+    if user_ids:
+        tasks.rebuild_shopping_lists.delay(user_ids=user_ids)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def recipe_ingredient_saved(sender, instance, **kwargs):
+    if instance.recipe_id not in _replacing_ingredients.get():
+        ingredients_changed([instance.recipe_id])
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_deleted(sender, instance, origin=None, **kwargs):
+    if (
+        instance.recipe_id not in _replacing_ingredients.get()
+        and not _deleted_with_recipe(origin)
+    ):
+        ingredients_changed([instance.recipe_id])
+
+
+@receiver(post_save, sender=RecipeTags)
+def recipe_tag_saved(sender, instance, **kwargs):
+    touch_recipes(pk=instance.recipe_id)
+    _request_similar_refresh([instance.recipe_id])
+
+
+@receiver(post_delete, sender=RecipeTags)
+def recipe_tag_deleted(sender, instance, origin=None, **kwargs):
+    if not _deleted_with_recipe(origin):
+        touch_recipes(pk=instance.recipe_id)
+        _request_similar_refresh([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    """Изменения через recipe.tags.add()/remove()/clear()."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    recipe_ids = (pk_set or ()) if reverse else (instance.pk,)
+    touch_recipes(pk__in=recipe_ids)
+    _request_similar_refresh(recipe_ids)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(tags=instance)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(ingredients=instance)
+    tasks.rebuild_ingredient_catalog.delay()
+
+
+@receiver(post_save, sender=MeasurementUnit)
+def measurement_unit_saved(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(ingredients__measurement_unit=instance)
+        tasks.rebuild_ingredient_catalog.delay()
+
+
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=MeasurementUnit)
+def catalog_deleted(sender, instance, **kwargs):
+    """Снимок каталога ингредиентов пересобирается в фоне."""
+    tasks.rebuild_ingredient_catalog.delay()
+
+
+@receiver(post_save, sender=ShortLink)
+def short_link_saved(sender, instance, created, **kwargs):
+    """Новая короткая ссылка дописывается в выгрузку для nginx."""
+    if created:
+        tasks.export_short_link.delay(link_id=instance.pk)
+
+
+@receiver(post_delete, sender=ShortLink)
+def short_link_deleted(sender, instance, **kwargs):
+    tasks.export_short_links.delay()
+
+
+@receiver(post_save, sender=User)
+def author_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Изменение профиля автора меняет представление его рецептов."""
+    if created:
+        return
+    if update_fields is not None and not AUTHOR_FIELDS & set(update_fields):
+        return
+    touch_recipes(author=instance)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_changed(sender, instance, action, reverse, pk_set,
+                               **kwargs):
+    """Изменения через recipe.ingredients.add()/remove()/clear()."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    recipe_ids = (pk_set or ()) if reverse else (instance.pk,)
+    ingredients_changed(recipe_ids)
+
+
+@receiver(m2m_changed, sender=Recipe.is_in_shopping_cart.through)
+def recipe_shopping_cart_changed(sender, instance, action, reverse, pk_set,
+                                 **kwargs):
+    """Изменения через recipe.is_in_shopping_cart.add()/remove()/clear()."""
+    if action == 'pre_clear':
+        instance._shopping_list_user_ids = (
+            [instance.pk] if reverse else list(
+                UserShoppingCart.objects.filter(recipe=instance)
+                .values_list('user_id', flat=True)
+            )
+        )
+        return
+    if action == 'post_clear':
+        rebuild_shopping_lists(instance.__dict__.pop(
+            '_shopping_list_user_ids', ()
+        ))
+    elif action in ('post_add', 'post_remove'):
+        rebuild_shopping_lists([instance.pk] if reverse else pk_set)
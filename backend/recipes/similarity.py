@@ -0,0 +1,234 @@
+"""
+Похожие рецепты по общим ингредиентам и тегам.
+
+Рецепт - строка разреженной матрицы рецепт x признак (ингредиенты и
+теги) с весами IDF: редкий общий ингредиент значит больше, чем соль.
+Строки нормируются, похожесть - косинус (скалярное произведение строк).
+Для каждого рецепта сохраняются top-k соседей в SimilarRecipe, так что
+эндпоинт читает их одним запросом по индексу.
+
+Строка произведения содержит всех рецептов, у которых есть общий
+признак, поэтому признак в N рецептах дает N кандидатов каждому из
+них. Признаки, встречающиеся более чем в SIMILARITY_MAX_POSTINGS
+рецептах (соль, популярные теги), отбрасываются, а произведение
+считается пачками, у которых оценка числа ненулевых элементов не
+больше SIMILARITY_BATCH_NNZ. Так память на пачку ограничена и на
+каталоге из миллионов рецептов.
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from scipy import sparse
+
+from .constants import (
+    SIMILAR_RECIPES_COUNT,
+    SIMILARITY_BATCH_NNZ,
+    SIMILARITY_BATCH_SIZE,
+    SIMILARITY_MAX_DF,
+    SIMILARITY_MAX_POSTINGS,
+    SIMILARITY_TAG_WEIGHT,
+)
+from .models import (
+    Recipe,
+    RecipeIngredient,
+    RecipeTags,
+    SimilarRecipe,
+    SimilarRecipesRefresh,
+)
+
+
+def row_of(matrix, row):
+    """Индексы столбцов и значения строки CSR-матрицы."""
+    start, end = matrix.indptr[row], matrix.indptr[row + 1]
+    return matrix.indices[start:end], matrix.data[start:end]
+
+
+def top_k(candidates, scores, exclude, k):
+    """k лучших кандидатов по оценке, кроме exclude."""
+    keep = ~np.isin(candidates, exclude)
+    candidates, scores = candidates[keep], scores[keep]
+    if len(scores) > k:
+        best = np.argpartition(-scores, k)[:k]
+        candidates, scores = candidates[best], scores[best]
+    order = np.argsort(-scores)
+    return candidates[order], scores[order]
+
+
+def _pairs(queryset, first, second):
+    """Два столбца queryset в виде массивов numpy, без лишних объектов."""
+    flat = np.fromiter(
+        (value for pair in queryset.values_list(first, second)
+         .order_by().iterator(chunk_size=10000) for value in pair),
+        dtype=np.int64,
+    )
+    return flat[0::2], flat[1::2]
+
+
+def build_feature_matrix():
+    """
+    Нормированная TF-IDF матрица рецепт x признак (CSR) и id рецептов.
+
+    Признаки - ингредиенты и теги (теги с весом SIMILARITY_TAG_WEIGHT).
+    Признаки, встречающиеся более чем в SIMILARITY_MAX_DF рецептов или
+    более чем в SIMILARITY_MAX_POSTINGS рецептах, отбрасываются: они
+    плохо отличают рецепты друг от друга, а кандидатов дают больше всех.
+    """
+    recipe_ids = np.fromiter(
+        Recipe.objects.order_by('pk').values_list('pk', flat=True)
+        .iterator(chunk_size=10000),
+        dtype=np.int64,
+    )
+    size = len(recipe_ids)
+
+    ingredient_recipes, ingredients = _pairs(
+        RecipeIngredient.objects, 'recipe_id', 'ingredient_id'
+    )
+    tag_recipes, tags = _pairs(RecipeTags.objects, 'recipe_id', 'tag_id')
+    ingredient_count = ingredients.max() + 1 if len(ingredients) else 0
+    tag_count = tags.max() + 1 if len(tags) else 0
+
+    rows = np.searchsorted(
+        recipe_ids, np.concatenate([ingredient_recipes, tag_recipes])
+    )
+    cols = np.concatenate([ingredients, ingredient_count + tags])
+    weights = np.concatenate([
+        np.ones(len(ingredients)),
+        np.full(len(tags), SIMILARITY_TAG_WEIGHT),
+    ])
+    matrix = sparse.csr_matrix(
+        (weights, (rows, cols)), shape=(size, ingredient_count + tag_count)
+    )
+
+    document_frequency = np.bincount(cols, minlength=matrix.shape[1])
+    idf = np.log((1 + size) / (1 + document_frequency)) + 1
+    max_df = min(SIMILARITY_MAX_DF * size, SIMILARITY_MAX_POSTINGS)
+    idf[document_frequency > max_df] = 0
+    matrix = (matrix @ sparse.diags(idf)).tocsr()
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1))).ravel()
+    norms[norms == 0] = 1
+    matrix = (sparse.diags(1 / norms) @ matrix).tocsr()
+    matrix.eliminate_zeros()
+    return matrix, recipe_ids
+
+
+def batches(rows, work, batch_size, max_nnz):
+    """
+    Делит rows на пачки не длиннее batch_size строк с суммой work не
+    больше max_nnz (строка, которая одна превышает max_nnz, - отдельная
+    пачка).
+    """
+    start = 0
+    while start < len(rows):
+        total = np.cumsum(work[rows[start:start + batch_size]])
+        size = max(1, int(np.searchsorted(total, max_nnz, side='right')))
+        yield rows[start:start + size]
+        start += size
+
+
+def neighbours(matrix, rows, k, batch_size=SIMILARITY_BATCH_SIZE,
+               max_nnz=SIMILARITY_BATCH_NNZ):
+    """Генерирует (строка, соседи, похожести) для строк rows пачками."""
+    transposed = matrix.T.tocsr()
+    # Оценка сверху числа ненулевых элементов строки произведения:
+    # сумма длин списков рецептов по признакам строки.
+    postings = np.diff(transposed.indptr)
+    work = (matrix != 0).astype(np.int64) @ postings
+    for batch in batches(rows, work, batch_size, max_nnz):
+        scores = (matrix[batch] @ transposed).tocsr()
+        for position, row in enumerate(batch):
+            yield (row, *top_k(*row_of(scores, position), [row], k))
+
+
+def build_similar_recipes(recipe_ids=None, k=SIMILAR_RECIPES_COUNT,
+                          batch_size=SIMILARITY_BATCH_SIZE):
+    """
+    Пересчитывает похожие рецепты для recipe_ids (для всех, если None).
+
+    При частичном пересчете рецепт также добавляется в списки своих
+    новых соседей (если проходит в их top-k) и удаляется из остальных
+    списков, так что новые и измененные рецепты сразу видны с обеих
+    сторон. Списки, из которых рецепт удален, не дополняются до k -
+    это делает периодический полный пересчет. Возвращает число
+    пересчитанных рецептов.
+    """
+    matrix, all_ids = build_feature_matrix()
+    if recipe_ids is None:
+        rows = np.arange(len(all_ids))
+    else:
+        rows = np.flatnonzero(np.isin(all_ids, list(recipe_ids)))
+
+    batch, batch_ids = [], []
+    for row, similar, scores in neighbours(matrix, rows, k, batch_size):
+        recipe_id = int(all_ids[row])
+        batch_ids.append(recipe_id)
+        batch.extend(
+            SimilarRecipe(
+                recipe_id=recipe_id,
+                similar_id=int(all_ids[similar_row]),
+                score=float(score),
+            )
+            for similar_row, score in zip(similar, scores)
+        )
+        if len(batch_ids) >= batch_size:
+            _save(batch, batch_ids, k, symmetric=recipe_ids is not None)
+            batch, batch_ids = [], []
+    if batch_ids:
+        _save(batch, batch_ids, k, symmetric=recipe_ids is not None)
+    return len(rows)
+
+
+def _save(batch, recipe_ids, k, symmetric):
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(recipe_id__in=recipe_ids).delete()
+        if symmetric:
+            SimilarRecipe.objects.filter(similar_id__in=recipe_ids).delete()
+        SimilarRecipe.objects.bulk_create(batch)
+        if not symmetric:
+            return
+
+        SimilarRecipe.objects.bulk_create(
+            [
+                SimilarRecipe(
+                    recipe_id=item.similar_id,
+                    similar_id=item.recipe_id,
+                    score=item.score,
+                )
+                for item in batch
+            ],
+            ignore_conflicts=True,
+        )
+        # Обрезаем списки соседей до k лучших.
+        affected = {item.similar_id for item in batch}
+        extra = (
+            SimilarRecipe.objects.filter(recipe_id__in=affected)
+            .annotate(rank=Window(
+                RowNumber(),
+                partition_by=F('recipe_id'),
+                order_by=F('score').desc(),
+            ))
+            .filter(rank__gt=k)
+            .values_list('pk', flat=True)
+        )
+        SimilarRecipe.objects.filter(pk__in=list(extra)).delete()
+
+
+def refresh_similar_recipes(full=False, k=SIMILAR_RECIPES_COUNT):
+    """
+    Пересчитывает похожие рецепты для рецептов из очереди
+    (или для всех при full=True) и очищает очередь.
+    """
+    started = timezone.now()
+    queue = SimilarRecipesRefresh.objects.all()
+    if full:
+        count = build_similar_recipes(k=k)
+    else:
+        recipe_ids = list(queue.values_list('recipe_id', flat=True))
+        if not recipe_ids:
+            return 0
+        count = build_similar_recipes(recipe_ids, k=k)
+    # Запросы, поступившие во время пересчета, остаются в очереди.
+    queue.filter(requested_at__lte=started).delete()
+    return count
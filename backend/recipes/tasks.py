@@ -0,0 +1,56 @@
+from jobs.constants import LOW_QUEUE
+from jobs.registry import every, task
+
+from . import catalog, scores, short_links, similarity, utils
+from .constants import (
+    SCORES_UPDATE_INTERVAL,
+    SIMILAR_RECIPES_REBUILD_INTERVAL,
+)
+from .models import ShortLink
+
+
+@task(unique=True)
+def rebuild_shopping_lists(user_ids):
+    utils.rebuild_shopping_lists(user_ids)
+
+
+@task(unique=True)
+def rebuild_shopping_lists_for_recipe(recipe_id):
+    utils.rebuild_shopping_lists_for_recipe(recipe_id)
+
+
+@task(unique=True)
+def rebuild_ingredient_catalog():
+    catalog.build_snapshot()
+
+
+@task()
+def export_short_link(link_id):
+    link = ShortLink.objects.filter(pk=link_id).first()
+    if link is not None and short_links.append_link(link):
+        short_links.reload_nginx()
+
+
+@task(unique=True)
+def export_short_links():
+    short_links.export_map()
+    short_links.reload_nginx()
+
+
+@task(queue=LOW_QUEUE, unique=True)
+def refresh_similar_recipes(full=False):
+    """
+    Разбирает очередь пересчета похожих рецептов (или пересчитывает
+    все при full=True). Частичный пересчет не дополняет списки, из
+    которых рецепты выпали, поэтому полный идет по расписанию.
+    """
+    similarity.refresh_similar_recipes(full=full)
+
+
+@task(queue=LOW_QUEUE, unique=True)
+def update_recipe_scores():
+    scores.update_scores()
+
+
+every(SCORES_UPDATE_INTERVAL, update_recipe_scores)
+every(SIMILAR_RECIPES_REBUILD_INTERVAL, refresh_similar_recipes, full=True)
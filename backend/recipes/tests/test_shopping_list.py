@@ -0,0 +1,133 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from jobs.models import Job
+from recipes import tasks
+from recipes.models import Ingredient, MeasurementUnit, UserShoppingCart
+from recipes.utils import (
+    add_recipe_to_shopping_list,
+    remove_recipe_from_shopping_list,
+)
+from .utils import LOCMEM_CACHES, create_recipe, run_jobs
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ShoppingListTestCase(TestCase):
+    """Суммарный список покупок и его пересчет."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='password'
+        )
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='password'
+        )
+        unit = MeasurementUnit.objects.create(
+            full_name='грамм', short_name='г'
+        )
+        cls.flour, cls.sugar, cls.eggs = Ingredient.objects.bulk_create([
+            Ingredient(name='мука', measurement_unit=unit),
+            Ingredient(name='сахар', measurement_unit=unit),
+            Ingredient(name='яйца', measurement_unit=unit),
+        ])
+        cls.cake = create_recipe(cls.author, {cls.flour: 200, cls.sugar: 50})
+        cls.bread = create_recipe(cls.author, {cls.flour: 500})
+
+    def shopping_list(self, user=None):
+        user = user or self.user
+        return dict(user.shopping_list.values_list('ingredient_id', 'amount'))
+
+    def test_add(self):
+        add_recipe_to_shopping_list(self.user.pk, self.cake.pk)
+        self.assertEqual(
+            self.shopping_list(), {self.flour.pk: 200, self.sugar.pk: 50}
+        )
+        add_recipe_to_shopping_list(self.user.pk, self.bread.pk)
+        self.assertEqual(
+            self.shopping_list(), {self.flour.pk: 700, self.sugar.pk: 50}
+        )
+
+    def test_remove_partial_amounts(self):
+        add_recipe_to_shopping_list(self.user.pk, self.cake.pk)
+        add_recipe_to_shopping_list(self.user.pk, self.bread.pk)
+        # Мука уменьшается, сахар обнуляется и удаляется.
+        remove_recipe_from_shopping_list(self.user.pk, self.cake.pk)
+        self.assertEqual(self.shopping_list(), {self.flour.pk: 500})
+        remove_recipe_from_shopping_list(self.user.pk, self.bread.pk)
+        self.assertEqual(self.shopping_list(), {})
+
+    def test_readd(self):
+        add_recipe_to_shopping_list(self.user.pk, self.cake.pk)
+        remove_recipe_from_shopping_list(self.user.pk, self.cake.pk)
+        add_recipe_to_shopping_list(self.user.pk, self.cake.pk)
+        self.assertEqual(
+            self.shopping_list(), {self.flour.pk: 200, self.sugar.pk: 50}
+        )
+
+    def test_lists_are_per_user(self):
+        add_recipe_to_shopping_list(self.user.pk, self.cake.pk)
+        add_recipe_to_shopping_list(self.author.pk, self.bread.pk)
+        remove_recipe_from_shopping_list(self.author.pk, self.bread.pk)
+        self.assertEqual(
+            self.shopping_list(), {self.flour.pk: 200, self.sugar.pk: 50}
+        )
+        self.assertEqual(self.shopping_list(self.author), {})
+
+    def test_cart_signals(self):
+        UserShoppingCart.objects.create(user=self.user, recipe=self.cake)
+        self.assertEqual(
+            self.shopping_list(), {self.flour.pk: 200, self.sugar.pk: 50}
+        )
+        UserShoppingCart.objects.filter(user=self.user).delete()
+        self.assertEqual(self.shopping_list(), {})
+
+    def test_recipe_deletion_rebuilds_lists(self):
+        UserShoppingCart.objects.create(user=self.user, recipe=self.cake)
+        UserShoppingCart.objects.create(user=self.user, recipe=self.bread)
+        Job.objects.all().delete()
+
+        self.cake.delete()
+        self.assertEqual(
+            list(Job.objects.values_list('name', 'kwargs')),
+            [(
+                tasks.rebuild_shopping_lists.job_name,
+                {'user_ids': [self.user.pk]},
+            )],
+        )
+        run_jobs()
+        self.assertEqual(self.shopping_list(), {self.flour.pk: 500})
+
+    def test_ingredient_update_rebuilds_lists_once(self):
+        UserShoppingCart.objects.create(user=self.user, recipe=self.cake)
+        client = APIClient()
+        client.force_authenticate(self.author)
+        ingredients = [
+            {'id': self.flour.pk, 'amount': 300},
+            {'id': self.sugar.pk, 'amount': 100},
+            {'id': self.eggs.pk, 'amount': 2},
+        ]
+        delay = tasks.rebuild_shopping_lists_for_recipe.delay
+        with mock.patch.object(
+            tasks.rebuild_shopping_lists_for_recipe, 'delay', wraps=delay
+        ) as scheduled:
+            response = client.patch(
+                f'/api/recipes/{self.cake.pk}/',
+                {'ingredients': ingredients},
+                format='json',
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Один раз на всю замену ингредиентов.
+        self.assertEqual(scheduled.call_count, 1)
+
+        run_jobs()
+        self.assertEqual(
+            self.shopping_list(),
+            {self.flour.pk: 300, self.sugar.pk: 100, self.eggs.pk: 2},
+        )
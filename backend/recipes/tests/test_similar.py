@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from jobs.models import Job
+from recipes import tasks
+from recipes.models import (
+    Ingredient,
+    MeasurementUnit,
+    SimilarRecipe,
+    SimilarRecipesRefresh,
+)
+from .utils import LOCMEM_CACHES, create_recipe, run_jobs
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SimilarRecipesTestCase(TestCase):
+    """Пересчет похожих рецептов после изменения ингредиентов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='password'
+        )
+        unit = MeasurementUnit.objects.create(
+            full_name='грамм', short_name='г'
+        )
+        cls.ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'ингредиент {i}', measurement_unit=unit)
+            for i in range(6)
+        ])
+        cls.recipes = [
+            create_recipe(author, {ingredient: 100})
+            for ingredient in cls.ingredients[:5]
+        ]
+
+    def test_changed_recipe_is_refreshed_by_job(self):
+        first, second = self.recipes[:2]
+        first.ingredients.add(
+            self.ingredients[5], through_defaults={'amount': 10}
+        )
+        second.ingredients.add(
+            self.ingredients[5], through_defaults={'amount': 10}
+        )
+        # Одна задача на оба изменения.
+        self.assertEqual(
+            Job.objects.filter(
+                name=tasks.refresh_similar_recipes.job_name
+            ).count(),
+            1,
+        )
+
+        run_jobs()
+        self.assertEqual(
+            list(
+                SimilarRecipe.objects.order_by('recipe_id')
+                .values_list('recipe_id', 'similar_id')
+            ),
+            [(first.pk, second.pk), (second.pk, first.pk)],
+        )
+        self.assertFalse(SimilarRecipesRefresh.objects.exists())
@@ -0,0 +1,29 @@
+from jobs.models import Job
+from jobs.worker import run
+from recipes.models import Recipe, RecipeIngredient
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+}
+
+
+def create_recipe(author, amounts):
+    """Рецепт с ингредиентами {ингредиент: количество}."""
+    recipe = Recipe.objects.create(
+        author=author,
+        name=f'Рецепт {Recipe.objects.count() + 1}',
+        text='Текст',
+        cooking_time=10,
+        image='recipes/images/test.png',
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=amount)
+        for ingredient, amount in amounts.items()
+    )
+    return recipe
+
+
+def run_jobs():
+    """Выполняет задачи из очереди в текущей транзакции теста."""
+    for job in Job.objects.order_by('pk'):
+        run(job)
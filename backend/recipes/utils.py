@@ -0,0 +1,128 @@
+from django.db import connections, router, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    Recipe,
+    RecipeIngredient,
+    SimilarRecipesRefresh,
+    UserShoppingCart,
+    UserShoppingListItem,
+)
+
+
+def touch_recipes(**lookups):
+    """Обновляет updated_at рецептов, представление которых изменилось."""
+    Recipe.objects.filter(**lookups).update(updated_at=timezone.now())
+
+
+def request_similar_refresh(recipe_ids):
+    """Ставит рецепты в очередь на пересчет похожих рецептов."""
+    recipe_ids = list(recipe_ids)
+    SimilarRecipesRefresh.objects.filter(recipe_id__in=recipe_ids).update(
+        requested_at=timezone.now()
+    )
+    SimilarRecipesRefresh.objects.bulk_create(
+        [SimilarRecipesRefresh(recipe_id=pk) for pk in recipe_ids],
+        ignore_conflicts=True,
+    )
+
+
+def count_for_recipe(model):
+    """Подзапрос с количеством строк model, ссылающихся на рецепт."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(recipe=OuterRef('pk'))
+            .order_by()
+            .values('recipe')
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0,
+    )
+
+
+def add_recipe_to_shopping_list(user_id, recipe_id):
+    """
+    Добавляет ингредиенты рецепта в суммарный список покупок
+    пользователя одним запросом: INSERT ... SELECT из ингредиентов
+    рецепта, для уже имеющихся позиций количество суммируется
+    (ON CONFLICT DO UPDATE).
+    """
+    items = UserShoppingListItem._meta
+    ingredients = RecipeIngredient._meta
+    connection = connections[router.db_for_write(UserShoppingListItem)]
+    quote = connection.ops.quote_name
+    user, ingredient, amount = (
+        quote(items.get_field(name).column)
+        for name in ('user', 'ingredient', 'amount')
+    )
+    table = quote(items.db_table)
+    sql = (
+        f'INSERT INTO {table} ({user}, {ingredient}, {amount}) '
+        f'SELECT %s, {quote(ingredients.get_field("ingredient").column)}, '
+        f'{quote(ingredients.get_field("amount").column)} '
+        f'FROM {quote(ingredients.db_table)} '
+        f'WHERE {quote(ingredients.get_field("recipe").column)} = %s '
+        f'ON CONFLICT ({user}, {ingredient}) '
+        f'DO UPDATE SET {amount} = {table}.{amount} + EXCLUDED.{amount}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, recipe_id])
+
+
+def remove_recipe_from_shopping_list(user_id, recipe_id):
+    """
+    Вычитает ингредиенты рецепта из списка покупок пользователя:
+    позиции, которые обнуляются, удаляются, остальные уменьшаются.
+    """
+    recipe_amount = Subquery(
+        RecipeIngredient.objects.filter(
+            recipe_id=recipe_id, ingredient_id=OuterRef('ingredient_id')
+        ).values('amount')[:1]
+    )
+    items = UserShoppingListItem.objects.filter(
+        user_id=user_id,
+        ingredient_id__in=RecipeIngredient.objects.filter(
+            recipe_id=recipe_id
+        ).values('ingredient_id'),
+    )
+    # Без точки сохранения: внутри транзакции вызывающего (см.
+    # RecipeViewSet.shopping_cart) откатывать отдельно нечего.
+    with transaction.atomic(savepoint=False):
+        items.filter(amount__lte=recipe_amount).delete()
+        items.update(amount=F('amount') - recipe_amount)
+
+
+def rebuild_shopping_lists(user_ids):
+    """Пересчитывает списки покупок пользователей по их корзинам."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+
+    totals = (
+        RecipeIngredient.objects.filter(
+            recipe__user_shopping_cart__user_id__in=user_ids
+        )
+        .values('recipe__user_shopping_cart__user_id', 'ingredient_id')
+        .annotate(total=Sum('amount'))
+    )
+    with transaction.atomic():
+        UserShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+        UserShoppingListItem.objects.bulk_create(
+            UserShoppingListItem(
+                user_id=row['recipe__user_shopping_cart__user_id'],
+                ingredient_id=row['ingredient_id'],
+                amount=row['total'],
+            )
+            for row in totals
+        )
+
+
+def rebuild_shopping_lists_for_recipe(recipe_id):
+    """Пересчитывает списки покупок всех, у кого рецепт в корзине."""
+    rebuild_shopping_lists(
+        UserShoppingCart.objects.filter(recipe_id=recipe_id)
+        .values_list('user_id', flat=True)
+    )
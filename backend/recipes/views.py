@@ -0,0 +1,20 @@
+from django.http import Http404, HttpResponseRedirect
+
+from .models import ShortLink
+
+
+def short_link_redirect(request, code):
+    """
+    Переход по короткой ссылке, которой еще нет в выгрузке для nginx
+    (см. recipes.short_links): известные коды nginx обрабатывает сам.
+    """
+    full_url = (
+        ShortLink.objects.filter(
+            short_url=f'https://{request.get_host()}/s/{code}/'
+        )
+        .values_list('full_url', flat=True)
+        .first()
+    )
+    if full_url is None:
+        raise Http404
+    return HttpResponseRedirect(full_url)
@@ -4,21 +4,12 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 
 from .models import Subscriptions
+from recipes.admin import changelist_link
 from recipes.models import UserFavoriteRecipes, UserShoppingCart
 
 User = get_user_model()
 
 
-class UserFavoriteRecipesInline(admin.TabularInline):
-    model = UserFavoriteRecipes
-    extra = 1
-
-
-class UserShoppingCartInline(admin.TabularInline):
-    model = UserShoppingCart
-    extra = 1
-
-
 @admin.register(User)
 class UsertAdmin(BaseUserAdmin):
 
@@ -31,9 +22,35 @@ class UsertAdmin(BaseUserAdmin):
         'avatar',
     )
     empty_value_display = 'тут пусто'
-    list_filter = ('username', 'email', 'first_name')
-    search_fields = ('username', 'email', 'first_name')
-    inlines = (UserFavoriteRecipesInline, UserShoppingCartInline)
+    show_full_result_count = False
+    list_filter = ('is_staff', 'is_active')
+    search_fields = ('^username', '^email', 'first_name')
+    readonly_fields = ('favorites_link', 'shopping_cart_link')
+
+    def get_fieldsets(self, request, obj=None):
+        fieldsets = super().get_fieldsets(request, obj)
+        if obj is None:
+            return fieldsets
+        return (
+            *fieldsets,
+            ('Рецепты', {'fields': self.readonly_fields}),
+        )
+
+    @admin.display(description='Избранное')
+    def favorites_link(self, obj):
+        return changelist_link(
+            UserFavoriteRecipes,
+            f'Рецептов: {obj.favorite_recipes.count()}',
+            user__id__exact=obj.pk,
+        )
+
+    @admin.display(description='Список покупок')
+    def shopping_cart_link(self, obj):
+        return changelist_link(
+            UserShoppingCart,
+            f'Рецептов: {obj.shopping_cart.count()}',
+            user__id__exact=obj.pk,
+        )
 
 
 @admin.register(Subscriptions)
@@ -43,8 +60,10 @@ class SubscriptionsAdmin(admin.ModelAdmin):
         'following'
     )
     empty_value_display = 'тут пусто'
-    list_filter = ('user__username',)
-    search_fields = ('user__username',)
+    list_select_related = ('user', 'following')
+    show_full_result_count = False
+    search_fields = ('^user__username', '^following__username')
+    autocomplete_fields = ('user', 'following')
 
 
 admin.site.unregister(Group)
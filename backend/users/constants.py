@@ -1,2 +1,8 @@
 MAXLENGTH_NAME = 150
 MAXLENGTH_EMAIL = 254
+FAVORITE_WEIGHT = 0.5
+SUGGESTIONS_COUNT = 20
+SUGGESTIONS_BATCH_SIZE = 1000
+# Период полного пересчета рекомендаций авторов, секунды.
+SUGGESTIONS_REBUILD_INTERVAL = 60 * 60 * 24
+USERS_IMPORT_CHUNK_SIZE = 2000
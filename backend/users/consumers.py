@@ -0,0 +1,26 @@
+"""
+Пересчет рекомендаций авторов по событиям outbox.
+
+Подписки и избранное меняются разными путями: ORM, сырым SQL в один
+запрос (api.utils.add_link), пакетно и каскадно. События пишут триггеры
+базы при любом из них, поэтому очередь пересчета пополняется здесь, а
+не в каждом представлении, и переключатель подписки или избранного не
+тратит на нее запросов.
+"""
+from django.contrib.auth import get_user_model
+
+from outbox.constants import FAVORITE_TOPIC, SUBSCRIPTION_TOPIC
+from outbox.registry import consumer
+from .utils import request_suggestions_refresh
+
+User = get_user_model()
+
+
+@consumer('author-suggestions', topics=[FAVORITE_TOPIC, SUBSCRIPTION_TOPIC])
+def queue_suggestions_refresh(events):
+    """Ставит в очередь пересчета авторов изменений."""
+    user_ids = {event.data['user'] for event in events}
+    # Пользователь мог быть удален вместе со своими подписками.
+    request_suggestions_refresh(
+        User.objects.filter(pk__in=user_ids).values_list('pk', flat=True)
+    )
@@ -0,0 +1,176 @@
+"""
+Массовый импорт пользователей из CSV.
+
+Колонки: имя, фамилия, никнейм, email, пароль. Файл читается потоком,
+пачками по USERS_IMPORT_CHUNK_SIZE строк. Занятые email и никнеймы
+пачки находятся одним запросом, повторы внутри файла отсеиваются по
+множествам в памяти. Пароли хешируются (PBKDF2 - основная стоимость
+импорта) в пуле процессов, пока предыдущая пачка записывается в базу
+через bulk_create в своей транзакции.
+
+Записанные пачки остаются в базе, если импорт прервется: при
+повторном запуске их строки пропускаются как уже существующие.
+"""
+import csv
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+
+from .constants import USERS_IMPORT_CHUNK_SIZE
+
+User = get_user_model()
+
+COLUMNS = ('first_name', 'last_name', 'username', 'email', 'password')
+
+
+@dataclass
+class ImportStats:
+    rows: int = 0
+    created: int = 0
+    existing: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def clean_row(values):
+    """Поля пользователя из строки CSV. Неверная строка - ValidationError."""
+    if len(values) != len(COLUMNS):
+        raise ValidationError(
+            f'expected {len(COLUMNS)} columns, got {len(values)}'
+        )
+    data = dict(zip(COLUMNS, (value.strip() for value in values)))
+    data['email'] = User.objects.normalize_email(data['email'])
+    errors = {}
+    for name in COLUMNS[:-1]:
+        try:
+            User._meta.get_field(name).clean(data[name], None)
+        except ValidationError as error:
+            errors[name] = error.messages
+    if errors:
+        raise ValidationError(errors)
+    # Пустой пароль - вход по паролю невозможен (make_password(None)).
+    data['password'] = data['password'] or None
+    return data
+
+
+def _new_users(chunk, stats, seen_emails, seen_usernames, on_invalid):
+    """Пользователи пачки, которых нет ни в базе, ни выше в файле."""
+    candidates = []
+    for line, values in chunk:
+        stats.rows += 1
+        try:
+            data = clean_row(values)
+        except ValidationError as error:
+            stats.invalid += 1
+            if on_invalid:
+                on_invalid(line, error)
+            continue
+        if data['email'] in seen_emails or data['username'] in seen_usernames:
+            stats.duplicates += 1
+            continue
+        seen_emails.add(data['email'])
+        seen_usernames.add(data['username'])
+        candidates.append(User(**data))
+    if not candidates:
+        return []
+
+    taken = User.objects.filter(
+        Q(email__in=[user.email for user in candidates])
+        | Q(username__in=[user.username for user in candidates])
+    ).values_list('email', 'username')
+    taken_emails, taken_usernames = set(), set()
+    for email, username in taken:
+        taken_emails.add(email)
+        taken_usernames.add(username)
+    users = [
+        user for user in candidates
+        if user.email not in taken_emails
+        and user.username not in taken_usernames
+    ]
+    stats.existing += len(candidates) - len(users)
+    return users
+
+
+def _hash_passwords(passwords, executor, workers):
+    """Итератор хешей; пул начинает считать их сразу."""
+    if executor is None:
+        return map(make_password, passwords)
+    return executor.map(
+        make_password,
+        passwords,
+        chunksize=max(1, len(passwords) // (workers * 4)),
+    )
+
+
+def _save(users, hashes, stats):
+    if hashes is not None:
+        for user, password in zip(users, hashes):
+            user.password = password
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+    stats.created += len(users)
+
+
+def import_users(
+    file,
+    workers=1,
+    chunk_size=USERS_IMPORT_CHUNK_SIZE,
+    dry_run=False,
+    on_progress=None,
+    on_invalid=None,
+):
+    """
+    Импортирует пользователей из открытого CSV-файла, возвращает
+    ImportStats.
+
+    workers - число процессов для хеширования паролей (1 - в текущем
+    процессе). dry_run - только проверка и подсчет, без хеширования и
+    записи. on_progress(stats) вызывается после каждой пачки,
+    on_invalid(номер строки, ValidationError) - для неверных строк.
+    """
+    stats = ImportStats()
+    seen_emails, seen_usernames = set(), set()
+    executor = None
+    if workers > 1 and not dry_run:
+        # django.setup: при запуске процессов через spawn/forkserver
+        # настройки и приложения в них не загружены.
+        executor = ProcessPoolExecutor(workers, initializer=django.setup)
+    pending = None
+    try:
+        rows = enumerate(csv.reader(file), start=1)
+        for chunk in chunked(rows, chunk_size):
+            users = _new_users(
+                chunk, stats, seen_emails, seen_usernames, on_invalid
+            )
+            hashes = None
+            if not dry_run:
+                hashes = _hash_passwords(
+                    [user.password for user in users], executor, workers
+                )
+            # Пока пул хеширует пароли этой пачки, пишется предыдущая.
+            if pending:
+                _save(*pending, stats)
+            pending = (users, hashes)
+            if on_progress:
+                on_progress(stats)
+        if pending:
+            _save(*pending, stats)
+            if on_progress:
+                on_progress(stats)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return stats
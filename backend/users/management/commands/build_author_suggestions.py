@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from users.constants import SUGGESTIONS_COUNT
+from users.suggestions import refresh_suggestions
+
+
+class Command(BaseCommand):
+    help = 'Build "authors you may like" suggestions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Rebuild suggestions for all users, not only queued ones.',
+        )
+        parser.add_argument('-k', type=int, default=SUGGESTIONS_COUNT)
+
+    def handle(self, *args, **options):
+        count = refresh_suggestions(full=options['full'], k=options['k'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Suggestions updated for {count} users.')
+        )
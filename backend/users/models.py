@@ -71,3 +71,53 @@ class Subscriptions(models.Model):
 
     def __str__(self):
         return f'{self.user.username} подписан на {self.following.username}'
+
+
+class AuthorSuggestion(models.Model):
+    """
+    Рекомендованный пользователю автор.
+
+    Заполняется задачей users.tasks.refresh_author_suggestions (или
+    командой build_author_suggestions).
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='author_suggestions'
+    )
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='suggested_to'
+    )
+    score = models.FloatField(verbose_name='Оценка')
+
+    class Meta:
+        verbose_name = 'Рекомендация автора'
+        verbose_name_plural = 'Рекомендации авторов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_user_suggestion'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-score'], name='user_suggestion_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.author.username} для {self.user.username}'
+
+
+class AuthorSuggestionRefresh(models.Model):
+    """Очередь пользователей, рекомендации которых нужно пересчитать."""
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True,
+        related_name='author_suggestion_refresh'
+    )
+    requested_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Пересчет рекомендаций'
+        verbose_name_plural = 'Пересчет рекомендаций'
@@ -0,0 +1,205 @@
+"""
+Рекомендации авторов по графу подписок и избранного.
+
+Строится разреженная матрица пользователь x автор: подписка дает 1,
+избранные рецепты автора - FAVORITE_WEIGHT * log(1 + число рецептов).
+Похожесть авторов - косинус между их столбцами («кто подписан на X,
+подписан и на Y»), оценка автора для пользователя - сумма похожестей
+с авторами из его строки. Результат (top-k) сохраняется в
+AuthorSuggestion, так что эндпоинт читает его одним запросом по индексу.
+
+Пересчет для очереди пользователей строит матрицу не целиком, а только
+из столбцов авторов, от которых зависят их оценки (affected_authors).
+"""
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from scipy import sparse
+
+from recipes.models import UserFavoriteRecipes
+from recipes.similarity import row_of, top_k
+from .constants import (
+    FAVORITE_WEIGHT,
+    SUGGESTIONS_BATCH_SIZE,
+    SUGGESTIONS_COUNT,
+)
+from .models import AuthorSuggestion, AuthorSuggestionRefresh, Subscriptions
+
+User = get_user_model()
+
+
+def _links(user_ids=None, author_ids=None):
+    """
+    Подписки и избранное: все или только строки user_ids и столбцы
+    author_ids матрицы.
+    """
+    follows = Subscriptions.objects.all()
+    favorites = UserFavoriteRecipes.objects.all()
+    if user_ids is not None:
+        follows = follows.filter(user_id__in=user_ids)
+        favorites = favorites.filter(user_id__in=user_ids)
+    if author_ids is not None:
+        follows = follows.filter(following_id__in=author_ids)
+        favorites = favorites.filter(recipe__author_id__in=author_ids)
+    return follows, favorites
+
+
+def _authors_of(user_ids):
+    follows, favorites = _links(user_ids=user_ids)
+    return set(follows.values_list('following_id', flat=True)) | set(
+        favorites.values_list('recipe__author_id', flat=True)
+    )
+
+
+def _users_of(author_ids):
+    follows, favorites = _links(author_ids=author_ids)
+    return set(follows.values_list('user_id', flat=True)) | set(
+        favorites.values_list('user_id', flat=True)
+    )
+
+
+def affected_authors(user_ids):
+    """
+    Авторы, от которых зависят оценки user_ids: авторы из их строк и
+    авторы, у которых есть общие с первыми подписчики. Для остальных
+    авторов похожесть с первыми нулевая, и их столбцы не нужны.
+    """
+    authors = _authors_of(user_ids)
+    if not authors:
+        return authors
+    return authors | _authors_of(_users_of(authors))
+
+
+def build_affinity_matrix(author_ids=None, user_ids=()):
+    """
+    Матрица пользователь x автор (CSR), матрица одних только подписок
+    и отображение id -> индекс.
+
+    Строки и столбцы индексируются одним и тем же набором id
+    пользователей, т.к. авторы - тоже пользователи. Если задан
+    author_ids, в матрицу попадают только столбцы этих авторов целиком,
+    а в индекс - их подписчики и пользователи user_ids.
+    """
+    follows, favorites = _links(author_ids=author_ids)
+    follows = np.array(
+        list(follows.values_list('user_id', 'following_id')),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    favorites = np.array(
+        list(
+            favorites.values('user_id', 'recipe__author_id')
+            .annotate(count=Count('pk'))
+            .values_list('user_id', 'recipe__author_id', 'count')
+            .order_by()
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 3)
+
+    if author_ids is None:
+        user_ids = np.fromiter(
+            User.objects.order_by('pk').values_list('pk', flat=True),
+            dtype=np.int64,
+        )
+    else:
+        user_ids = np.union1d(
+            np.concatenate([follows.ravel(), favorites[:, :2].ravel()]),
+            np.fromiter(user_ids, dtype=np.int64),
+        )
+    index = {user_id: i for i, user_id in enumerate(user_ids.tolist())}
+    size = len(user_ids)
+
+    # user_ids отсортированы по возрастанию.
+    rows = np.searchsorted(
+        user_ids, np.concatenate([follows[:, 0], favorites[:, 0]])
+    )
+    cols = np.searchsorted(
+        user_ids, np.concatenate([follows[:, 1], favorites[:, 1]])
+    )
+    data = np.concatenate([
+        np.ones(len(follows)),
+        FAVORITE_WEIGHT * np.log1p(favorites[:, 2]),
+    ])
+    matrix = sparse.csr_matrix((data, (rows, cols)), shape=(size, size))
+    matrix.sum_duplicates()
+    followed = sparse.csr_matrix(
+        (data[:len(follows)], (rows[:len(follows)], cols[:len(follows)])),
+        shape=(size, size),
+    )
+    return matrix, followed, user_ids, index
+
+
+def author_similarity(matrix):
+    """Косинусная похожесть авторов (столбцов матрицы), без диагонали."""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0))).ravel()
+    norms[norms == 0] = 1
+    normalized = matrix @ sparse.diags(1 / norms)
+    similarity = (normalized.T @ normalized).tocsr()
+    similarity -= sparse.diags(similarity.diagonal(), format='csr')
+    similarity.eliminate_zeros()
+    return similarity
+
+
+def build_suggestions(user_ids=None, k=SUGGESTIONS_COUNT,
+                      batch_size=SUGGESTIONS_BATCH_SIZE):
+    """
+    Пересчитывает рекомендации для user_ids (для всех, если None).
+
+    Возвращает число пользователей, для которых выполнен пересчет.
+    """
+    if user_ids is None:
+        matrix, followed, all_ids, index = build_affinity_matrix()
+    else:
+        user_ids = list(user_ids)
+        matrix, followed, all_ids, index = build_affinity_matrix(
+            affected_authors(user_ids), user_ids
+        )
+    similarity = author_similarity(matrix)
+
+    if user_ids is None:
+        rows = np.arange(len(all_ids))
+    else:
+        rows = np.array(
+            [index[pk] for pk in user_ids if pk in index], dtype=np.int64
+        )
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        scores = (matrix[batch] @ similarity).tocsr()
+        suggestions = []
+        for position, row in enumerate(batch):
+            exclude = np.append(row_of(followed, row)[0], row)
+            authors, values = top_k(*row_of(scores, position), exclude, k)
+            suggestions.extend(
+                AuthorSuggestion(
+                    user_id=int(all_ids[row]),
+                    author_id=int(all_ids[author]),
+                    score=float(value),
+                )
+                for author, value in zip(authors, values)
+            )
+        batch_ids = all_ids[batch].tolist()
+        with transaction.atomic():
+            AuthorSuggestion.objects.filter(user_id__in=batch_ids).delete()
+            AuthorSuggestion.objects.bulk_create(suggestions)
+    return len(rows)
+
+
+def refresh_suggestions(full=False, k=SUGGESTIONS_COUNT):
+    """
+    Пересчитывает рекомендации пользователей из очереди
+    (или всех пользователей при full=True) и очищает очередь.
+    """
+    started = timezone.now()
+    queue = AuthorSuggestionRefresh.objects.all()
+    if full:
+        count = build_suggestions(k=k)
+    else:
+        user_ids = list(queue.values_list('user_id', flat=True))
+        if not user_ids:
+            return 0
+        count = build_suggestions(user_ids, k=k)
+    # Запросы, поступившие во время пересчета, остаются в очереди.
+    queue.filter(requested_at__lte=started).delete()
+    return count
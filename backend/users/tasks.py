@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+
+from jobs.constants import LOW_QUEUE
+from jobs.registry import every, task
+
+from . import suggestions
+from .constants import SUGGESTIONS_REBUILD_INTERVAL
+
+User = get_user_model()
+
+
+@task(queue=LOW_QUEUE)
+def delete_user(user_id):
+    """Удаляет пользователя со всеми рецептами, подписками и т.д."""
+    User.objects.filter(pk=user_id).delete()
+
+
+@task(queue=LOW_QUEUE, unique=True)
+def refresh_author_suggestions(full=False):
+    """
+    Разбирает очередь пересчета рекомендаций авторов (или пересчитывает
+    всех при full=True). Подписка одного пользователя меняет оценки и у
+    других, поэтому полный пересчет идет по расписанию.
+    """
+    suggestions.refresh_suggestions(full=full)
+
+
+every(SUGGESTIONS_REBUILD_INTERVAL, refresh_author_suggestions, full=True)
@@ -0,0 +1,20 @@
+from . import tasks
+from .models import AuthorSuggestionRefresh
+
+
+def request_suggestions_refresh(user_ids):
+    """
+    Ставит пользователей в очередь на пересчет рекомендаций авторов
+    (одним upsert: уже стоящим в очереди обновляется requested_at) и
+    задачу, которая ее разберет.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return
+    AuthorSuggestionRefresh.objects.bulk_create(
+        [AuthorSuggestionRefresh(user_id=user_id) for user_id in user_ids],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['requested_at'],
+    )
+    tasks.refresh_author_suggestions.delay()
@@ -1,23 +1,54 @@
 from djoser import views as djoser_views
 from djoser.conf import settings
 from django.contrib.auth import get_user_model
-from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 
-from api.serializers import (SubscribeSerializer, SubscriptionsSeriealizer)
+from api.serializers import (
+    SELF_SUBSCRIPTION_ERROR,
+    SUBSCRIPTION_EXISTS_ERROR,
+    AuthorProfileSerializer,
+    BatchIdsSerializer,
+    UserGetSerializer,
+    SubscribeSerializer,
+    SubscriptionsSeriealizer,
+)
+from api.fieldsets import Fieldset
+from api.utils import (
+    USER_COLUMNS,
+    add_link,
+    apply_batch,
+    get_requested_ids,
+    multi_get,
+    only_fields,
+    parse_pk,
+    remove_link,
+    with_author_profile,
+    with_subscription_flag,
+)
 from users.serializers import AvatarSerializer
 from api.pagination import UserListPagination
 from .permissions import SelfUserPermission
 
 from users.models import Subscriptions
+from users.tasks import delete_user
 
 
 User = get_user_model()
 
+# Сериализатор, поля которого выбирает ?fields= (api.fieldsets), по action.
+FIELDSET_SERIALIZERS = {
+    'list': UserGetSerializer,
+    'retrieve': UserGetSerializer,
+    'me': UserGetSerializer,
+    'suggestions': UserGetSerializer,
+    'subscriptions': AuthorProfileSerializer,
+}
+
 
 class UserViewSet(djoser_views.UserViewSet):
     """
@@ -29,12 +60,43 @@ class UserViewSet(djoser_views.UserViewSet):
     http_method_names = ['get', 'post', 'put', 'delete']
     lookup_fields = 'email'
     pagination_class = UserListPagination
+    # Число SQL-запросов с учетом аутентификации (см. diagnostics.budget).
+    query_budget = {
+        'list': 4,
+        'retrieve': 3,
+        'me': 3,
+        'subscriptions': 6,
+        'suggestions': 3,
+        'subscribe': 6,
+    }
+
+    @cached_property
+    def fieldset(self):
+        """Поля ответа, выбранные ?fields= и ?expand= (api.fieldsets)."""
+        serializer_class = FIELDSET_SERIALIZERS.get(self.action)
+        if serializer_class is None:
+            return None
+        return Fieldset.from_request(self.request, serializer_class)
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'fieldset': self.fieldset}
+
+    def _with_user_fields(self, queryset):
+        """Признак подписки и колонки - только для выбранных полей."""
+        fieldset = self.fieldset
+        if fieldset is None or 'is_subscribed' in fieldset:
+            queryset = with_subscription_flag(queryset, self.request.user)
+        return only_fields(queryset, fieldset, USER_COLUMNS)
 
     def get_queryset(self):
         if self.action == "me":
-            return User.objects.filter(pk=self.request.user.pk)
+            return self._with_user_fields(
+                User.objects.filter(pk=self.request.user.pk)
+            )
         if self.action == "subscriptions":
             return Subscriptions.objects.all()
+        if self.action in ("list", "retrieve"):
+            return self._with_user_fields(User.objects.order_by('id'))
         return User.objects.order_by('id').all()
 
     def get_serializer_class(self):
@@ -45,12 +107,35 @@ class UserViewSet(djoser_views.UserViewSet):
             if settings.SET_PASSWORD_RETYPE else settings.SERIALIZERS.set_password,
             "me": settings.SERIALIZERS.user if self.request.method == "GET"
             else settings.SERIALIZERS.current_user,
+            "destroy": settings.SERIALIZERS.user_delete,
             "avatar": AvatarSerializer,
             "subscriptions": SubscriptionsSeriealizer,
-            "subscribe": SubscribeSerializer
+            "subscribe": SubscribeSerializer,
+            "subscribe_batch": BatchIdsSerializer,
+            "suggestions": settings.SERIALIZERS.user,
         }
         return action_serializer_map.get(self.action, self.serializer_class)
 
+    def list(self, request, *args, **kwargs):
+        """
+        Список пользователей; с ?ids=1,2,3 - пользователи с этими id
+        в порядке запроса, без пагинации (см. api.utils.multi_get).
+        """
+        ids = get_requested_ids(request)
+        if ids is not None:
+            return multi_get(self, self.get_queryset(), ids)
+        return super().list(request, *args, **kwargs)
+
+    def perform_destroy(self, instance):
+        """
+        Пользователь сразу деактивируется (токен перестает работать),
+        а каскадное удаление его рецептов, подписок и т.д. выполняет
+        фоновая задача.
+        """
+        instance.is_active = False
+        instance.save(update_fields=['is_active'])
+        delete_user.delay(user_id=instance.pk)
+
     @action(
         ["get"],
         detail=False,
@@ -98,13 +183,65 @@ class UserViewSet(djoser_views.UserViewSet):
         queryset = Subscriptions.objects.all().filter(user=user)
         page = self.paginate_queryset(queryset)
         if page is not None:
+            self._attach_author_profiles(page)
             serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
         if not queryset.exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
+        queryset = list(queryset)
+        self._attach_author_profiles(queryset)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    def _attach_author_profiles(self, subscriptions):
+        """Загружает авторов подписок со всем, что нужно профилю."""
+        authors = with_author_profile(
+            User.objects.filter(
+                pk__in=[item.following_id for item in subscriptions]
+            ),
+            self.request,
+            self.fieldset,
+        ).in_bulk()
+        for item in subscriptions:
+            item.following = authors[item.following_id]
+
+    @action(
+        ['get'],
+        detail=False,
+        url_path='suggestions',
+        permission_classes=(IsAuthenticated,)
+    )
+    def suggestions(self, request, *args, **kwargs):
+        """Метод для получения рекомендованных авторов."""
+        authors = self._with_user_fields(
+            User.objects.filter(suggested_to__user=request.user)
+            .exclude(followers__user=request.user)
+            .order_by('-suggested_to__score')
+        )
+        serializer = self.get_serializer(authors, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(
+        ['post', 'delete'],
+        detail=False,
+        url_path='subscribe/batch',
+        permission_classes=(IsAuthenticated,),
+    )
+    def subscribe_batch(self, request, *args, **kwargs):
+        """Метод, чтобы подписаться/отписаться на список пользователей."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = apply_batch(
+            user=request.user,
+            model=Subscriptions,
+            field='following',
+            ids=serializer.validated_data['ids'],
+            targets=User.objects.all(),
+            delete=request.method == 'DELETE',
+            forbidden_ids=(request.user.id,),
+        )
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
     @action(
         ['post', 'delete'],
         detail=True,
@@ -112,29 +249,49 @@ class UserViewSet(djoser_views.UserViewSet):
         permission_classes=(IsAuthenticated,),
     )
     def subscribe(self, request, id, *args, **kwargs):
-        """Метод, чтобы подписаться/отписаться на другого пользователя."""
-        user = get_object_or_404(User, id=self.request.user.id)
-        following = get_object_or_404(User, id=self.kwargs['id'])
+        """
+        Метод, чтобы подписаться/отписаться на другого пользователя.
+
+        Подписка добавляется/удаляется одним запросом (см.
+        api.utils.add_link), автор читается только для ответа (поля
+        профиля и страница рецептов) или чтобы отличить 404 от 400.
+        Рекомендации пересчитываются по событию outbox (users.consumers).
+        """
+        pk = parse_pk(id)
+        if pk is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        authors = User.objects.filter(pk=pk)
 
         if request.method == 'POST':
-            serializer = self.get_serializer(
-                data={'following': following},
-                context={'request': request},
+            if pk == request.user.id:
+                return Response(
+                    {'following': [SELF_SUBSCRIPTION_ERROR]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            created = add_link(
+                Subscriptions, 'following', request.user.id, pk,
+                exclude_pk=request.user.id,
             )
-            serializer.is_valid(raise_exception=True)
-            serializer.save(user=user)
-            headers = self.get_success_headers(serializer.data)
-            return Response(
-                serializer.data,
-                status=status.HTTP_201_CREATED,
-                headers=headers,
+            if not created:
+                if not authors.exists():
+                    return Response(status=status.HTTP_404_NOT_FOUND)
+                return Response(
+                    {'non_field_errors': [SUBSCRIPTION_EXISTS_ERROR]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            # Подписка только что добавлена, признак известен без запроса.
+            author = with_author_profile(
+                authors.only(*USER_COLUMNS), request, subscribed=True
+            ).first()
+            if author is None:
+                return Response(status=status.HTTP_404_NOT_FOUND)
+            serializer = AuthorProfileSerializer(
+                author, context=self.get_serializer_context()
             )
-        user = get_object_or_404(User, id=self.request.user.id)
-        following = get_object_or_404(User, id=self.kwargs['id'])
-        instance = Subscriptions.objects.filter(
-            following=following, user=user
-        ).all()
-        if not instance:
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-        instance.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        if remove_link(Subscriptions, 'following', request.user.id, pk):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        if not authors.exists():
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
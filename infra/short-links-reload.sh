@@ -0,0 +1,25 @@
+#!/bin/sh
+# Плавно перезагружает nginx, когда backend обновляет выгрузку коротких
+# ссылок (см. backend/recipes/short_links.py). Запускается образом
+# nginx из /docker-entrypoint.d/ и работает в фоне.
+set -eu
+
+MAP_DIR=${SHORT_LINKS_MAP_DIR:-/home/app/protected/short_links}
+INTERVAL=${SHORT_LINKS_RELOAD_INTERVAL:-5}
+
+state() {
+    stat -c '%n %Y %s' "$MAP_DIR"/*.map 2>/dev/null || true
+}
+
+watch() {
+    last=$(state)
+    while sleep "$INTERVAL"; do
+        current=$(state)
+        if [ "$current" != "$last" ]; then
+            last=$current
+            nginx -s reload || true
+        fi
+    done
+}
+
+watch &